@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from newbler.annotation import Annotation
+from newbler.fastq      import FastqCache
+from newbler.pileup     import Alignment
+from newbler.scheduler  import Scheduler
+
+from .synthetic import makeProject
+
+BIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bin")
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description="Times the pileup, extraction and annotation stages on synthetic KOs",
+    formatter_class=argparse.RawTextHelpFormatter)
+parser.add_argument('--scales', type=str, default="1,2,4",
+    help="comma separated scales, scale s is s KOs of 4s contigs with 40s read pairs per contig")
+parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark, the fastest is reported as best")
+parser.add_argument('--pool', type=int, default=2, help="pool size for the tryPileup driver")
+parser.add_argument('--cores', type=int, default=4, help="cores for the assembly scheduler driver")
+parser.add_argument('--workdir', type=str, default=None, help="where the synthetic projects go, default: a temporary directory")
+parser.add_argument('--output', type=str, default=None, help="JSON results file, default: stdout")
+
+def timed(run, repeat, setup=None):
+    '''
+    wall and CPU seconds of repeat runs, setup is called before each run and not timed.
+    Output printed by the stages is swallowed.
+    '''
+    walls, cpus = [], []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            wall, cpu = time.time(), time.process_time()
+            run()
+            walls.append(time.time() - wall)
+            cpus.append(time.process_time() - cpu)
+    return {'wall': walls, 'cpu': cpus, 'best': min(walls)}
+
+def clearPileup(root, ko):
+    shutil.rmtree("%s/out/pileup/%s" % (root, ko), ignore_errors=True)
+    FastqCache.clear()
+
+def clearAlignment(root, ko):
+    """
+    drops the realigned stores, otherwise Realigner reuses the alignments of the previous run
+    """
+    for store in ("msa", "reAligned.msa"):
+        for path in ("%s/out/pileup/%s/%s.%s" % (root, ko, ko, store), "%s/out/pileup/%s/%s.%s.idx" % (root, ko, ko, store)):
+            if os.path.isfile(path):
+                os.remove(path)
+
+def benchScale(workdir, scale, repeat, pool, cores):
+    """
+    builds the project for one scale and times every stage on it, returns one result per benchmark
+    """
+    root = "%s/scale%s" % (workdir, scale)
+    shutil.rmtree(root, ignore_errors=True)
+    shape = {'kos': scale, 'contigs': 4 * scale, 'readsPerContig': 40 * scale}
+    kos = makeProject(root, kos=shape['kos'], contigs=shape['contigs'], readsPerContig=shape['readsPerContig'])
+    ko = kos[0]
+    results = []
+
+    def record(name, timing):
+        result = dict(shape, benchmark=name, scale=scale)
+        result.update(timing)
+        results.append(result)
+        print("scale %s %-22s best %.3fs" % (scale, name, timing['best']), file=sys.stderr)
+
+    record("doPile", timed(lambda: Alignment(root, ko).doPile(realign=False), repeat, lambda: clearPileup(root, ko)))
+    record("realign.banded", timed(lambda: Alignment(root, ko, aligner="banded").realign(), repeat, lambda: clearAlignment(root, ko)))
+    os.environ['PATH'] = BIN + os.pathsep + os.environ['PATH']
+    record("realign.muscle", timed(lambda: Alignment(root, ko, aligner="muscle").realign(), repeat, lambda: clearAlignment(root, ko)))
+    record("getReadsFromPileUP", timed(lambda: Alignment(root, ko).getReadsFromPileUP(), repeat, FastqCache.clear))
+    record("prediamond", timed(lambda: Annotation().prediamond("%s/out/newbler" % root, "%s/contigs.fna" % root), repeat))
+
+    driver = [sys.executable, "-m", "newbler.tryPileup", "--root", root, "--pool", str(pool), "--force"]
+    record("tryPileup", timed(lambda: subprocess.run(driver, cwd=REPO, check=True, stdout=subprocess.DEVNULL), repeat))
+
+    #the assembly driver overwrites the KO directories, it gets a tree of its own
+    assembly = "%s/assembly" % root
+    makeProject(assembly, kos=shape['kos'], contigs=shape['contigs'], readsPerContig=shape['readsPerContig'])
+    scheduler = lambda: Scheduler("%s/out/newbler" % assembly, kos, cores, assm="%s/runAssembly" % BIN).run()
+    record("Scheduler.run", timed(scheduler, repeat))
+    return results
+
+def main():
+    args = parser.parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="newbler-bench-")
+    results = []
+    for scale in [int(s) for s in args.scales.split(",")]:
+        results.extend(benchScale(workdir, scale, args.repeat, args.pool, args.cores))
+    report = {
+        'started'  : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python'   : platform.python_version(),
+        'machine'  : platform.machine(),
+        'cpus'     : os.cpu_count(),
+        'repeat'   : args.repeat,
+        'results'  : results
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+        print("Results: %s" % args.output, file=sys.stderr)
+    if args.workdir is None:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
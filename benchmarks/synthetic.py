@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import random
+
+COMPLEMENT = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+
+def reverseComplement(seq):
+    return "".join(COMPLEMENT[nt] for nt in reversed(seq))
+
+def makeKO(root, ko, contigs=5, readsPerContig=40, contigLength=600, readLength=101, insert=250, mdr=(200, 400), seed=1):
+    '''
+    Writes one synthetic KO into a project tree at root, laid out the way the pipeline expects it:
+
+        out/newbler/<KO>/input/<KO>.{1,2}.fq  paired reads, @readID|taxID|... headers
+        out/newbler/<KO>/454AllContigs.fna   the contigs
+        out/newbler/<KO>/454PairStatus.txt   where each pair landed
+        out/newbler/<KO>/454ReadStatus.txt
+        out/pAss03/<KO>.msa                  the contigs as an ungapped alignment, the third starts late
+        out/pAss11/<KO>.fna                  MDR header with msaStart / msaEND
+
+    Reads are cut from the contigs so pileups and extraction have real work to do,
+    about one pair in seven is a FalsePair and one in eleven a Link, as newbler reports them.
+    Returns the number of read pairs written.
+    '''
+    rng = random.Random("%s-%s" % (seed, ko))
+    newbler = "%s/out/newbler/%s" % (root, ko)
+    for path in ("%s/input" % newbler, "%s/out/pAss03" % root, "%s/out/pAss11" % root):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    sequences = []
+    for i in range(1, contigs + 1):
+        sequences.append(("contig%05d" % i, "".join(rng.choice("ACGT") for _ in range(contigLength))))
+
+    with open("%s/454AllContigs.fna" % newbler, "w") as fna:
+        for contigID, seq in sequences:
+            fna.write(">%s  length=%d   numreads=%d\n" % (contigID, len(seq), readsPerContig))
+            for i in range(0, len(seq), 60):
+                fna.write("%s\n" % seq[i:i + 60])
+
+    start, end = mdr
+    with open("%s/out/pAss03/%s.msa" % (root, ko), "w") as msa:
+        for i, (contigID, seq) in enumerate(sequences):
+            #one contig does not reach the MDR
+            row = "-" * (end + 50) + seq[end + 50:] if i == 2 else seq
+            msa.write(">%s ref|X| (ntRev)\n%s\n" % (contigID, row))
+    with open("%s/out/pAss11/%s.fna" % (root, ko), "w") as fna:
+        contigID, seq = sequences[0]
+        fna.write(">%s ref|X| (ntRev) ## spanning:%d msaStart:%d msaEND:%d max10BPwindow:%d\n%s\n" % (contigID, contigs - 1, start, end, contigs - 1, seq[start:end]))
+
+    pairs = 0
+    readID = 100
+    quality = "I" * readLength
+    with open("%s/input/%s.1.fq" % (newbler, ko), "w") as fq1, open("%s/input/%s.2.fq" % (newbler, ko), "w") as fq2, \
+            open("%s/454PairStatus.txt" % newbler, "w") as pairStatus, open("%s/454ReadStatus.txt" % newbler, "w") as readStatus:
+        pairStatus.write("Template\tStatus\tDistance\tLeft Contig\tLeft Pos\tLeft Dir\tRight Contig\tRight Pos\tRight Dir\tLeft Distance\tRight Distance\n")
+        readStatus.write("Accno\tRead Status\t5' Contig\t5' Position\t5' Strand\t3' Contig\t3' Position\t3' Strand\n")
+        for contigID, seq in sequences:
+            for j in range(readsPerContig):
+                readID += 1
+                pos = rng.randint(1, max(contigLength - insert, 1))
+                left = seq[pos - 1:pos - 1 + readLength]
+                right = reverseComplement(seq[pos + insert - readLength:pos + insert])
+                taxon = rng.randint(1, 50)
+                fq1.write("@%d|%d|x\n%s\n+\n%s\n" % (readID, taxon, left, quality[:len(left)]))
+                fq2.write("@%d|%d|x\n%s\n+\n%s\n" % (readID, taxon, right, quality[:len(right)]))
+                status = "Link" if j % 11 == 0 else ("SameContig" if j % 7 else "FalsePair")
+                pairStatus.write("%d|%d|1-2|s_1\t%s\t%d\t%s\t%d\t+\t%s\t%d\t-\t\t\n" % (readID, taxon, status, insert, contigID, pos, contigID, pos + insert))
+                readStatus.write("%d|%d|x\tAssembled\t%s\t%d\t+\t%s\t%d\t-\n" % (readID, taxon, contigID, pos, contigID, pos + readLength - 1))
+                pairs += 1
+    return pairs
+
+def makeProject(root, kos=4, contigs=5, readsPerContig=40, contigLength=600, seed=1):
+    """
+    writes kos synthetic KOs (K00001, K00002, ...) under root, returns their names
+    """
+    names = ["K%05d" % i for i in range(1, kos + 1)]
+    for ko in names:
+        makeKO(root, ko, contigs=contigs, readsPerContig=readsPerContig, contigLength=contigLength, seed=seed)
+    return names
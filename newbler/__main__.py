@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Command line entry point, one subcommand per step of the gene centric pipeline:
+
+    python -m newbler assemble   --newbler out/newbler --cpu 24     gene centric assembly of every KO
+    python -m newbler pileup     --root . --pool 4 --cpu 24         pileup, realignment and read extraction
+    python -m newbler extract    --root . --pool 4                  read extraction only
+    python -m newbler prediamond out/newbler contigs.fna            contigs of every KO into one DIAMOND query
+    python -m newbler pack       --root .                           out/pAss01/<KO>/ directories into out/pAss01/<KO>.pack
+
+Only the modules a subcommand needs are imported, pandas and Biopython are loaded by the stages that use them.
+'''
+
+import argparse
+import os
+import sys
+
+def assemble(args, rest):
+    from .scheduler import assembleAll
+    kos = sorted(os.listdir(args.newbler))
+    if args.subset is not None:
+        kos = kos[args.subset[0]:args.subset[1]]
+    return assembleAll(args.newbler, kos, args.cpu, maxThreads=args.maxThreads, assm=args.assm, MDR=args.mdr, cache=args.cache,
+                       cacheGB=args.cacheGB, stallTimeout=args.stallTimeout, failures=args.failures, metricsPath=args.metrics)
+
+def pileup(args, rest):
+    from .tryPileup import main
+    return main(rest)
+
+def extract(args, rest):
+    from .tryPileup import main
+    return main(rest + ['--stages', 'extraction'])
+
+def prediamond(args, rest):
+    from .annotation import Annotation
+    return Annotation().prediamond(args.root, args.output, args.processes, args.shards, args.compress)
+
+def pack(args, rest):
+    from .archive import pack
+    pAss01 = "%s/out/pAss01" % args.root
+    kos = sorted(name for name in os.listdir(pAss01) if os.path.isdir(os.path.join(pAss01, name)))
+    if args.subset is not None:
+        kos = kos[args.subset[0]:args.subset[1]]
+    for ko in kos:
+        packed = pack(os.path.join(pAss01, ko), "%s/%s.pack" % (pAss01, ko), compress=not args.raw, remove=args.remove)
+        print("%s: %s alignments packed into %s/%s.pack" % (ko, packed, pAss01, ko))
+
+parser = argparse.ArgumentParser(prog="newbler", description="Gene centric assembly pipeline", formatter_class=argparse.RawTextHelpFormatter)
+subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+assembleParser = subparsers.add_parser('assemble', help="gene centric assembly of the binned reads of every KO")
+assembleParser.add_argument('--newbler', default="out/newbler", help="binned KO reads, one directory per KO (default: out/newbler)")
+assembleParser.add_argument('--cpu', type=int, default=1, help="total number of cpu cores, shared by the concurrent assemblies")
+assembleParser.add_argument('--maxThreads', type=int, default=None, help="the most cores given to a single assembly, default: all of them")
+assembleParser.add_argument('--subset', metavar='N', type=int, nargs=2, help="assemble the KOs from the Nth to the Mth")
+assembleParser.add_argument('--mdr', action='store_true', help="assemble the MDR reads (<KO>/<KO>.{1,2}.fq) instead of input/")
+assembleParser.add_argument('--assm', default=None, help="path to runAssembly")
+assembleParser.add_argument('--cache', default=None, help="directory of the assembly cache")
+assembleParser.add_argument('--cacheGB', type=float, default=100, help="size of the assembly cache (default: 100)")
+assembleParser.add_argument('--stallTimeout', type=int, default=1800, help="kill and retry with fewer cores an assembly with no change to 454NewblerProgress.txt and no CPU used for this many seconds (default: 1800)")
+assembleParser.add_argument('--failures', default=None, help="JSON lines report of failed attempts (default: assembly.failures.jsonl next to --newbler)")
+assembleParser.add_argument('--metrics', default=None, help="per assembly metrics as JSON lines, a Prometheus textfile goes next to it as .prom")
+assembleParser.set_defaults(run=assemble)
+
+pileupParser = subparsers.add_parser('pileup', add_help=False, help="pileup, realignment and read extraction, takes the options of newbler.tryPileup")
+pileupParser.set_defaults(run=pileup, forward=True)
+
+extractParser = subparsers.add_parser('extract', add_help=False, help="read extraction from existing pileups, takes the options of newbler.tryPileup")
+extractParser.set_defaults(run=extract, forward=True)
+
+prediamondParser = subparsers.add_parser('prediamond', help="concatenates the assembled contigs of every KO for DIAMOND")
+prediamondParser.add_argument('root', help="directory with one directory of contigs per KO")
+prediamondParser.add_argument('output', help="output file, .1 .. .N are appended with --shards")
+prediamondParser.add_argument('--processes', type=int, default=1, help="number of shards written at once")
+prediamondParser.add_argument('--shards', type=int, default=1, help="number of output files")
+prediamondParser.add_argument('--compress', action='store_true', help="gzip the output(s)")
+prediamondParser.set_defaults(run=prediamond)
+
+packParser = subparsers.add_parser('pack', help="packs the per reference alignments of every KO (out/pAss01/<KO>/) into one archive per KO")
+packParser.add_argument('--root', default=os.getcwd(), help="project root directory (default: current directory)")
+packParser.add_argument('--subset', metavar='N', type=int, nargs=2, help="pack the KOs from the Nth to the Mth")
+packParser.add_argument('--raw', action='store_true', help="store the alignments uncompressed")
+packParser.add_argument('--remove', action='store_true', help="delete each directory once its archive has been checked against it")
+packParser.set_defaults(run=pack)
+
+def main(argv=None):
+    """
+    pileup and extract hand the options they do not know to newbler.tryPileup
+    """
+    args, rest = parser.parse_known_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    if rest and not getattr(args, 'forward', False):
+        parser.error("unrecognized arguments: %s" % " ".join(rest))
+    args.run(args, rest)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,74 @@
 
-from Bio import SeqIO
 #import sys
+import gzip
 import os
-import fire
+import shlex
+import subprocess
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+
+
+def renameContigs(root, ko, out):
+    """ Writes the contigs of one KO to out (a binary file handle), each header prefixed with <KO>:
+
+    Only the header lines change, sequence lines are copied as they are in 454AllContigs.fna.
+    The file is streamed line by line, it is never held in memory as a whole.
+
+    Returns:
+    --------
+        number of bytes written, 0 if the KO has no contigs file
+    """
+    file = "{}/{}/454AllContigs.fna".format(root, ko)
+    if not os.path.isfile(file):
+        print("{} has no 454AllContigs.fna, skipping".format(ko))
+        return 0
+    prefix = ">{}:".format(ko).encode()
+    written = 0
+    with open(file, "rb") as fa:
+        for line in fa:
+            if line.startswith(b">"):
+                line = prefix + line[1:]
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            out.write(line)
+            written += len(line)
+    return written
+
+
+def _writeShard(job):
+    """ writes the renamed contigs of the KOs of one shard, in order, into the shard file name, returns its bytes
+    """
+    root, kos, name, compress = job
+    with (gzip.open(name, "wb") if compress else open(name, "wb", buffering=1 << 20)) as out:
+        return sum(renameContigs(root, ko, out) for ko in kos)
+
+
+def readHits(m8):
+    """ Hits of a tabular (-f 6) DIAMOND output, mapped back to the KO and contig they came from
+
+    Yields:
+    -------
+        (ko, contigID, fields), fields are the m8 columns after the query ID
+    """
+    with open(m8) as hits:
+        for line in hits:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 2:
+                continue
+            ko, _, contig = fields[0].partition(":")
+            yield ko, contig, fields[1:]
 
 
 class Annotation:
 
-    def prediamond(self, root, output):
-        """ Concatenates assembled contigs into one file so you can 
+    DIAMOND = "diamond blastx -q {query} -d {db} -o {out} -f 6 -p {threads} -t {tmp}"
+
+    def prediamond(self, root, output, processes=1, shards=1, compress=False):
+        """ Concatenates assembled contigs into one file so you can run DIAMOND on them
+
+        Contig IDs become <KO>:<contigID>. With shards > 1 the contigs are split over output.1 .. output.N,
+        whole KOs per shard, the largest KOs first onto the shard with the fewest bytes so far,
+        so the shards come out about the same size.
 
         Parameters:
         -----------
@@ -16,29 +76,148 @@ class Annotation:
                 path to root directory where contigs are kept
             output : str
                 path to the output file
+            processes : int
+                number of shards written at once
+            shards : int
+                number of output files
+            compress : bool
+                gzip the output(s), .gz is appended to the file names
+
+        Returns:
+        --------
+            list of output files
 
         Examples:
         ---------
             >>> annon = Annotation()
             >>> annon.prediamond("/path/to/root", "/path/to/output/file")
+            >>> annon.prediamond("/path/to/root", "/path/to/output/file", processes=8, shards=16, compress=True)
         """
-        with open(output, "w") as combined:
-            kos = os.listdir(root)
-            for ko in kos:
-                file = "{}/{}/454AllContigs.fna".format(root, ko)
-                with open(file, "r") as fa:
-                    for entry in SeqIO.parse(fa, format="fasta"):
-                        entry.id = "{}:{}".format(ko, entry.id)
-                        SeqIO.write(entry, combined, format="fasta")
-
-        bashCommand = """
-        qsub -N diamond_contigs -V -cwd -b y -q all.q -pe orte 24 \\
+        names, load = self.__shard(root, output, processes, shards, compress)
+        for name, size in zip(names, load):
+            print("{}\t{} bytes of contigs".format(name, size))
+
+        for i, name in enumerate(names):
+            bashCommand = """
+        qsub -N diamond_contigs{} -V -cwd -b y -q all.q -pe orte 24 \\
             docker run --rm \\
             -v /scratch/uesu/:/scratch \\
             -v {}:/w/query.fna \\
             etheleon/diamond:0.1 diamond blastx --log -v -c 1 -b10.0 \\
-            -q /w/query.fna -p 24 -t /scratch -d /scratch/db/nrfull.dmnd -o /scratch/output.m8 -f 6
-        """.format(output)
-        print(bashCommand)
+            -q /w/query.fna -p 24 -t /scratch -d /scratch/db/nrfull.dmnd -o /scratch/output{}.m8 -f 6
+            """.format("" if shards == 1 else i + 1, name, "" if shards == 1 else i + 1)
+            print(bashCommand)
+        return names
+
+    def __shard(self, root, output, processes, shards, compress):
+        """ Writes the renamed contigs of every KO under root into the shard files, returns (names, bytes per shard)
+        """
+        shards = max(int(shards), 1)
+        kos = [ko for ko in os.listdir(root) if os.path.isdir("{}/{}".format(root, ko))]
+        sizes = {}
+        for ko in kos:
+            try:
+                sizes[ko] = os.path.getsize("{}/{}/454AllContigs.fna".format(root, ko))
+            except OSError:
+                sizes[ko] = 0
+        kos.sort(key=lambda ko: sizes[ko], reverse=True)
+
+        #whole KOs onto the lightest shard, largest first
+        load = [0] * shards
+        shardOf = {}
+        for ko in kos:
+            shard = load.index(min(load))
+            shardOf[ko] = shard
+            load[shard] += sizes[ko]
+
+        names = [output] if shards == 1 else ["{}.{}".format(output, i + 1) for i in range(shards)]
+        if compress:
+            names = ["{}.gz".format(name) for name in names]
+        #each shard is written by one process, its KOs streamed straight into it
+        jobs = [(root, [ko for ko in kos if shardOf[ko] == i], name, compress) for i, name in enumerate(names)]
+        processes = min(int(processes), shards)
+        if processes > 1:
+            #leaving the with block terminates the pool, also when a worker raised
+            with mp.Pool(processes=processes) as pool:
+                pool.map(_writeShard, jobs, chunksize=1)
+        else:
+            for job in jobs:
+                _writeShard(job)
+
+        return names, load
+
+    def diamond(self, root, output, db, aligner=DIAMOND, shards=8, jobs=2, threads=4, processes=1, workdir=None):
+        """ Runs DIAMOND on the assembled contigs of every KO on this machine
+
+        The contigs are concatenated into shards (see prediamond), the aligner runs on at most jobs shards at once,
+        and the tabular outputs are merged into output in shard order. Query IDs stay <KO>:<contigID>,
+        use readHits(output) to get the KO and contig back.
+
+        Parameters:
+        -----------
+            root : str
+                path to root directory where contigs are kept
+            output : str
+                path to the merged .m8 file
+            db : str
+                DIAMOND database (.dmnd)
+            aligner : str
+                command template, {query} {db} {out} {threads} {tmp} are filled in per shard,
+                eg. a stand-in script for testing or a docker run wrapping diamond
+            shards : int
+                number of query files
+            jobs : int
+                number of aligner processes running at once
+            threads : int
+                threads per aligner process
+            processes : int
+                number of shards written at once
+            workdir : str
+                where shards and per shard outputs are kept, defaults to <output>.shards
+
+        Returns:
+        --------
+            dict with the merged output, the number of hits and the shards which failed
+
+        Examples:
+        ---------
+            >>> annon = Annotation()
+            >>> annon.diamond("/path/to/root", "/path/to/output.m8", "/path/to/db/nrfull.dmnd", shards=16, jobs=4, threads=6)
+        """
+        workdir = workdir or "{}.shards".format(output)
+        if not os.path.isdir(workdir):
+            os.makedirs(workdir)
+        queries, load = self.__shard(root, "{}/query.fna".format(workdir), processes, shards, False)
+
+        def align(query):
+            out = "{}.m8".format(query)
+            if os.path.isfile(out):
+                os.remove(out) #never merge hits left over from an earlier run
+            command = aligner.format(query=query, db=db, out=out, threads=threads, tmp=workdir)
+            print("Running: {}".format(command))
+            try:
+                subprocess.run(shlex.split(command), check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            except (subprocess.CalledProcessError, OSError) as err:
+                print("Error aligning {}:\n".format(query), getattr(err, "stderr", err))
+                return None
+            return out
+
+        queries = [query for query in queries if os.path.getsize(query) > 0]
+        with ThreadPoolExecutor(max_workers=max(int(jobs), 1)) as executor:
+            outputs = list(executor.map(align, queries))
+
+        failed = [query for query, out in zip(queries, outputs) if out is None or not os.path.isfile(out)]
+        hits = 0
+        with open(output, "wb") as merged:
+            for out in outputs:
+                if out is None or not os.path.isfile(out):
+                    continue
+                with open(out, "rb") as m8:
+                    for line in m8:
+                        merged.write(line)
+                        hits += 1
+        print("{} hits from {} of {} shards in {}".format(hits, len(queries) - len(failed), len(queries), output))
+        return {"output": output, "hits": hits, "failed": failed}
 if __name__ == '__main__':
+    import fire
     fire.Fire(Annotation)
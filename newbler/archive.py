@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import shutil
+import zlib
+
+from collections import defaultdict
+
+from .store import IndexedStore, StoreWriter, parseFasta
+
+NAME = re.compile(r'^alignment-(?P<taxon>.+?)-ref_(?P<accession>.+?)__')
+
+def parseName(name):
+    '''
+    (taxon, reference accession) of a pAss01 file name, (None, None) if it does not follow the pattern
+        alignment-Acetobacteraceae-ref_YP_001234352.1__phosphoglycerate_kinase__Acidiphilium_cryptum_JF_5-01767.fasta
+        -> ("Acetobacteraceae", "YP_001234352.1")
+    '''
+    match = NAME.match(name)
+    if match is None:
+        return None, None
+    return match.group('taxon'), match.group('accession')
+
+class ArchiveWriter:
+    '''
+    Packs pAss01 alignments into one IndexedStore (see store.py) keyed on the file name,
+    each block zlib compressed (tag "zlib") unless compress=False.
+    '''
+
+    def __init__(self, path, compress=True, level=6):
+        self.compress = compress
+        self.level = level
+        self.__store = StoreWriter(path)
+
+    def add(self, name, text):
+        data = text if isinstance(text, bytes) else text.encode()
+        if self.compress:
+            self.__store.write(name, zlib.compress(data, self.level), "zlib")
+        else:
+            self.__store.write(name, data)
+
+    def close(self):
+        self.__store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, traceback):
+        self.__store.__exit__(exc, value, traceback)
+
+def pack(directory, path, compress=True, remove=False):
+    """
+    packs every file in directory (eg. out/pAss01/K00927/) into the archive at path, in name order.
+    With remove the directory is deleted, but only after the archive has been reopened and holds every file
+    with its size (IOError otherwise, the directory is left alone). Returns the number of alignments packed
+    """
+    names = sorted(name for name in os.listdir(directory) if os.path.isfile(os.path.join(directory, name)))
+    with ArchiveWriter(path, compress) as archive:
+        for name in names:
+            with open(os.path.join(directory, name), 'rb') as fh:
+                archive.add(name, fh.read())
+    if remove:
+        verify(directory, path)
+        shutil.rmtree(directory)
+    return len(names)
+
+def verify(directory, path):
+    """
+    raises IOError unless the archive at path holds exactly the files of directory, each with the same number of bytes
+    """
+    names = sorted(name for name in os.listdir(directory) if os.path.isfile(os.path.join(directory, name)))
+    with AlignmentArchive(path) as archive:
+        if archive.names() != names:
+            raise IOError("%s does not hold the files of %s" % (path, directory))
+        for name in names:
+            if len(archive.data(name)) != os.path.getsize(os.path.join(directory, name)):
+                raise IOError("%s: %s differs in size from %s" % (path, name, os.path.join(directory, name)))
+
+class AlignmentArchive:
+    '''
+    Reads the per reference alignments of a KO (pAss01) from its packed archive or from the plain directory,
+    whichever is given, by file name, taxon or reference accession. Packed alignments are decompressed one at a time,
+    nothing is unpacked to disk.
+
+    Example:
+        >>> alignments = AlignmentArchive.open("/path/to/root", "K00927")
+        >>> alignments.accessions()[:2]
+        ['NP_069975.1', 'NP_104790.1']
+        >>> for name in alignments.byTaxon("Acetobacteraceae"):
+        ...     for seqID, description, seq in alignments.records(name):
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.__store = None
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)))
+        elif not os.path.isfile(path):
+            raise IOError("No such archive or directory: %s" % path)
+        else:
+            self.__store = IndexedStore(path, build=False)
+            if len(self.__store) == 0 and self.__store.size > 0:
+                raise IOError("Archive index missing or stale: %s.idx" % path)
+            names = sorted(self.__store.keys(), key=lambda name: self.__store.index[name][0])
+        self.__names = names
+        self.__known = set(names)
+        self.__taxa = defaultdict(list)
+        self.__accessions = defaultdict(list)
+        for name in names:
+            taxon, accession = parseName(name)
+            if taxon is not None:
+                self.__taxa[taxon].append(name)
+                self.__accessions[accession].append(name)
+
+    @classmethod
+    def open(cls, rootPath, ko):
+        """
+        the KO's packed archive (out/pAss01/<KO>.pack) if there is one, else its directory (out/pAss01/<KO>/)
+        """
+        packed = "%s/out/pAss01/%s.pack" % (rootPath, ko)
+        return cls(packed if os.path.isfile(packed) else "%s/out/pAss01/%s" % (rootPath, ko))
+
+    def isPacked(self):
+        return self.__store is not None
+
+    def names(self):
+        return list(self.__names)
+
+    def __len__(self):
+        return len(self.__names)
+
+    def __iter__(self):
+        return iter(self.__names)
+
+    def __contains__(self, name):
+        return name in self.__known
+
+    def taxa(self):
+        return sorted(self.__taxa)
+
+    def accessions(self):
+        return sorted(self.__accessions)
+
+    def byTaxon(self, taxon):
+        return list(self.__taxa.get(taxon, []))
+
+    def byAccession(self, accession):
+        return list(self.__accessions.get(accession, []))
+
+    def data(self, name):
+        """
+        the alignment as it was packed, in bytes
+        """
+        if self.__store is None:
+            with open(os.path.join(self.path, name), 'rb') as fh:
+                return fh.read()
+        data = self.__store.raw(name)
+        if self.__store.tag(name) == "zlib":
+            data = zlib.decompress(data)
+        return bytes(data)
+
+    def read(self, name):
+        """
+        the alignment as FASTA text
+        """
+        if self.__store is None:
+            with open(os.path.join(self.path, name)) as fh:
+                return fh.read()
+        return self.data(name).decode()
+
+    def records(self, name):
+        """
+        yields (id, description, seq) of the alignment's records
+        """
+        return parseFasta(self.read(name))
+
+    def items(self, taxon=None, accession=None):
+        """
+        yields (name, text) of every alignment, or only those of taxon / accession, in archive order
+        """
+        if taxon is not None:
+            names = self.byTaxon(taxon)
+        elif accession is not None:
+            names = self.byAccession(accession)
+        else:
+            names = self.__names
+        for name in names:
+            yield name, self.read(name)
+
+    def close(self):
+        if self.__store is not None:
+            self.__store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
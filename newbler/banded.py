@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+
+from .store import parseFasta
+
+NEG = float('-inf')
+
+class BandedAligner:
+    '''
+    Realigns a contig pileup without running an external MSA.
+
+    The pileup already places every read on the contig (offset:<n> in the header, see PileupRead),
+    only small local shifts and indels need fixing. Each read is aligned on its own against the contig
+    around its expected offset (affine gap, the whole read against any stretch of the contig, at most
+    band positions off the expected diagonal). The pairwise alignments are merged into one MSA by giving
+    every contig position as many insertion columns as the longest insertion any read has there.
+
+    Cost is linear in the number of reads, each read costs len(read) * (2 * band + 1) cells.
+
+    Example:
+        >>> aligner = BandedAligner(band=10)
+        >>> msa = aligner.align(pileupBlock)   # same FASTA layout as muscle's output
+    '''
+
+    def __init__(self, band=10, match=1, mismatch=-2, gapOpen=-4, gapExtend=-1):
+        self.band      = band
+        self.match     = match
+        self.mismatch  = mismatch
+        self.gapOpen   = gapOpen
+        self.gapExtend = gapExtend
+
+    def align(self, pileup):
+        """
+        aligns a pileup block (contig record first, then its reads) and returns the MSA as FASTA text
+        """
+        records = list(parseFasta(pileup))
+        if not records:
+            return ""
+        contigID, contigHeader, contig = records[0]
+        contig = contig.upper()
+        #insertions[p + 1] is the widest insertion after contig position p, p = -1 is before the contig
+        insertions = [0] * (len(contig) + 1)
+        placed = []
+        for recordID, description, seq in records[1:]:
+            offset, read = self.__unpad(description, seq)
+            start, columns, inserted = self.pairwise(contig, read.upper(), offset)
+            for p, bases in inserted.items():
+                insertions[p + 1] = max(insertions[p + 1], len(bases))
+            placed.append((description, start, columns, inserted))
+        out = [">%s\n%s\n" % (contigHeader, self.__render(contig, 0, contig, {}, insertions))]
+        for description, start, columns, inserted in placed:
+            out.append(">%s\n%s\n" % (description, self.__render(contig, start, columns, inserted, insertions)))
+        return "".join(out)
+
+    def pairwise(self, contig, read, offset):
+        """
+        affine gap alignment of the whole read against contig, within band of offset.
+        returns (start, columns, inserted):
+            start    : first contig position covered by the read
+            columns  : the read's character ('-' for a deletion) for each contig position from start on
+            inserted : {contig position: read bases inserted after it}, -1 for bases before the contig
+        an empty read covers nothing, (offset, "", {})
+        """
+        m, band = len(read), self.band
+        if m == 0:
+            return min(max(offset, 0), len(contig)), "", {}
+        lo = max(0, min(offset, len(contig)) - band)
+        hi = min(len(contig), offset + m + band)
+        ref = contig[lo:hi]
+        width, diag = len(ref), offset - lo
+        gapFirst = self.gapOpen + self.gapExtend
+
+        def bounds(i):
+            jlo = min(max(0, i + diag - band), width)
+            return jlo, max(min(width, i + diag + band), jlo)
+
+        # M: read base on contig base, X: read base inserted, Y: contig base skipped
+        # traceback holds, per state, the state the best score came from (0 M, 1 X, 2 Y)
+        #the read may start anywhere within the band, free in M
+        jlo, jhi = bounds(0)
+        prev = ({j: 0 for j in range(jlo, jhi + 1)}, {}, {})
+        rows = [None]
+        for i in range(1, m + 1):
+            pM, pX, pY = prev
+            M, X, Y = {}, {}, {}
+            tM, tX, tY = {}, {}, {}
+            base = read[i - 1]
+            jlo, jhi = bounds(i)
+            for j in range(jlo, jhi + 1):
+                #read base i inserted, contig position unchanged
+                openX, extX = pM.get(j, NEG) + gapFirst, pX.get(j, NEG) + self.gapExtend
+                X[j], tX[j] = (openX, 0) if openX >= extX else (extX, 1)
+                #read base i on contig position j
+                if j > 0:
+                    best, state = pM.get(j - 1, NEG), 0
+                    if pX.get(j - 1, NEG) > best:
+                        best, state = pX[j - 1], 1
+                    if pY.get(j - 1, NEG) > best:
+                        best, state = pY[j - 1], 2
+                    M[j], tM[j] = best + (self.match if ref[j - 1] == base else self.mismatch), state
+                else:
+                    M[j], tM[j] = NEG, 0
+                #contig position j skipped by the read
+                if j > jlo:
+                    openY, extY = M[j - 1] + gapFirst, Y[j - 1] + self.gapExtend
+                    Y[j], tY[j] = (openY, 0) if openY >= extY else (extY, 2)
+                else:
+                    Y[j], tY[j] = NEG, 2
+            rows.append((tM, tX, tY))
+            prev = (M, X, Y)
+        #the read may end anywhere on the contig, never on a skipped contig base
+        M, X, Y = prev
+        score, end, state = NEG, None, 0
+        for j in sorted(M):
+            for value, s in ((M[j], 0), (X[j], 1)):
+                if value > score:
+                    score, end, state = value, j, s
+        return self.__trace(rows, read, lo, end, state)
+
+    def __trace(self, rows, read, lo, j, state):
+        i = len(read)
+        columns, inserted = [], {}
+        while i > 0:
+            tM, tX, tY = rows[i]
+            if state == 0:
+                columns.append(read[i - 1])
+                state = tM[j]
+                i, j = i - 1, j - 1
+            elif state == 1:
+                inserted[lo + j - 1] = read[i - 1] + inserted.get(lo + j - 1, "")
+                state = tX[j]
+                i = i - 1
+            else:
+                columns.append("-")
+                state = tY[j]
+                j = j - 1
+        columns.reverse()
+        return lo + j, "".join(columns), inserted
+
+    def __unpad(self, description, seq):
+        coords = re.search(r"offset:(\d+) length:(\d+)", description)
+        if coords:
+            offset, length = int(coords.group(1)), int(coords.group(2))
+            return offset, seq[offset : offset + length].replace("-", "")
+        #older pileups, only the dash padding tells where the read sits
+        stripped = seq.lstrip("-")
+        return len(seq) - len(stripped), stripped.replace("-", "")
+
+    def __render(self, contig, start, columns, inserted, insertions):
+        #bases before the contig stay next to the read, the others follow their contig position
+        row = [inserted.get(-1, "").rjust(insertions[0], "-")]
+        end = start + len(columns)
+        for p in range(len(contig)):
+            row.append(columns[p - start] if start <= p < end else "-")
+            width = insertions[p + 1]
+            if width:
+                row.append(inserted.get(p, "").ljust(width, "-"))
+        return "".join(row)
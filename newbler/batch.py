@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import traceback
+
+from .pipeline import Pipeline
+from .         import metrics
+from .store    import IndexedStore
+
+BUDGET = None
+STAGES = ('pileup', 'realignment', 'extraction')
+
+def warm():
+    """
+    imports the libraries the stages load lazily, called in the parent before the pool forks
+    so the workers start with them already in memory instead of each importing them again
+    """
+    import pandas
+    from Bio import SeqIO
+
+def initWorker(budget, metricsPath=None):
+    """
+    hands the shared muscle CPU budget and the metrics file to each pool worker,
+    workers live for the whole run so imports and per process caches (eg. FastqCache) stay warm between batches
+    """
+    global BUDGET
+    BUDGET = budget
+    metrics.configure(metricsPath)
+
+def koSize(root, ko):
+    """
+    bytes of the KO's binned fastQ, 0 if missing
+    """
+    size = 0
+    for i in ("1", "2"):
+        try:
+            size += os.path.getsize("%s/out/newbler/%s/input/%s.%s.fq" % (root, ko, ko, i))
+        except OSError:
+            pass
+    return size
+
+def planBatches(root, kos, batchBytes):
+    '''
+    Groups KOs into pool tasks of about batchBytes of fastQ each.
+    KOs at least batchBytes big get a task of their own, the small ones are packed together,
+    largest tasks first so the long ones do not trail at the end. batchBytes <= 0 gives one KO per task.
+    '''
+    sizes = {ko: koSize(root, ko) for ko in kos}
+    ordered = sorted(kos, key=lambda ko: sizes[ko], reverse=True)
+    if batchBytes <= 0:
+        return [[ko] for ko in ordered]
+    batches, current, total = [], [], 0
+    for ko in ordered:
+        if sizes[ko] >= batchBytes:
+            batches.append([ko])
+            continue
+        current.append(ko)
+        total += sizes[ko]
+        if total >= batchBytes:
+            batches.append(current)
+            current, total = [], 0
+    if current:
+        batches.append(current)
+    return batches
+
+def runKO(root, ko, threads=1, force=False, aligner="banded", stages=STAGES, msaCache=None, recomputeMDR=False):
+    """
+    runs the stages of one KO, returns its result:
+        ko, status ({stage: done | skipped | failed}), contigsInMDR, readsExtracted,
+        timings ({stage: seconds}), seconds (total), error (traceback if the KO raised)
+    """
+    started = time.time()
+    result = {'ko': ko, 'status': {}, 'contigsInMDR': 0, 'readsExtracted': 0, 'timings': {}, 'error': None}
+    pipeline = Pipeline(root, ko, threads=threads, budget=BUDGET, force=force, aligner=aligner, msaCache=msaCache, recomputeMDR=recomputeMDR)
+    try:
+        result['status'] = pipeline.run(list(stages))
+    except Exception:
+        result['error'] = traceback.format_exc()
+        print("%s failed:\n%s" % (ko, result['error']))
+    result['timings'] = pipeline.timings
+    pileup = "%s/out/pileup/%s/%s.pileup" % (root, ko, ko)
+    if os.path.isfile(pileup):
+        with IndexedStore(pileup) as pileups:
+            result['contigsInMDR'] = len(pileups.keys())
+    extracted = "%s/out/preNewbler/%s/%s" % (root, ko, ko)
+    if os.path.isfile(extracted):
+        with open(extracted, 'rb') as reads:
+            result['readsExtracted'] = sum(1 for line in reads if line.startswith(b">"))
+    result['seconds'] = time.time() - started
+    return result
+
+def runBatch(root, kos, threads=1, force=False, aligner="banded", stages=STAGES, msaCache=None, recomputeMDR=False):
+    """
+    runs several KOs one after the other in the same worker, one failing KO does not stop the others
+    """
+    return [runKO(root, ko, threads, force, aligner, stages, msaCache, recomputeMDR) for ko in kos]
+
+def summarize(results, wall=None):
+    """
+    aggregates the per KO results of a run
+    """
+    failed = [r['ko'] for r in results if r['error'] is not None or 'failed' in r['status'].values()]
+    stageSeconds = {}
+    for r in results:
+        for stage, seconds in r['timings'].items():
+            stageSeconds[stage] = stageSeconds.get(stage, 0.0) + seconds
+    slowest = sorted(results, key=lambda r: r['seconds'], reverse=True)[:5]
+    return {
+        'kos'            : len(results),
+        'done'           : sum(1 for r in results if r['ko'] not in failed and 'done' in r['status'].values()),
+        'skipped'        : sum(1 for r in results if r['status'] and all(s == 'skipped' for s in r['status'].values())),
+        'failed'         : failed,
+        'contigsInMDR'   : sum(r['contigsInMDR'] for r in results),
+        'readsExtracted' : sum(r['readsExtracted'] for r in results),
+        'stageSeconds'   : stageSeconds,
+        'koSeconds'      : sum(r['seconds'] for r in results),
+        'wallSeconds'    : wall,
+        'slowest'        : [(r['ko'], round(r['seconds'], 2)) for r in slowest]
+    }
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import time
+
+class AssemblyCache:
+    '''
+    Content addressed cache of newbler results, so rerunning an assembly on the same reads with the same flags is a lookup.
+
+    The key is a sha1 over the runAssembly command line with every input file replaced by the sha1 of its content.
+    -o, -cpu, -m and -force are left out, they decide where and how fast newbler runs, not what it assembles.
+    Entries hold the files listed in FILES:
+
+        <directory>/<key[:2]>/<key>/454AllContigs.fna ...
+        <directory>/<key[:2]>/<key>/command.json       the normalized command the key was built from
+
+    Cached files are read only, a hit copies them into the KO's directory. With link=True they are hardlinked instead
+    (copied across file systems), the restored results then share the cached inode and have to be unlinked
+    (see release(), Newbler does it before every run) before newbler writes in that directory again,
+    newbler truncates its outputs in place and would otherwise overwrite the cached copy.
+    Entries are evicted least recently used first (a hit touches the entry) once the cache is over maxBytes.
+
+    Example:
+        >>> cache = AssemblyCache("/path/to/cache", maxBytes=200 * 2**30)
+        >>> Newbler("out/preNewbler", "K00927", 4, cache=cache).mdrCentricAssembly()
+    '''
+
+    FILES = ["454AllContigs.fna", "454PairStatus.txt", "454ReadStatus.txt", "454NewblerProgress.txt"]
+    IGNORED = {'-cpu': 1, '-o': 1, '-m': 0, '-force': 0}
+
+    def __init__(self, directory, maxBytes=100 * 2**30, link=False):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.link = link
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(path, blockSize=1 << 20):
+        sha = hashlib.sha1()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(blockSize), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def normalize(self, cmd):
+        """
+        the command as the list the key is built from: assembler name, flags and the sha1 of each input file
+        """
+        tokens = shlex.split(cmd)
+        normalized = [os.path.basename(tokens[0])]
+        i = 1
+        while i < len(tokens):
+            token = tokens[i]
+            if token in self.IGNORED:
+                i += 1 + self.IGNORED[token]
+                continue
+            normalized.append("sha1:%s" % self.digest(token) if os.path.isfile(token) else token)
+            i += 1
+        return normalized
+
+    def key(self, cmd):
+        return hashlib.sha1(json.dumps(self.normalize(cmd)).encode()).hexdigest()
+
+    def path(self, key):
+        return "%s/%s/%s" % (self.directory, key[:2], key)
+
+    def __contains__(self, key):
+        return all(os.path.isfile("%s/%s" % (self.path(key), name)) for name in self.FILES)
+
+    def restore(self, key, outputDir):
+        """
+        puts the cached files of key into outputDir, returns False (leaving outputDir as it was) if key is not cached
+        """
+        if key not in self:
+            return False
+        entry = self.path(key)
+        os.makedirs(outputDir, exist_ok=True)
+        try:
+            for name in self.FILES:
+                target = "%s/%s" % (outputDir, name)
+                if os.path.lexists(target):
+                    os.remove(target)
+                self.__place("%s/%s" % (entry, name), target)
+            os.utime(entry)
+        except OSError as err:
+            #evicted from under us by another worker
+            print("Could not restore %s from the assembly cache: %s" % (key, err))
+            return False
+        return True
+
+    def __place(self, source, target):
+        if self.link:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, target)
+
+    @classmethod
+    def release(cls, outputDir):
+        """
+        unlinks results in outputDir that share their inode with a cache entry
+        """
+        for name in cls.FILES:
+            target = "%s/%s" % (outputDir, name)
+            try:
+                if os.stat(target).st_nlink > 1:
+                    os.remove(target)
+            except OSError:
+                pass
+
+    def store(self, key, outputDir, cmd=None):
+        """
+        copies the results in outputDir into the cache under key, then evicts down to maxBytes.
+        Returns False if a result file is missing
+        """
+        if key in self:
+            os.utime(self.path(key))
+            return True
+        if not all(os.path.isfile("%s/%s" % (outputDir, name)) for name in self.FILES):
+            return False
+        entry = self.path(key)
+        tmp = "%s.%s.tmp" % (entry, os.getpid())
+        os.makedirs(tmp, exist_ok=True)
+        for name in self.FILES:
+            shutil.copyfile("%s/%s" % (outputDir, name), "%s/%s" % (tmp, name))
+            os.chmod("%s/%s" % (tmp, name), 0o444)
+        with open("%s/command.json" % tmp, "w") as fh:
+            json.dump({'command': cmd, 'normalized': None if cmd is None else self.normalize(cmd), 'stored': time.time()}, fh, indent=4)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            #another worker stored the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+        return True
+
+    def entries(self):
+        """
+        list of (last used, bytes, path) of the complete entries
+        """
+        found = []
+        for prefix in os.listdir(self.directory):
+            prefixDir = "%s/%s" % (self.directory, prefix)
+            if not os.path.isdir(prefixDir):
+                continue
+            for key in os.listdir(prefixDir):
+                if key.endswith(".tmp"):
+                    continue
+                entry = "%s/%s" % (prefixDir, key)
+                try:
+                    size = sum(os.path.getsize("%s/%s" % (entry, name)) for name in os.listdir(entry))
+                    found.append((os.stat(entry).st_mtime, size, entry))
+                except OSError:
+                    continue
+        return found
+
+    def evict(self):
+        """
+        removes the least recently used entries until the cache fits in maxBytes, returns the bytes freed
+        """
+        entries = sorted(self.entries())
+        total = sum(size for used, size, entry in entries)
+        freed = 0
+        for used, size, entry in entries:
+            if total - freed <= self.maxBytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            freed += size
+        return freed
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+from array       import array
+from collections import OrderedDict
+
+import numpy as np
+
+def preflight(filePath, sampleBytes=0):
+    '''
+    Checks a fastQ (or FASTA, eg. the preNewbler/<KO>/<KO> reads of round two) file without reading it end to end.
+
+    Returns a dict with:
+        exists   : the file is there
+        nonEmpty : it is non-empty and starts with a fastQ (@) or FASTA (>) record
+        size     : size in bytes
+        reads    : estimated number of reads (None unless sampleBytes > 0)
+        bases    : estimated number of bases (None unless sampleBytes > 0)
+
+    The estimates come from the records in the first sampleBytes of the file,
+    they are exact when the whole file fits in the sample.
+    '''
+    info = {'exists': os.path.isfile(filePath), 'nonEmpty': False, 'size': 0, 'reads': None, 'bases': None}
+    if not info['exists']:
+        return info
+    info['size'] = os.path.getsize(filePath)
+    if info['size'] == 0:
+        info['reads'], info['bases'] = 0, 0
+        return info
+    with open(filePath, 'rb') as fq:
+        head = fq.read(max(sampleBytes, 1))
+    first = head.lstrip()[:1]
+    info['nonEmpty'] = first in (b'@', b'>')
+    if sampleBytes > 0 and info['nonEmpty']:
+        lines = head.split(b'\n')
+        wholeFile = len(head) >= info['size']
+        if not wholeFile:
+            lines = lines[:-1] #last line is cut short
+        if first == b'>':
+            records, recordBytes, seqBases = _sampleFasta(lines, wholeFile)
+        else:
+            records = len(lines) // 4
+            recordBytes = sum(len(line) + 1 for line in lines[:records * 4])
+            seqBases = sum(len(lines[i * 4 + 1].rstrip()) for i in range(records))
+        if records == 0:
+            #a single record longer than the sample
+            info['reads'], info['bases'] = 1, info['size'] // 2
+            return info
+        if wholeFile:
+            info['reads'], info['bases'] = records, seqBases
+        else:
+            info['reads'] = int(round(info['size'] * records / recordBytes))
+            info['bases'] = int(round(info['size'] * seqBases / recordBytes))
+    return info
+
+def _sampleFasta(lines, wholeFile):
+    """
+    (records, bytes, bases) of the FASTA records in lines, unless wholeFile the last record may be cut short and is left out
+    """
+    starts = [i for i, line in enumerate(lines) if line.startswith(b'>')]
+    if not wholeFile and len(starts) > 1:
+        lines = lines[:starts[-1]]
+        starts = starts[:-1]
+    recordBytes = sum(len(line) + 1 for line in lines)
+    seqBases = sum(len(line.rstrip()) for line in lines if not line.startswith(b'>'))
+    return len(starts), recordBytes, seqBases
+
+def readFastq(filePath, quality=False):
+    '''
+    Plain fastQ reader, much lighter than building Biopython SeqRecords.
+    yields (description, seq), or (description, seq, qual) with quality=True.
+    Records are expected on 4 lines each, as newbler and the binning step write them.
+    '''
+    with open(filePath) as fq:
+        for header in fq:
+            if not header.strip():
+                continue
+            seq = fq.readline().rstrip("\n")
+            fq.readline()
+            qual = fq.readline()
+            if quality:
+                yield header[1:].rstrip("\n"), seq, qual.rstrip("\n")
+            else:
+                yield header[1:].rstrip("\n"), seq
+
+class FastqMate:
+    '''
+    The reads of one fastQ file held column wise:
+        ids     : int64 read ID, the part of the header before the first |, -1 if not numeric
+        taxa    : int64 taxon ID, the second | field, -1 if missing
+        offsets : where each sequence starts in one shared buffer of all sequences
+    '''
+
+    def __init__(self, filePath):
+        ids, taxa, offsets = array('q'), array('q'), array('q', [0])
+        chunks = []
+        size = 0
+        for description, seq in readFastq(filePath):
+            fields = description.split("|", 2)
+            ids.append(int(fields[0]) if fields[0].isdigit() else -1)
+            taxa.append(int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else -1)
+            chunks.append(seq)
+            size += len(seq)
+            offsets.append(size)
+        self.filePath = filePath
+        self.ids = np.frombuffer(ids, dtype=np.int64)
+        self.taxa = np.frombuffer(taxa, dtype=np.int64)
+        self.offsets = np.frombuffer(offsets, dtype=np.int64)
+        self.buffer = "".join(chunks)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def seq(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]]
+
+class FastqCache:
+    '''
+    Both mates of a KO's fastQ (out/newbler/<KO>/input/<KO>.{1,2}.fq) parsed once.
+    FastqCache.load keeps the most recently loaded KOs in memory, keyed on path, size and modification time,
+    so the pileup and the extraction stages of a KO share one parse, also across Alignment objects.
+
+    Example:
+        >>> reads = FastqCache.load("/path/to/root", "K00927")
+        >>> mate = reads.mates[0]
+        >>> mate.ids[0], mate.taxa[0], mate.seq(0)
+    '''
+
+    keep = 1
+    __loaded = OrderedDict()
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.mates = [FastqMate(path) for path in paths]
+
+    @classmethod
+    def load(cls, rootPath, ko):
+        paths = ["%s/out/newbler/%s/input/%s.%s.fq" % (rootPath, ko, ko, i) for i in ("1", "2")]
+        key = tuple((path, os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in paths)
+        if key in cls.__loaded:
+            cls.__loaded.move_to_end(key)
+        else:
+            cls.__loaded[key] = cls(paths)
+            while len(cls.__loaded) > cls.keep:
+                cls.__loaded.popitem(last=False)
+        return cls.__loaded[key]
+
+    @classmethod
+    def clear(cls):
+        """
+        drops every loaded KO, the next load parses the files again
+        """
+        cls.__loaded.clear()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from .store import IndexedStore
+
+COMPLEMENT = str.maketrans("ACGTNacgtn", "TGCANtgcan")
+
+def reverseComplement(seq):
+    return seq.translate(COMPLEMENT)[::-1]
+
+class Placement:
+    '''
+    Where a query (eg. the ungapped MDR) sits on a contig.
+    start/end are 0-based contig coordinates, strand is '-' if the reverse complement of the query matched,
+    mismatches counts substitutions, or edits (substitutions and 1 bp indels) when the query was placed across an indel,
+    score is 1 - mismatches / query length.
+    '''
+    __slots__ = ('contig', 'start', 'end', 'strand', 'mismatches', 'score')
+
+    def __init__(self, contig, start, end, strand, mismatches, score):
+        self.contig = contig
+        self.start = start
+        self.end = end
+        self.strand = strand
+        self.mismatches = mismatches
+        self.score = score
+
+    def __repr__(self):
+        return "Placement(%s:%s-%s %s mismatches:%s score:%.3f)" % (self.contig, self.start, self.end, self.strand, self.mismatches, self.score)
+
+class KmerIndex:
+    '''
+    k-mer anchors over the contigs of a KO for placing MDR sequences on them.
+
+    locate() first tries an exact match on both strands, otherwise the k-mers of the query and of
+    its reverse complement vote for a diagonal (contig position - query position) in the same pass.
+    The best supported diagonals are scored by mismatches, with N matching anything,
+    and the best one is returned if it has at most maxMismatches. Failing that, the query is aligned with indels
+    (edit distance, within maxMismatches columns of each candidate diagonal) so that the homopolymer indels
+    of 454 contigs do not leave an MDR unplaced.
+    A contig's k-mer table is only built the first time an exact match on it misses.
+
+    Built once per KO, either from a dict of sequences or over 454AllContigs.fna (fromFasta),
+    whose contigs are then read from the file when first located.
+
+    Example:
+        >>> index = KmerIndex.fromFasta("out/newbler/K00927/454AllContigs.fna")
+        >>> index.locate('contig00001', mdr)
+        Placement(contig00001:120-407 + mismatches:1 score:0.997)
+    '''
+
+    def __init__(self, contigs=None, k=12, maxMismatches=None, candidates=3):
+        self.k = k
+        self.maxMismatches = maxMismatches
+        self.candidates = candidates
+        self.seqs = {}
+        self.kmers = {}
+        self.store = None
+        for contigID, seq in (contigs or {}).items():
+            self.add(contigID, seq)
+
+    @classmethod
+    def fromFasta(cls, path, **kwargs):
+        index = cls(**kwargs)
+        index.store = IndexedStore(path)
+        return index
+
+    def add(self, contigID, seq):
+        self.seqs[contigID] = str(seq).upper()
+        self.kmers.pop(contigID, None)
+
+    def sequence(self, contigID):
+        if contigID not in self.seqs:
+            self.seqs[contigID] = self.store.sequence(contigID).upper()
+        return self.seqs[contigID]
+
+    def __kmers(self, contigID):
+        if contigID not in self.kmers:
+            seq = self.seqs[contigID]
+            kmers = defaultdict(list)
+            for i in range(len(seq) - self.k + 1):
+                kmers[seq[i:i + self.k]].append(i)
+            self.kmers[contigID] = kmers
+        return self.kmers[contigID]
+
+    def __contains__(self, contigID):
+        return contigID in self.seqs or (self.store is not None and contigID in self.store)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def locate(self, contigID, query, maxMismatches=None):
+        """
+        best Placement of query on contigID, None if it cannot be placed within maxMismatches
+        (default: self.maxMismatches, or 5% of the query length, at least 2)
+        """
+        seq = self.sequence(contigID)
+        query = query.upper()
+        if len(query) == 0:
+            return None
+        if maxMismatches is None:
+            maxMismatches = self.maxMismatches if self.maxMismatches is not None else max(2, len(query) // 20)
+        queries = {'+': query, '-': reverseComplement(query)}
+        for strand in ('+', '-'):
+            start = seq.find(queries[strand])
+            if start != -1:
+                return Placement(contigID, start, start + len(query), strand, 0, 1.0)
+        votes = defaultdict(int)
+        kmers = self.__kmers(contigID)
+        for strand in ('+', '-'):
+            q = queries[strand]
+            for i in range(len(q) - self.k + 1):
+                for position in kmers.get(q[i:i + self.k], ()):
+                    votes[(strand, position - i)] += 1
+        best = None
+        candidates = sorted(votes.items(), key=lambda vote: vote[1], reverse=True)[:self.candidates]
+        for (strand, diagonal), count in candidates:
+            mismatches = self.__mismatches(seq, queries[strand], diagonal)
+            if best is None or mismatches < best.mismatches:
+                start = max(diagonal, 0)
+                best = Placement(contigID, start, min(diagonal + len(query), len(seq)), strand, mismatches, 1 - mismatches / len(query))
+        if best is not None and best.mismatches > maxMismatches:
+            for (strand, diagonal), count in candidates:
+                edits, start, end = self.__edits(seq, queries[strand], diagonal, maxMismatches)
+                if edits < best.mismatches:
+                    best = Placement(contigID, start, end, strand, edits, 1 - edits / len(query))
+        if best is None or best.mismatches > maxMismatches:
+            return None
+        return best
+
+    def __edits(self, seq, query, diagonal, band):
+        """
+        (edits, start, end) of the best alignment of the whole query on seq[start:end],
+        searched within band bases either side of the diagonal; N matches anything
+        """
+        lo = max(0, diagonal - band)
+        ref = seq[lo:min(len(seq), diagonal + len(query) + band)]
+        #previous[j]: edits of the query so far ending before ref[j], starts[j]: where in ref that alignment began
+        previous, starts = [0] * (len(ref) + 1), list(range(len(ref) + 1))
+        for i, base in enumerate(query, 1):
+            current, currentStarts = [i] + [0] * len(ref), [0] * (len(ref) + 1)
+            for j in range(1, len(ref) + 1):
+                diagonalCost = previous[j - 1] + (0 if base == ref[j - 1] or base == 'N' or ref[j - 1] == 'N' else 1)
+                current[j], currentStarts[j] = diagonalCost, starts[j - 1]
+                if previous[j] + 1 < current[j]:
+                    current[j], currentStarts[j] = previous[j] + 1, starts[j]
+                if current[j - 1] + 1 < current[j]:
+                    current[j], currentStarts[j] = current[j - 1] + 1, currentStarts[j - 1]
+            previous, starts = current, currentStarts
+        end = min(range(len(ref) + 1), key=lambda j: previous[j])
+        return previous[end], lo + starts[end], lo + end
+
+    def __mismatches(self, seq, query, diagonal):
+        """
+        mismatches of query laid on seq from diagonal, bases hanging off either end count as mismatches
+        """
+        mismatches = 0
+        for i, base in enumerate(query):
+            j = diagonal + i
+            if j < 0 or j >= len(seq):
+                mismatches += 1
+            elif base != seq[j] and base != 'N' and seq[j] != 'N':
+                mismatches += 1
+        return mismatches
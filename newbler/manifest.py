@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import time
+
+class Manifest:
+    '''
+    Records which pipeline stages have completed for a KO and the state of their inputs at the time.
+    One JSON file per KO and stage:
+
+        out/manifest/K0000X/<stage>.json
+        {
+            "inputs"   : {"<path>": [size, mtime_ns], ...},
+            "outputs"  : ["<path>", ...],
+            "finished" : <epoch seconds>
+        }
+
+    A stage is done when its manifest exists, every input fingerprint matches and every output still exists.
+    '''
+
+    def __init__(self, rootPath, ko):
+        self.rootPath = rootPath
+        self.ko = ko
+        self.dir = "%s/out/manifest/%s" % (rootPath, ko)
+
+    @staticmethod
+    def fingerprint(path):
+        """
+        cheap fingerprint of a file: size and modification time, None if missing
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def path(self, stage):
+        return "%s/%s.json" % (self.dir, stage)
+
+    def load(self, stage):
+        try:
+            with open(self.path(stage)) as fh:
+                return json.load(fh)
+        except (IOError, ValueError):
+            return None
+
+    def isDone(self, stage, inputs):
+        entry = self.load(stage)
+        if entry is None:
+            return False
+        if sorted(entry['inputs']) != sorted(inputs):
+            return False
+        if any(entry['inputs'][path] != self.fingerprint(path) for path in inputs):
+            return False
+        return all(os.path.exists(path) for path in entry['outputs'])
+
+    def record(self, stage, inputs, outputs):
+        os.makedirs(self.dir, exist_ok=True)
+        entry = {
+            'inputs'   : {path: self.fingerprint(path) for path in inputs},
+            'outputs'  : list(outputs),
+            'finished' : time.time()
+        }
+        #write then rename so a crash never leaves a half written manifest behind
+        with open(self.path(stage) + ".tmp", "w") as fh:
+            json.dump(entry, fh, indent=4)
+        os.replace(self.path(stage) + ".tmp", self.path(stage))
+
+    def invalidate(self, stage):
+        try:
+            os.remove(self.path(stage))
+        except OSError:
+            pass
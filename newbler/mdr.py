@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from .msa import GAP, MSAMatrix
+
+class MDR:
+    '''
+    Finds the maximum diversity region (MDR) of a KO from its pAss03 contig alignment (see msa.MSAMatrix),
+    for KOs pAss has not produced a pAss11 file for.
+
+    On the K00927 fixture best() and members() reproduce pAss11 (msaStart, msaEND, spanning and the contigs kept)
+    and totalSequences() the msaTotSeq of pAss10. windows() has the layout of pAss10 and the same window starts,
+    but about 3% of the window ends are one column off and some spanning counts differ.
+    maxSeq() and coverage() are this module's own measures, they do not reproduce pAss10's maxSeq.10bp or pAss04.
+    As the results are not pAss's, pileup.Alignment only falls back on best() when asked to (recomputeMDR, tryPileup --recomputeMDR).
+
+    Every window starts at a column and ends at the first column where the sequences spanning the whole window
+    carry on average minLength residues inside it. The MDR is the window spanned by the most sequences.
+
+    Example:
+        >>> mdr = MDR.fromFile("/path/to/root/out/pAss03/K00927.msa", "K00927")
+        >>> mdr.best()
+        {'msaStart': 1680, 'msaEND': 1967, 'spanning': 321, 'lens': 200.12...}
+        >>> mdr.windows()     # pAss10/<KO>/<KO> table
+        >>> mdr.coverage()    # pAss04/<KO>.csv table
+    '''
+
+    def __init__(self, ids, matrix, ko="", minLength=200):
+        self.ids = ids
+        self.matrix = matrix
+        self.ko = ko
+        self.minLength = minLength
+        self.residues = matrix != GAP
+        rows, width = matrix.shape
+        hasResidue = self.residues.any(axis=1)
+        #first and last column with a residue, empty rows never span anything
+        self.first = np.where(hasResidue, np.argmax(self.residues, axis=1), width)
+        self.last = np.where(hasResidue, width - 1 - np.argmax(self.residues[:, ::-1], axis=1), -1)
+        #cumulative residue counts, residues in [s, e) of row r = cumulative[r, e] - cumulative[r, s]
+        self.cumulative = np.zeros((rows, width + 1), dtype=np.int32)
+        np.cumsum(self.residues, axis=1, out=self.cumulative[:, 1:])
+        self.__windows = None
+
+    @classmethod
+    def fromFile(cls, filePath, ko="", minLength=200, cacheDir=None):
+        msa = MSAMatrix(filePath, cacheDir)
+        return cls(msa.ids, msa.matrix, ko, minLength)
+
+    def totalSequences(self):
+        """
+        number of sequences with at least minLength residues (msaTotSeq)
+        """
+        return int((self.cumulative[:, -1] >= self.minLength).sum())
+
+    def maxSeq(self, window=10):
+        """
+        highest mean number of sequences with a residue per column over window columns,
+        fills the maxSeq.10bp column of windows() but is not pAss's value (408.3 against 391.5 on K00927)
+        """
+        counts = np.concatenate([[0], np.cumsum(self.residues.sum(axis=0))])
+        if len(counts) <= window:
+            return 0.0
+        return float((counts[window:] - counts[:-window]).max()) / window
+
+    def coverage(self, window=10, step=5):
+        """
+        coverage every step columns, in the layout of pAss04/<KO>.csv but not its numbers,
+        pAss04 counts differently and only keeps some positions:
+            nseq   : sequences with residues over all window columns starting at position
+            ngroup : distinct sequences among those over the window
+            total  : sequences in the alignment
+        """
+        import pandas as pd
+        rows, width = self.matrix.shape
+        positions = np.arange(0, max(width - window + 1, 0), step)
+        #full windows by cumulative sums, distinct windows by hashing the window bytes of the full rows
+        full = (self.cumulative[:, positions + window] - self.cumulative[:, positions]) == window
+        nseq = full.sum(axis=0)
+        ngroup = np.zeros(len(positions), dtype=np.int64)
+        for i, position in enumerate(positions):
+            if nseq[i]:
+                block = np.ascontiguousarray(self.matrix[full[:, i], position:position + window])
+                ngroup[i] = len(np.unique(block.view(np.dtype((np.void, window)))))
+        return pd.DataFrame({
+            'position' : positions,
+            'nseq'     : nseq,
+            'ngroup'   : ngroup,
+            'total'    : rows
+        }, columns=['position', 'nseq', 'ngroup', 'total'])
+
+    def windows(self, chunk=256):
+        """
+        the window scan in the layout of pAss10/<KO>/<KO>, one row per start column with a window:
+            start, end      : window columns [start, end)
+            seqInSameWindow : sequences with residues at or before start and at or after end
+            newCut          : end - start
+            lens            : mean residues in the window of those sequences
+        the sequences spanning a window are the rows with first <= start and last >= end, their residue total
+        comes from cumulative sums over the rows sorted by first and by last, chunk start columns at a time.
+        """
+        if self.__windows is not None:
+            return self.__windows
+        rows, width = self.matrix.shape
+        columns = np.arange(width)
+        ends = self.cumulative[:, :width].astype(np.int64)
+        #rows sorted by first: the rows with first <= start are the first byFirst.searchsorted(start, 'right') of them
+        byFirst = np.argsort(self.first, kind='stable')
+        firsts = self.first[byFirst]
+        alive = self.last[byFirst, None] >= columns[None, :]
+        count = np.zeros((rows + 1, width), dtype=np.int64)
+        np.cumsum(alive, axis=0, out=count[1:])
+        atEnd = np.zeros((rows + 1, width), dtype=np.int64)
+        np.cumsum(np.where(alive, ends[byFirst], 0), axis=0, out=atEnd[1:])
+        #rows sorted by last, descending: the rows with last >= end are the first reaching[end] of them
+        byLast = np.argsort(-self.last, kind='stable')
+        reaching = rows - np.searchsorted(np.sort(self.last), columns, side='left')
+        atStart = np.zeros((rows + 1, width), dtype=np.int64)
+        np.cumsum(np.where(self.first[byLast, None] <= columns[None, :], ends[byLast], 0), axis=0, out=atStart[1:])
+        found = []
+        for lo in range(0, width, chunk):
+            starts = columns[lo:lo + chunk]
+            kept = np.searchsorted(firsts, starts, side='right')
+            n = count[kept]
+            inside = atEnd[kept] - atStart[np.ix_(reaching, starts)].T
+            #a window needs at least minLength columns to hold minLength residues
+            hits = (columns[None, :] >= starts[:, None] + self.minLength) & (n > 0) & (inside >= self.minLength * n)
+            for i in np.flatnonzero(hits.any(axis=1)):
+                end = int(np.argmax(hits[i]))
+                found.append((int(starts[i]), end, int(n[i, end]), float(inside[i, end]) / n[i, end]))
+        import pandas as pd
+        table = pd.DataFrame(found, columns=['start', 'end', 'seqInSameWindow', 'lens'])
+        table.insert(0, 'ko', self.ko)
+        table.insert(1, 'msaTotSeq', self.totalSequences())
+        table.insert(4, 'maxSeq.10bp', self.maxSeq())
+        table.insert(6, 'newCut', table['end'] - table['start'])
+        table['lens'] = table['lens'].round(2)
+        self.__windows = table
+        return table
+
+    def best(self):
+        """
+        the window spanned by the most sequences, the first one if several are
+        """
+        table = self.windows()
+        if len(table) == 0:
+            return None
+        row = table.iloc[int(np.argmax(table['seqInSameWindow'].values))]
+        return {
+            'msaStart' : int(row['start']),
+            'msaEND'   : int(row['end']),
+            'spanning' : int(row['seqInSameWindow']),
+            'lens'     : float(row['lens'])
+        }
+
+    def members(self, start, end, minResidues=None):
+        """
+        IDs of the sequences with at least minResidues (default half of minLength) residues in [start, end),
+        the contigs pAss11 keeps for the MDR
+        """
+        minResidues = self.minLength // 2 if minResidues is None else minResidues
+        inside = self.cumulative[:, end] - self.cumulative[:, start]
+        return [self.ids[i] for i in np.flatnonzero(inside >= minResidues)]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Per stage instrumentation of the KO pipeline.
+
+Stages are timed with the stage() context manager or the timed() method decorator:
+
+    >>> metrics.configure("out/metrics/run.jsonl")
+    >>> with metrics.stage("realign", ko="K00927"):
+    ...     metrics.count("pileups", 12)
+
+Every finished stage appends one JSON line to the configured file:
+    ko, stage, pid, host, start (epoch seconds),
+    parent (the stage it ran inside in the same thread, None at the top), depth (0 at the top),
+    wall, cpu (seconds, cpu is the CPU time of the thread running the stage),
+    counts ({name: records})
+and, measured on the whole process rather than the stage:
+    processChildCPU  : CPU seconds of the subprocesses (eg. muscle and newbler) the process waited for during the stage,
+                       stages running in parallel threads see each other's children
+    processPeakRSS   : peak RSS of the process so far in bytes, not the memory of the stage
+    processReadBytes, processWriteBytes : bytes the process read and wrote during the stage, all threads,
+                       from /proc/self/io (None elsewhere). Pages of memory mapped files (IndexedStore, MSAMatrix)
+                       are not counted, stages reading through them report next to nothing read.
+
+Stages nest (eg. realignment > realign > banded), the wall and cpu of a stage include those of the stages inside it,
+add up the records with depth 0 only to get the time of a run.
+Pool workers append to the same file, writePrometheus() turns it into a Prometheus textfile once the run is over.
+Nothing is recorded until configure() is called.
+'''
+
+import functools
+import json
+import os
+import resource
+import socket
+import threading
+import time
+
+from collections import defaultdict
+from contextlib  import contextmanager
+
+SINK = {'path': None}
+LOCAL = threading.local()
+
+def configure(path):
+    """
+    sends stage records to the JSON-lines file at path, None switches recording off
+    """
+    if path is not None:
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+    SINK['path'] = path
+
+def enabled():
+    return SINK['path'] is not None
+
+def ioBytes():
+    """
+    bytes read and written by this process so far, (None, None) without /proc/self/io
+    """
+    try:
+        with open("/proc/self/io") as fh:
+            fields = dict(line.split(":", 1) for line in fh if ":" in line)
+        return int(fields['rchar']), int(fields['wchar'])
+    except (IOError, KeyError, ValueError):
+        return None, None
+
+def peakRSS():
+    """
+    peak resident set size of this process in bytes, ru_maxrss is in kilobytes on linux
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def threadCPU():
+    """
+    CPU seconds of the calling thread, of the whole process before python 3.7
+    """
+    clock = getattr(time, 'thread_time', time.process_time)
+    return clock()
+
+def childCPU():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def count(name, n=1):
+    """
+    adds n records of name to the innermost running stage of this thread
+    """
+    stack = getattr(LOCAL, 'stack', None)
+    if stack:
+        stack[-1]['counts'][name] = stack[-1]['counts'].get(name, 0) + n
+
+@contextmanager
+def stage(name, ko=None):
+    if not enabled():
+        yield None
+        return
+    if not hasattr(LOCAL, 'stack'):
+        LOCAL.stack = []
+    parent = LOCAL.stack[-1]['stage'] if LOCAL.stack else None
+    record = {'ko': ko, 'stage': name, 'pid': os.getpid(), 'host': socket.gethostname(), 'counts': {},
+              'parent': parent, 'depth': len(LOCAL.stack)}
+    LOCAL.stack.append(record)
+    readBefore, writeBefore = ioBytes()
+    start, cpu, child = time.time(), threadCPU(), childCPU()
+    try:
+        yield record
+    finally:
+        record['start'] = start
+        record['wall'] = time.time() - start
+        record['cpu'] = threadCPU() - cpu
+        record['processChildCPU'] = childCPU() - child
+        record['processPeakRSS'] = peakRSS()
+        readAfter, writeAfter = ioBytes()
+        record['processReadBytes'] = None if readBefore is None else readAfter - readBefore
+        record['processWriteBytes'] = None if writeBefore is None else writeAfter - writeBefore
+        LOCAL.stack.pop()
+        emit(record)
+
+def timed(name):
+    """
+    decorator timing a method as stage name, the KO is taken from self.ko
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with stage(name, getattr(self, 'ko', None)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def emit(record):
+    """
+    appends one record to the JSON-lines file, a single O_APPEND write so concurrent workers do not interleave
+    """
+    path = SINK['path']
+    if path is None:
+        return
+    line = (json.dumps(record, sort_keys=True) + "\n").encode()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+def load(path):
+    records = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    print("Skipping unreadable metrics line in %s" % path)
+    return records
+
+def writePrometheus(path, promPath, prefix="newbler"):
+    """
+    aggregates the JSON-lines records at path per KO and stage into a Prometheus textfile (node_exporter textfile collector),
+    written to a temporary file first and moved into place so the collector never reads half a file.
+    Every series has a parent label (empty at the top), sum the ones with parent="" for the time of a run
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    counts = defaultdict(float)
+    for record in load(path):
+        key = (record.get('ko') or "", record['stage'], record.get('parent') or "")
+        entry = totals[key]
+        entry['runs'] += 1
+        for field in ('wall', 'cpu', 'processChildCPU', 'processReadBytes', 'processWriteBytes'):
+            entry[field] += record.get(field) or 0
+        entry['processPeakRSS'] = max(entry['processPeakRSS'], record.get('processPeakRSS') or 0)
+        for name, n in record.get('counts', {}).items():
+            counts[key + (name,)] += n
+    metrics = [
+        ('stage_runs_total', 'counter', 'runs', "Number of times the stage ran"),
+        ('stage_wall_seconds_total', 'counter', 'wall', "Wall clock seconds spent in the stage, stages inside it included"),
+        ('stage_cpu_seconds_total', 'counter', 'cpu', "CPU seconds of the thread running the stage, stages inside it included"),
+        ('stage_process_child_cpu_seconds_total', 'counter', 'processChildCPU', "CPU seconds of the subprocesses (muscle, newbler) the whole process waited for during the stage"),
+        ('stage_process_read_bytes_total', 'counter', 'processReadBytes', "Bytes read by the whole process during the stage, memory mapped reads not included"),
+        ('stage_process_write_bytes_total', 'counter', 'processWriteBytes', "Bytes written by the whole process during the stage"),
+        ('stage_process_peak_rss_bytes', 'gauge', 'processPeakRSS', "Highest process peak RSS seen at the end of the stage"),
+    ]
+    lines = []
+    for name, kind, field, description in metrics:
+        lines.append("# HELP %s_%s %s" % (prefix, name, description))
+        lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+        for (ko, stageName, parent), entry in sorted(totals.items()):
+            lines.append('%s_%s{ko="%s",stage="%s",parent="%s"} %s' % (prefix, name, ko, stageName, parent, repr(float(entry[field]))))
+    lines.append("# HELP %s_stage_records_total Records handled in the stage" % prefix)
+    lines.append("# TYPE %s_stage_records_total counter" % prefix)
+    for (ko, stageName, parent, kind), n in sorted(counts.items()):
+        lines.append('%s_stage_records_total{ko="%s",stage="%s",parent="%s",kind="%s"} %s' % (prefix, ko, stageName, parent, kind, repr(float(n))))
+    tmp = "%s.%s.tmp" % (promPath, os.getpid())
+    with open(tmp, "w") as out:
+        out.write("\n".join(lines) + "\n")
+    os.replace(tmp, promPath)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+
+GAP = ord('-')
+
+class MSAMatrix:
+    '''
+    A FASTA alignment (eg. pAss03/<KO>.msa, pAss03/<KO>.temp.ref.msa) as a fixed width uint8 matrix, one row per record.
+
+    The matrix is converted once and kept next to the alignment, then memory mapped read only:
+        <path>.npy  : rows x columns uint8, shorter rows padded with gaps
+        <path>.rows : #source <size> <mtime_ns> of the alignment it was built from, then id and description per row
+    Both are rebuilt when the alignment changes. Workers mapping the same alignment share its pages instead of
+    each holding a parsed copy, and column slices are views into the map.
+    With cacheDir they are kept there instead (eg. when pAss03 is shared or read only). If they cannot be written
+    the matrix is built in memory for this instance only.
+
+    Example:
+        >>> msa = MSAMatrix("/path/to/root/out/pAss03/K00927.msa")
+        >>> mdr = msa.columns(1680, 1967)            # all contigs, no copy
+        >>> msa.sequence("contig00001", 1680, 1967)  # gapped string of one row
+    '''
+
+    def __init__(self, path, cacheDir=None):
+        self.path = path
+        self.cacheDir = cacheDir
+        base = path if cacheDir is None else os.path.join(cacheDir, os.path.basename(path))
+        self.matrixPath = base + ".npy"
+        self.rowsPath = base + ".rows"
+        stat = os.stat(path)
+        self.source = "%s\t%s" % (stat.st_size, stat.st_mtime_ns)
+        if self.__loadRows():
+            self.__map()
+        else:
+            try:
+                self.__build()
+                self.__loadRows()
+                self.__map()
+            except OSError as err:
+                print("Could not keep the matrix of %s (%s), holding it in memory" % (path, err))
+                self.__build(inMemory=True)
+        self.index = {rowID: i for i, rowID in enumerate(self.ids)}
+
+    def __loadRows(self):
+        try:
+            with open(self.rowsPath) as rows:
+                header = rows.readline().rstrip("\n").split("\t", 1)
+                if header[0] != "#source" or header[1] != self.source or not os.path.isfile(self.matrixPath):
+                    return False
+                self.ids, self.descriptions = [], []
+                for line in rows:
+                    rowID, description = line.rstrip("\n").split("\t", 1)
+                    self.ids.append(rowID)
+                    self.descriptions.append(description)
+        except (IOError, ValueError, IndexError):
+            return False
+        return True
+
+    def __map(self):
+        if len(self.ids) > 0:
+            self.matrix = np.load(self.matrixPath, mmap_mode='r')
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.uint8)
+
+    def __build(self, inMemory=False):
+        """
+        two passes over the alignment, the first for the matrix shape, the second fills the map row by row.
+        inMemory fills an array instead and sets ids, descriptions and matrix, nothing is written
+        """
+        if self.cacheDir is not None and not inMemory:
+            os.makedirs(self.cacheDir, exist_ok=True)
+        headers, widths, width = [], [], 0
+        with open(self.path) as msa:
+            for line in msa:
+                if line.startswith(">"):
+                    headers.append(line[1:].rstrip())
+                    widths.append(0)
+                elif headers:
+                    widths[-1] += len(line.strip())
+        width = max(widths) if widths else 0
+        if inMemory:
+            self.ids = [header.split(None, 1)[0] if header else "" for header in headers]
+            self.descriptions = headers
+            self.matrix = np.empty((len(headers), width), dtype=np.uint8)
+            self.__fill(self.matrix)
+            return
+        tmp = self.matrixPath + ".%s.tmp" % os.getpid()
+        if headers:
+            try:
+                matrix = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint8, shape=(len(headers), width))
+                self.__fill(matrix)
+                matrix.flush()
+                del matrix
+                #other workers may be building the same alignment, whoever finishes last wins with identical content
+                os.replace(tmp, self.matrixPath)
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        with open(self.rowsPath + ".%s.tmp" % os.getpid(), 'w') as rows:
+            rows.write("#source\t%s\n" % self.source)
+            for header in headers:
+                rowID = header.split(None, 1)[0] if header else ""
+                rows.write("%s\t%s\n" % (rowID, header))
+        os.replace(self.rowsPath + ".%s.tmp" % os.getpid(), self.rowsPath)
+
+    def __fill(self, matrix):
+        rows, width = matrix.shape
+        row, column = -1, 0
+        with open(self.path, 'rb') as msa:
+            for line in msa:
+                if line.startswith(b">"):
+                    if row >= 0 and column < width:
+                        matrix[row, column:] = GAP
+                    row, column = row + 1, 0
+                elif row >= 0:
+                    line = line.strip()
+                    matrix[row, column:column + len(line)] = np.frombuffer(line, dtype=np.uint8)
+                    column += len(line)
+        if row >= 0 and column < width:
+            matrix[row, column:] = GAP
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, rowID):
+        return rowID in self.index
+
+    def row(self, rowID):
+        return self.index[rowID]
+
+    def columns(self, start, end):
+        """
+        rows x [start, end) view of the alignment, no copy is made
+        """
+        return self.matrix[:, start:end]
+
+    def sequence(self, rowID, start=None, end=None):
+        """
+        gapped sequence of a row, the whole row or columns [start, end)
+        """
+        return self.matrix[self.index[rowID], start:end].tobytes().decode()
+
+    def covered(self, start, end):
+        """
+        IDs of the rows with at least one residue in columns [start, end)
+        """
+        hasResidue = (self.columns(start, end) != GAP).any(axis=1)
+        return [self.ids[i] for i in np.flatnonzero(hasResidue)]
@@ -4,35 +4,59 @@
 import os
 import re
 import shutil
-import subprocess
+import time
+
+from .cache import AssemblyCache
+from .fastq import preflight
+from .      import metrics
+from .retry import RetryPolicy
+from .supervisor import Supervisor
 
 class Newbler:
     '''
     For running newbler, overlap group assembler, for all KOs.
     This is to be used together with a specific
     docker image: etheleon/python3
+
+    With an AssemblyCache (see cache.py) an assembly of reads and flags seen before is restored instead of rerun.
+    Every attempt runs under a Supervisor (see supervisor.py), which kills runs whose progress has stalled.
     '''
 
-    def __init__(self, root, ko, cpu, assm = "/home/uesu/Downloads/newbler/opt/454/apps/mapper/bin/runAssembly"):
+    def __init__(self, root, ko, cpu, assm = "/home/uesu/Downloads/newbler/opt/454/apps/mapper/bin/runAssembly", retry=None, cache=None, supervisor=None):
         self.assm = assm #this  default points to the newbler installation in the docker image
         self.root = root #the directory which contains the KOs
         self.ko = ko
         self.cpu = cpu
+        self.inMemory = True #-m, dropped by the retry policy when escalating
+        self.retry = RetryPolicy() if retry is None else retry
+        self.cache = cache
+        self.supervisor = Supervisor() if supervisor is None else supervisor
+        self.phases = []
         self.info = {}
 
     def __cleanup(self):
         '''
         removes content in the KO's directory save for the
-        fastQ files
+        fastQ files (input/ and the <KO>, <KO>.1.fq, <KO>.2.fq read files)
         '''
+        if not os.path.isdir("%s/%s" % (self.root, self.ko)):
+            return
         files = os.listdir("%s/%s" % (self.root,self.ko))
+        files = [file for file in files if not file.startswith(self.ko)]
         offending = ["%s/%s/%s"%(self.root, self.ko,file) for file in files]
         for nonsense in list(filter(lambda file: not re.search('input', file), offending)):
             if os.path.isfile(nonsense):
-                os.remove
+                os.remove(nonsense)
             else:
                 shutil.rmtree(nonsense)
 
+    def __outputIsEmpty(self):
+        contigs = "%s/%s/454AllContigs.fna" % (self.root, self.ko)
+        return not os.path.isfile(contigs) or os.path.getsize(contigs) == 0
+
+    def __memoryFlag(self):
+        return " -m" if self.inMemory else ""
+
     def __checkNewblerIsDone(self):
         '''
         newbler fails to run without error, this checks
@@ -51,20 +75,19 @@ class Newbler:
             return False
 
     def __check(self, fq, num):
-        fqExists = os.path.isfile(fq)
-        if fqExists:
-            num_lines = sum(1 for line in open(fq))
-            return fqExists and num_lines > 0
-        else:
+        '''
+        constant time check that the fastQ exists and has at least one record
+        '''
+        info = preflight(fq)
+        if not info['exists']:
             print("fastQ read%s does not exists for %s"%(num, self.ko))
-            return False
+        return info['nonEmpty']
 
 
-    def geneCentricAssembly(self, debug=False, MDR=True, timeoutlimit=7200):
+    def geneCentricCommand(self, MDR=True):
         '''
-        Running assembler: NEWBLER first time to generate gene centric assemblies
+        runAssembly command line for the gene centric assembly, empty if neither fastQ has reads
         '''
-        #times out after 2 hours
         if MDR:
             inputFile = "%s/%s/%s" % (self.root, self.ko, self.ko)
         else:
@@ -80,7 +103,7 @@ class Newbler:
         onlyHaveRead1 = (self.info['fq1']['status'] and  not self.info['fq2']['status'])
         onlyHaveRead2 = (not self.info['fq1']['status'] and self.info['fq2']['status'])
 
-        headCMD = self.assm + " -cpu " + self.cpu + " -force -m -urt -rip -o %s/%s" % (self.root, self.ko)
+        headCMD = self.assm + " -cpu " + str(self.cpu) + " -force" + self.__memoryFlag() + " -urt -rip -o %s/%s" % (self.root, self.ko)
         if haveBothReads:
             cmd = headCMD + " %s.1.fq %s.2.fq" % (inputFile, inputFile)
         elif onlyHaveRead1:
@@ -90,100 +113,110 @@ class Newbler:
         else:
             print("Not processing: Both have no reads")
             cmd = ""
-        result = None
-        count = 0
-        if debug:
-            print("Cmd: %s" % cmd)
-            print(self.info)
-        else:
-            print("Assembling %s..." % self.ko)
-            print("executing: %s" % cmd)
-            while result is None:
-                count = count + 1
-                if (count > 6):
-                    print("Exceeded 5 tries, not going to try again")
-                    result = True
-                try:
-                    #doesnt really capture newbler's error messages
-                    subprocess.run(cmd, shell=True, check=True, timeout=timeoutlimit) #timeout 3600 seconds ie. 1 hour. so wait for max 2 hours before we timeout
-                except subprocess.CalledProcessError as err:
-                    #error is empty
-                    print("newbler error:\n", err.output)
-                    self.__cleanup(self.ko, self.root)
-                except subprocess.TimeoutExpired as err:
-                    print("Assembly of %s took more than 2 hours. Aborting" % ko)
-                    self.__cleanup(self.ko, self.root)
-                else:
-                    if self.__checkNewblerIsDone():
-                        result = True
-                    else:
-                        pass
-            print("Done Assembling")
+        return cmd
 
-    def mdrCentricAssembly(self, debug=False):
+    def mdrCentricCommand(self):
         '''
-        Running assembler: NEWBLER second time to generate gene centric assemblies
+        runAssembly command line for the MDR centric assembly, empty if the fastQ has no reads
         '''
-
+        self.info['fq'] = {}
         self.info['fq']['filePath'] = "%s/%s/%s" % (self.root, self.ko, self.ko)
         self.info['fq']['status']   = self.__check(self.info['fq']['filePath'], 1)
 
         if self.info['fq']['status']:
-            cmd = self.assm + " -cpu " + self.cpu + " -force -m -urt -rip -o %s/%s %s" % (self.root, self.ko, self.info['fq']['filePath'])
+            cmd = self.assm + " -cpu " + str(self.cpu) + " -force" + self.__memoryFlag() + " -urt -rip -o %s/%s %s" % (self.root, self.ko, self.info['fq']['filePath'])
         else:
             print("Not processing: Both have no reads")
             cmd = ""
+        return cmd
 
-        result = None
-        if debug:
-            print("Cmd: %s" % cmd)
-            print(self.info)
-        else:
-            print("Assembling %s..." % self.ko)
-            print("executing: %s" % cmd)
-            while result is None:
-                try:
-                    #doesnt really capture newbler's error messages
-                    subprocess.run(cmd, shell=True, check=True)
-                except subprocess.CalledProcessError as err:
-                    #error is empty
-                    print("newbler error:\n", err.output)
-                    self.__cleanup(self.ko, self.root)
-                else:
-                    if self.__checkNewblerIsDone():
-                        result = True
-                    else:
-                        pass
-            print("Done Assembling")
-
-    def genericAssembly(self, inputFile, debug=False):
-        headCMD = self.assm + " -cpu " + self.cpu + " -force -m -urt -rip -o %s/%s %s" % (self.root, self.ko, inputFile)
-        result = None
-        count = 0
+    def genericCommand(self, inputFile):
+        '''
+        runAssembly command line for any input file
+        '''
+        return self.assm + " -cpu " + str(self.cpu) + " -force" + self.__memoryFlag() + " -urt -rip -o %s/%s %s" % (self.root, self.ko, inputFile)
+
+    def geneCentricAssembly(self, debug=False, MDR=True, timeoutlimit=7200):
+        '''
+        Running assembler: NEWBLER first time to generate gene centric assemblies
+        '''
+        #times out after 2 hours
+        return self.__assemble(lambda: self.geneCentricCommand(MDR), debug, timeoutlimit)
+
+    def mdrCentricAssembly(self, debug=False, timeoutlimit=7200):
+        '''
+        Running assembler: NEWBLER second time to generate gene centric assemblies
+        '''
+        return self.__assemble(self.mdrCentricCommand, debug, timeoutlimit)
+
+    def genericAssembly(self, inputFile, debug=False, timeoutlimit=7200):
+        return self.__assemble(lambda: self.genericCommand(inputFile), debug, timeoutlimit)
+
+    @metrics.timed("newbler")
+    def __assemble(self, command, debug, timeoutlimit):
+        '''
+        runs the command built by command() until it succeeds or self.retry gives up,
+        failed attempts are cleaned up, backed off and possibly rerun with less cpu/memory.
+        returns True if the assembly succeeded
+        '''
+        cmd = command()
         if debug:
             print("Cmd: %s" % cmd)
             print(self.info)
-        else:
-            print("Assembling %s..." % self.ko)
+            return None
+        if cmd == "":
+            self.retry.record(self.ko, 0, 'no-input', self.__settings(), 'skip')
+            return False
+        outputDir = "%s/%s" % (self.root, self.ko)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(cmd)
+            if key in self.cache:
+                self.__cleanup()
+                if self.cache.restore(key, outputDir):
+                    print("Restored %s from the assembly cache (%s)" % (self.ko, key))
+                    metrics.count("cacheHits")
+                    return True
+            metrics.count("cacheMisses")
+        #results restored from a cache may be hardlinks into it, newbler would write through them
+        AssemblyCache.release(outputDir)
+        print("Assembling %s..." % self.ko)
+        attempt = 0
+        while True:
+            attempt = attempt + 1
+            metrics.count("attempts")
             print("executing: %s" % cmd)
-            while result is None:
-                count = count + 1
-                if (count > 6):
-                    print("Exceeded 5 tries, not going to try again")
-                    result = True
-                try:
-                    #doesnt really capture newbler's error messages
-                    subprocess.run(cmd, shell=True, check=True, timeout=timeoutlimit) #timeout 3600 seconds ie. 1 hour. so wait for max 2 hours before we timeout
-                except subprocess.CalledProcessError as err:
-                    #error is empty
-                    print("newbler error:\n", err.output)
-                    self.__cleanup(self.ko, self.root)
-                except subprocess.TimeoutExpired as err:
-                    print("Assembly of %s took more than 2 hours. Aborting" % ko)
-                    self.__cleanup(self.ko, self.root)
-                else:
-                    if self.__checkNewblerIsDone():
-                        result = True
-                    else:
-                        pass
-            print("Done Assembling")
+            #a progress file left by an earlier run would be read as this run's progress
+            if os.path.isfile("%s/454NewblerProgress.txt" % outputDir):
+                os.remove("%s/454NewblerProgress.txt" % outputDir)
+            #doesnt really capture newbler's error messages
+            result = self.supervisor.run(cmd, outputDir, timeoutlimit)
+            self.phases = result['phases']
+            if result['status'] == 'timeout':
+                print("Assembly of %s took more than %s seconds. Aborting" % (self.ko, timeoutlimit))
+            elif result['status'] == 'stalled':
+                print("Assembly of %s made no progress for %s seconds. Aborting" % (self.ko, self.supervisor.stallTimeout))
+            failure = self.retry.classify(result['returncode'], result['status'] == 'timeout', self.__checkNewblerIsDone(), self.__outputIsEmpty(),
+                                          stalled=result['status'] == 'stalled')
+            returncode = result['returncode']
+            if failure is None:
+                print("Done Assembling")
+                if key is not None:
+                    self.cache.store(key, outputDir, cmd)
+                return True
+            action = self.retry.decide(attempt, failure)
+            self.retry.record(self.ko, attempt, failure, self.__settings(), action, returncode)
+            if action == 'skip':
+                print("Assembly of %s failed (%s) after %s tries, skipping" % (self.ko, failure, attempt))
+                return False
+            self.__cleanup()
+            wait = self.retry.delay(attempt)
+            print("Assembly of %s failed (%s), retrying in %s seconds" % (self.ko, failure, wait))
+            time.sleep(wait)
+            if action == 'escalate':
+                settings = self.retry.escalate(self.__settings())
+                self.cpu, self.inMemory = settings['cpu'], settings['inMemory']
+                cmd = command()
+
+    def __settings(self):
+        return {'cpu': int(self.cpu), 'inMemory': self.inMemory}
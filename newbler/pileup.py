@@ -4,18 +4,45 @@
 import os
 import errno
 import re
-import shutil
-import subprocess
-
 
 from collections   import defaultdict
-import subprocess
 
-from Bio           import SeqIO
-from Bio.Seq       import Seq
-from Bio.SeqRecord import SeqRecord
-from Bio.Alphabet  import SingleLetterAlphabet
-import pandas as pd
+import numpy as np
+
+from .status       import readPairStatus, readReadStatus
+from .fastq        import FastqCache
+from .locate       import KmerIndex, reverseComplement
+from .mdr          import MDR
+from .             import metrics
+from .msa          import MSAMatrix
+from .realign      import Realigner
+from .registry     import ReadRegistry
+from .store        import IndexedStore, StoreWriter
+
+class PileupRead:
+    '''
+    A read placed on a contig, kept as coordinates rather than a dash padded string.
+    offset is the 0-based position of the first base on the contig,
+    strand is '-' when the read was reverse complemented onto the contig.
+    '''
+    __slots__ = ('readID', 'contig', 'offset', 'strand', 'seq')
+
+    def __init__(self, readID, contig, offset, strand, seq):
+        self.readID = readID
+        self.contig = contig
+        self.offset = max(offset, 0)
+        self.strand = strand
+        self.seq    = seq
+
+    def header(self):
+        return "%s-%s offset:%s length:%s strand:%s" % (self.readID, self.contig, self.offset, len(self.seq), self.strand)
+
+    def padded(self, contigLength):
+        """
+        dash padded read spanning the full contig, only built when writing out
+        """
+        back = contigLength - self.offset - len(self.seq)
+        return "-" * self.offset + self.seq + "-" * back
 
 class Alignment:
     '''
@@ -35,20 +62,25 @@ class Alignment:
         * reads in MDR (alignment.getReadsFromPileup())
     '''
 
-    def __init__ (self, rootPath, ko):
+    def __init__ (self, rootPath, ko, threads=1, budget=None, aligner="banded", cacheDir=None, recomputeMDR=False):
         self.rootPath = rootPath
         self.ko = ko
+        self.cacheDir = cacheDir
+        self.recomputeMDR = recomputeMDR
+        self.realigner   = Realigner(threads, budget, aligner=aligner)
         self.start       = None
         self.end         = None
         self.contigList  = {}
-        self.readInfo    = {}
-        self.outputRecords = []
+        self.mdrContigs  = None
+        self.readInfo    = None
+        self.placement   = None
+        self.msa         = None
         print("Processing %s:" % ko)
 
-    def doPile(self):
+    def doPile(self, realign=True):
         """
-        Generates a full pileup for each of the contigs.
-        To be used later for assembly
+        Generates a full pileup for each of the contigs overlapping the MDR.
+        To be used later for assembly, realign=False leaves the realignment to a later call of realign()
         """
         pileup = "%s/out/pileup/%s" % (self.rootPath, self.ko)
         try:
@@ -58,17 +90,50 @@ class Alignment:
                 raise  # raises the error again
         print("Initializing pileup for %s" % self.ko)
         self.__getMSALOC()
+        self.__planContigs()
         self.__readContigs()
         self.__readMSA()
         #just want to test out how contig000001 looks like
         self.__readStatusPair()
         self.__parseFastQ()
+        if realign:
+            self.realign()
+
+    @metrics.timed("realign")
+    def realign(self):
+        """
+        Realigns the pileups of the contigs overlapping the MDR (<KO>.msa store, banded or muscle) and writes
+        the <KO>.reAligned.msa store with the reads in the same order as the pileup
+        """
+        self.__getMSALOC()
+        if self.mdrContigs is None:
+            self.__planContigs()
+        pileup = "%s/out/pileup/%s/%s" % (self.rootPath, self.ko, self.ko)
+        with metrics.stage(self.realigner.aligner, self.ko):
+            failed = set(self.realigner.run("%s.pileup" % pileup, "%s.msa" % pileup, sorted(self.mdrContigs)))
+        metrics.count("pileups", len(self.mdrContigs))
+        metrics.count("failed", len(failed))
+        with IndexedStore("%s.pileup" % pileup) as pileups, IndexedStore("%s.msa" % pileup) as aligned, StoreWriter("%s.reAligned.msa" % pileup) as newOut:
+            for contigID in sorted(self.mdrContigs):
+                if contigID not in pileups or contigID in failed:
+                    continue
+                msa = self.__fixAlignment(aligned, contigID)
+                #print original contig and full sequence, then the reads in pileup order
+                block = []
+                for recordID, description, seq in pileups.records(contigID):
+                    if recordID == contigID:
+                        block.append(">%s\n%s\n" % (contigID, msa[contigID]))
+                    else:
+                        readID = re.search(r"^(\S+)-\S+$", recordID).group(1)
+                        block.append(">%s-%s\n%s\n" % (readID, contigID, msa[readID]))
+                newOut.write(contigID, "".join(block))
 
     def getReadsFromPileUP(self):
         self.__getMSALOC()
         self.__storeTAXAinfo()
         self.__cutMSA()
 
+    @metrics.timed("cutMSA")
     def __cutMSA(self):
         #msa alignment can be Rev and ntRev
         try:
@@ -78,111 +143,173 @@ class Alignment:
             if e.errno != errno.EEXIST: #keep quiet if folder already exists
                 raise  # raises the error again
         print("extracting reads")
-        contigListFile = "%s/out/pAss03/%s.msa" % (self.rootPath, self.ko)
-        print(contigListFile)
-        seqIter = SeqIO.parse(contigListFile, 'fasta')
-        for contig in seqIter:
-            mdr = self.__getSeq(contig, self.start,self.end)
-            contigInMDR = len(mdr) > 0
-            if (contigInMDR):
-                pileupFH = SeqIO.parse("%s/out/pileup/%s/%s-%s" % (self.rootPath, self.ko, self.ko, contig.id), 'fasta')
-                fullContig = next(pileupFH)
-                try:
-                    indexVal = str(fullContig.seq).index(mdr)
-                    #print("%s: %s" % (contig.id, indexVal))
-                    self.__extractReads(indexVal, indexVal + len(mdr), pileupFH)
-                except ValueError:
-                    #print("%s : Cannot find MDR in 5' strand. Trying revcom of MDR" % contig.id)
-                    try:
-                        indexVal = str(fullContig.seq).index(str(Seq(mdr).reverse_complement()))
-                        #print("%s: %s" % (contig.id, indexVal))
-                        self.__extractReads(indexVal, indexVal + len(mdr), pileupFH)
-                    except ValueError as err:
-                        print("%s-%s has issues:"%(self.ko, contig.id))
-                        print(err)
-                SeqIO.write(self.outputRecords, "%s/out/preNewbler/%s/%s" % (self.rootPath, self.ko, self.ko), "fasta")
-            else:
-                print("%s is empty" % contig.id)
+        msa = self.__loadMSA()
+        print(msa.path)
+        #reads are streamed out as they are found, only one contig's pileup is held at a time
+        pileups = IndexedStore("%s/out/pileup/%s/%s.pileup" % (self.rootPath, self.ko, self.ko))
+        #one index for the KO, the pileups were built on these contigs
+        contigs = "%s/out/newbler/%s/454AllContigs.fna" % (self.rootPath, self.ko)
+        index = KmerIndex.fromFasta(contigs) if os.path.isfile(contigs) else KmerIndex()
+        unknown = 0
+        with open("%s/%s" % (outputDir, self.ko), 'w') as output:
+            for contigID in msa.ids:
+                mdr = self.__getSeq(msa, contigID, self.start, self.end)
+                contigInMDR = len(mdr) > 0
+                if (contigInMDR and contigID not in pileups):
+                    print("%s-%s has no pileup" % (self.ko, contigID))
+                elif (contigInMDR):
+                    pileupFH = pileups.records(contigID)
+                    contigSeq = next(pileupFH)[2]
+                    if contigID not in index:
+                        index.add(contigID, contigSeq)
+                    #either strand, a few mismatches are tolerated
+                    placement = index.locate(contigID, mdr)
+                    if placement is None:
+                        print("%s-%s has issues: MDR not found on either strand"%(self.ko, contigID))
+                    else:
+                        if placement.mismatches > 0:
+                            print("%s-%s: MDR placed with %s mismatches (score %.3f)" % (self.ko, contigID, placement.mismatches, placement.score))
+                        unknown += self.__extractReads(placement.start, placement.end, pileupFH, output)
+                else:
+                    print("%s is empty" % contigID)
+        pileups.close()
+        index.close()
+        if unknown:
+            print("%s: skipped %s reads with no taxon in the fastQ headers" % (self.ko, unknown))
+
+    def __loadMSA(self):
+        """
+        the pAss03 alignment of the KO, memory mapped (see msa.MSAMatrix)
+        """
+        if self.msa is None:
+            self.msa = MSAMatrix("%s/out/pAss03/%s.msa" % (self.rootPath, self.ko), self.cacheDir)
+        return self.msa
 
-    def __getSeq(self, seqRecord, start, end):
-        nt = str(seqRecord.seq[start : end]).upper().replace("-", "")
+    def __getSeq(self, msa, contigID, start, end):
+        nt = msa.sequence(contigID, start, end).upper().replace("-", "")
         return nt
 
-    def __extractReads(self, indexVal, howLong, iterator):
-        for record in iterator:
-            read = self.__getSeq(record, indexVal, howLong)
-            if len(read) > 0:
-                readID, contig  =  re.match("^(\d+)-(contig\d+)$", record.id).groups()
-                r               =  self.readInfo[readID]
+    def __extractReads(self, indexVal, howLong, iterator, output):
+        """
+        writes reads overlapping [indexVal, howLong) to output as soon as they are found.
+        reads are located by the offset and length recorded in the pileup header,
+        pileups written before these were recorded fall back to slicing the padded sequence.
+        Reads missing from self.readInfo (no numeric ID or taxon in the fastQ header) are skipped,
+        returns how many were
+        """
+        unknown = 0
+        taxa, readnum = self.readInfo['taxa'], self.readInfo['readnum']
+        for recordID, description, seq in iterator:
+            readID, contig = re.match(r"^(\d+)(?:/\d)?-(\S+)$", recordID).groups()
+            coords = re.search(r"offset:(\d+) length:(\d+)", description)
+            if coords:
+                offset, length = int(coords.group(1)), int(coords.group(2))
+                inMDR = offset < howLong and offset + length > indexVal
+                newseq = seq[offset : offset + length].upper()
+            else:
+                inMDR = len(seq[indexVal : howLong].replace("-", "")) > 0
+                newseq = seq.upper().replace("-", "")
+            if inMDR:
+                r               =  self.readInfo.row(readID)
+                if r < 0:
+                    unknown += 1
+                    metrics.count("unknown")
+                    continue
                 #>58526338-contig00001-33057/1;  KO:K00927       start: 575      offset: 287
-                header = "%s-%s/%s\tKO:%s\tstart:%s\toffset:%s" % (record.id, r['taxa'], r['readnum'], self.ko, indexVal, howLong)
-                newseq = Seq(str(record.seq).upper().translate({ord(i):None for i in '-'}), SingleLetterAlphabet())
-                newrecord = SeqRecord(newseq, id=header, name="", description="")
-                self.outputRecords.append(newrecord)
-                self.readInfo[readID]['readnum'] += 1
-        return
+                header = "%s-%s/%s\tKO:%s\tstart:%s\toffset:%s" % (recordID, taxa[r], readnum[r], self.ko, indexVal, howLong)
+                output.write(">%s\n%s\n" % (header, newseq))
+                readnum[r] += 1
+                metrics.count("reads")
+        return unknown
 
+    @metrics.timed("storeTAXAinfo")
     def __storeTAXAinfo(self):
         print("processing input file...")
-        fq1 = self.rootPath + "/out/newbler/" + self.ko + "/input/" + self.ko + ".1.fq"
-        fq2 = self.rootPath + "/out/newbler/" + self.ko + "/input/" + self.ko + ".2.fq"
-        for file in [fq1, fq2]:
-            for record in SeqIO.parse(file, "fastq"):
-                readID, taxa = re.search("^(\d+)\|(\d+)", record.description).groups()
-                self.readInfo[readID] = {'taxa' : taxa , 'readnum' : 1}
+        #shared with __parseFastQ, both mates are only parsed once per KO
+        reads = FastqCache.load(self.rootPath, self.ko)
+        readIDs = np.concatenate([mate.ids for mate in reads.mates])
+        taxa = np.concatenate([mate.taxa for mate in reads.mates])
+        known = (readIDs >= 0) & (taxa >= 0)
+        #compact registry, taxa and a readnum counter per interned read ID
+        self.readInfo = ReadRegistry(readIDs[known], taxa=taxa[known].astype(np.int32), readnum=np.ones(int(known.sum()), dtype=np.uint32))
         print("done")
 
     def __getMSALOC(self):
         """
-        grab the MDR location from MDR file originating from pass
+        grab the MDR location from MDR file originating from pass,
+        KOs without a pAss11 file get it recomputed from the pAss03 alignment (see MDR) if recomputeMDR is set
         """
         if (self.start == None and self.end == None):
             file        =  self.rootPath + '/out/pAss11/' + self.ko + ".fna"
-            record      =  next(SeqIO.parse(file, "fasta"))
-            theMatch    =  re.search("msaStart:(\d+) msaEND:(\d+)", record.description)
-            self.start  =  int(theMatch.group(1))
-            self.end    =  int(theMatch.group(2))
+            if os.path.isfile(file):
+                from Bio import SeqIO
+                record      =  next(SeqIO.parse(file, "fasta"))
+                theMatch    =  re.search(r"msaStart:(\d+) msaEND:(\d+)", record.description)
+                self.start  =  int(theMatch.group(1))
+                self.end    =  int(theMatch.group(2))
+            elif not self.recomputeMDR:
+                raise ValueError("%s has no pAss11 file, set recomputeMDR to find its MDR in the pAss03 alignment instead" % self.ko)
+            else:
+                best        =  MDR.fromFile("%s/out/pAss03/%s.msa" % (self.rootPath, self.ko), self.ko, cacheDir=self.cacheDir).best()
+                if best is None:
+                    raise ValueError("%s has no pAss11 file and no window of its pAss03 alignment holds enough residues for an MDR" % self.ko)
+                self.start  =  best['msaStart']
+                self.end    =  best['msaEND']
             print("MDR start:%s end:%s" % (self.start, self.end))
 
+    def __planContigs(self):
+        """
+        Finds the contigs whose MSA row has sequence within the MDR,
+        getReadsFromPileUP only uses these so the rest are neither piled up nor realigned
+        """
+        msa = self.__loadMSA()
+        #one pass over the MDR columns of every row at once
+        self.mdrContigs = set(msa.covered(self.start, self.end))
+        print("%s of %s contigs overlap the MDR" % (len(self.mdrContigs), len(msa)))
+
+    @metrics.timed("readContigs")
     def __readContigs(self):
         """
-        Stores full length contigs
+        Stores full length contigs, only those overlapping the MDR once __planContigs has run.
+        454AllContigs.fna is indexed once (454AllContigs.fna.idx) and only the needed contigs are read
         """
         path = self.rootPath+'/out/newbler/'+self.ko+"/454AllContigs.fna"
-        for record in SeqIO.parse(path, 'fasta'):
-            self.contigList[record.id] = {'fullseq': record.seq.upper()}
+        with IndexedStore(path) as contigs:
+            for contigID in contigs.keys():
+                if self.mdrContigs is None or contigID in self.mdrContigs:
+                    self.contigList[contigID] = {'fullseq': contigs.sequence(contigID).upper()}
+        metrics.count("contigs", len(self.contigList))
 
+    @metrics.timed("readMSA")
     def __readMSA(self):
         """
         Parses the MSA for the MDR region.
-        Outputs the portion of the contig sequence recorded from the 454 output which matches the sequences from the msa in the MDR
+        Outputs the portion of the contig sequence recorded from the 454 output which matches the sequences from the msa in the MDR,
+        placed with a k-mer index over the contigs (see locate.KmerIndex)
         """
-        path = self.rootPath + '/out/pAss03/' + self.ko + ".msa"
-        for record in SeqIO.parse(path, "fasta"):
-            contig = self.contigList[record.id]['fullseq'] #might not have this contig in the newbler cause .... shet something's seriously not right
-            recseq = str(record.seq)[self.start:self.end]
-
-            shrunk = recseq.replace('-', '').upper()
-            substrResult = contig.find(shrunk)
-            #its a reverse strand
-            if substrResult == -1:
-                revshrunk = str(record.seq.reverse_complement())[self.start : self.end].replace('-', '').upper()
-                substrResult = contig.find(revshrunk)
-                self.contigList[record.id]['mdr'] = { 'start': substrResult,
-                                                            'end' : len(revshrunk) + substrResult,
-                                                            'seq' : revshrunk,
-                                                            'direction' : 'ntRev'
-                }
-            #not a reverse strand
-            else:
-                self.contigList[record.id]['mdr'] = {
-                    'start': substrResult,
-                    'end' : len(shrunk) + substrResult,
-                    'seq' : shrunk,
-                    'direction' : 'ntRev'
-                }
-
-
+        msa = self.__loadMSA()
+        self.contigIndex = KmerIndex({contigID: info['fullseq'] for contigID, info in self.contigList.items()})
+        for contigID in msa.ids:
+            if contigID not in self.contigList:
+                #outside the MDR, or not in the newbler output cause .... shet something's seriously not right
+                continue
+            shrunk = self.__getSeq(msa, contigID, self.start, self.end)
+            #finds the MDR on either strand, tolerating a few mismatches
+            placement = self.contigIndex.locate(contigID, shrunk)
+            if placement is None:
+                print("%s-%s: MDR could not be placed on the contig" % (self.ko, contigID))
+                continue
+            self.contigList[contigID]['mdr'] = {
+                'start': placement.start,
+                'end' : placement.end,
+                'seq' : self.contigList[contigID]['fullseq'][placement.start : placement.end],
+                'direction' : 'ntRev',
+                'strand' : placement.strand,
+                'score' : placement.score
+            }
+            metrics.count("placed")
+
+    @metrics.timed("readStatusPair")
     def __readStatusPair(self):
         """
         Newbler interprets was given the command to intepret the reads as paired end reads.
@@ -210,177 +337,106 @@ class Alignment:
         10918|165696|411626-411727|s_1  SameContig      144     contig00150     265     +       contig00150     409     -
         12391|1091|1788625-1788726|s_1  SameContig      156     contig00405     553     +       contig00405     709     -
 
+        The filtering (SameContig and FalsePair, see status.readPairStatus) and splitting is done column wise,
+        self.placement is a table indexed by read ID with parent, readone, readtwo and direction columns
         """
-        # 454Pairstatus
-        df = pd.read_csv(self.rootPath + "/out/newbler/"+self.ko+"/454PairStatus.txt", sep="\t")
-
-#isAss =  == ['SameContig', 'Link', 'OneUnmapped']
-        def splitNstore(row):
-            """
-            newbler seems to be miss labelling based on status the reads: alright assemblies -> FalsePair
-            False Pairs are Paired End reads whose ends either:
-                * map to different reference sequences or alignin contigs that are in different scaffolds
-                * map to locations on a single reference sequence or assembled contig with a distance outside the expected library span
-                * have an unexpected relative orientation
-            eg.
-            Template        Status  Distance        Left Contig     Left Pos        Left Dir        Right Contig    Right Pos    Right Dir       Left Distance   RightDistance
-            51910|221065|1544081-1544182|s_1        FalsePair       144     contig00235     156     +       contig00235 300      -
-            """
-            acceptedStatus = set(['SameContig', 'FalsePair'])
-            if row['Status'] in acceptedStatus: #we should consider other statuses; yep come back to bite me in the butt
-                splitNstore_sameContig(row)
-            #switcher = {
-                #'SameContig': splitNstore_sameContig(row)
-                #'Link':
-                #'OneUnmapped':
-            #}
-            #switcher.get(row['Status'], "not inside")
-
-        def splitNstore_sameContig(row):
-            readID = row['Template'].split("|")[0]
-            isPos = row['Left Dir'] == '+'
-            try:
-                self.readInfo[readID] = {
-                    'parent': row['Left Contig'],
-                    'readone':  int(row['Left Pos']),
-                    'readtwo':  row['Right Pos'],
-                    'direction':  'forward' if isPos else 'reverse'
-                }
-            except:
-                print("%s the parent:%s ; read1: %s; direction %s") % (readID, row['Left Contig'], row['Left Pos'], row['Left Dir'])
-        df.apply(splitNstore, axis=1)
+        self.placement = readPairStatus(self.rootPath + "/out/newbler/"+self.ko+"/454PairStatus.txt")
+        metrics.count("pairs", len(self.placement))
 
     def __guidedAlignment(self):
         cmd = "bwa mem"
         # incomplete: what i wanted to do is to have the mapping process passed onto bwa + 454ReadStatus, ie. get the read
         # which belong to
 
+    @metrics.timed("parseFastQ")
     def __parseFastQ(self):
         """
         Parses fastqfiles, stores then outputs the reads as fq pileups on the respective contigs.
         not really working. will begin work on new private method
         """
-        def fixAlignment(rootPath, ko, contigID, debug=False):
-            """
-            temp fix for parseFastQ
-            readStatus mapping only gives location for contig not read,
-            ie.
-               123456789
-             --ATCGGGCAT  <contig> mapping position 1-4 (3 nts)
-             CGATCG-----  <read>   maping  position 3-6 (3 nts)
-             123456
-            """
-            #Part1: run muscle
-            #"tests/out/pileup/K00927/K00927-contig000001"
-            pileup = "%s/out/pileup/%s" % (rootPath, ko)
-            inputFile = '%s/%s-%s' % (pileup, ko, contigID)
-            cmd = "muscle -in %s -out %s.msa" % (inputFile, inputFile)
-            print("Running muscle:\n%s"%cmd)
-            if not debug:
-                try:
-                    subprocess.run(cmd, shell=True, check=True)
-                except subprocess.CalledProcessError as err:
-                    print("Error:\n", err.output)
-            #Part2: Store MSA sequences
-            msaed = {}
-            seqIter = SeqIO.parse("%s.msa"%inputFile, 'fasta')
-            for aligned in seqIter:
-                #print(aligned.description)
-                try:
-                    readID = re.search("^(\S+)-\S+$", aligned.description).group(1)
-                    msaed[readID] = str(aligned.seq)
-                except AttributeError as err:
-                    msaed[aligned.description] = str(aligned.seq)
-            return msaed
-
         testing = False
-        fq1 = self.rootPath + "/out/newbler/" + self.ko + "/input/" + self.ko + ".1.fq"
-        fq2 = self.rootPath + "/out/newbler/" + self.ko + "/input/" + self.ko + ".2.fq"
-        poshash = {} #defaultdict(list)
-        for record in SeqIO.parse(fq1, "fastq"):
-            readID = record.description.split("|")[0]
-            if readID in self.readInfo:
-                theParent = self.readInfo[readID]['parent']
-                if theParent in self.contigList.keys(): #sometimes shorter contigs are not outputed so readInfo may not match the contig info. ie. read was assigned to a contig which was not printed
-                    #print "yes Inside"
-                    startPos = self.readInfo[readID]['readone']
-                    direc = self.readInfo[readID]['direction']
-                    back = "-" * int(len(self.contigList[theParent]['fullseq']) - startPos - len(record.seq))
-                    if direc == 'reverse':
-                        startPos = startPos -101
-                        front = "-" * int(startPos-1)
-                        seq = str(record.seq.reverse_complement())
+        mate1, mate2 = FastqCache.load(self.rootPath, self.ko).mates
+        poshash = {} #defaultdict(list) of PileupRead, keyed on start position
+        placed = ReadRegistry.fromPlacement(self.placement)
+        readone, readtwo, strand = placed['readone'], placed['readtwo'], placed['strand']
+        rows = placed.rows(mate1.ids)
+        for i in np.flatnonzero(rows >= 0):
+            row, readID, seq = rows[i], str(mate1.ids[i]), mate1.seq(i)
+            theParent, startPos, direc = placed.parent(row), int(readone[row]), 'forward' if strand[row] > 0 else 'reverse'
+            if theParent in self.contigList.keys(): #sometimes shorter contigs are not outputed so placement may not match the contig info. ie. read was assigned to a contig which was not printed
+                #print "yes Inside"
+                if direc == 'reverse':
+                    startPos = startPos -101
+                    read = PileupRead(readID + "/1", theParent, startPos - 1, '-', reverseComplement(seq))
+                else:
+                    read = PileupRead(readID + "/1", theParent, startPos - 1, '+', seq)
+                if theParent in poshash:
+                    if testing:
+                        if theParent == 'contig00001':
+                            poshash[theParent][startPos].append(read)
                     else:
-                        front = "-" * int(startPos-1)
-                        seq = str(record.seq)
-                    readSEQ = front+seq+back
-                    readID = readID + "/1"
-                    if theParent in poshash:
-                        if testing:
-                            if theParent == 'contig00001':
-                                poshash[theParent][startPos].append((readID, readSEQ))
-                        else:
-                            poshash[theParent][startPos].append((readID, readSEQ))
+                        poshash[theParent][startPos].append(read)
+                else:
+                    poshash[theParent] = defaultdict(list)
+        rows = placed.rows(mate2.ids)
+        for i in np.flatnonzero(rows >= 0):
+            row, readID, seq = rows[i], str(mate2.ids[i]), mate2.seq(i)
+            theParent, startPos, direc = placed.parent(row), int(readtwo[row]), 'forward' if strand[row] > 0 else 'reverse'
+            if theParent in self.contigList.keys(): #sometimes shorter contigs are not outputed so placement may not match the contig info. ie. read was assigned to a contig which was not printed
+                if direc == 'reverse':
+                    read = PileupRead(readID + "/2", theParent, startPos - 1, '+', seq)
+                else:
+                    startPos = startPos - 101
+                    read = PileupRead(readID + "/2", theParent, startPos - 1, '-', reverseComplement(seq))
+                if theParent in poshash:
+                    if testing:
+                        if theParent == 'contig00001':
+                            poshash[theParent][startPos].append(read)
                     else:
-                        poshash[theParent] = defaultdict(list)
-        for record in SeqIO.parse(fq2, "fastq"):
-            readID = record.description.split("|")[0]
-            if readID in self.readInfo:
-                theParent = self.readInfo[readID]['parent']
-                if theParent in self.contigList.keys(): #sometimes shorter contigs are not outputed so readInfo may not match the contig info. ie. read was assigned to a contig which was not printed
-                    startPos = self.readInfo[readID]['readtwo']
-                    direc = self.readInfo[readID]['direction']
-                    if direc == 'reverse':
-                        seq = str(record.seq)
-                        front = "-" * int(startPos-1)
-                    else:
-                        seq = str(record.seq.reverse_complement())
-                        startPos = startPos - 101
-                        front = "-" * (int(startPos-1))
-                    back = "-" * int(len(self.contigList[theParent]['fullseq']) - startPos - len(record.seq))
-                    readSEQ = front+seq+back
-                    readID = readID + "/2"
-                    if theParent in poshash:
-                        if testing:
-                            if theParent == 'contig00001':
-                                poshash[theParent][startPos].append((readID, readSEQ))
-                        else:
-                            poshash[theParent][startPos].append((readID, readSEQ))
-                    else:
-                        poshash[theParent] = defaultdict(list)
-        #open one file for each contig
-        #readAlignment
+                        poshash[theParent][startPos].append(read)
+                else:
+                    poshash[theParent] = defaultdict(list)
+        #one block per contig in the KO's pileup store
+        #readAlignment, reads are only padded out to the contig length as they are written
         pileup = "%s/out/pileup/%s" % (self.rootPath, self.ko)
-        for contigID in self.contigList:
-            with open('%s/%s-%s' % (pileup, self.ko, contigID), 'w') as f:
-                    #print original contig and full sequence
-                    f.write(">%s\n" % contigID)
-                    f.write(str(self.contigList[contigID]['fullseq']+"\n"))
-                    #print the reads in order
-                    if contigID in poshash:
-                        for key, info in sorted(poshash[contigID].items()):
-                            f.write(">%s-%s\n%s\n" % (info[0][0], contigID, info[0][1]))
-        #fixAlignment
-        for contigID in self.contigList:
-            msa = fixAlignment(self.rootPath, self.ko, contigID)
-            newOutputFile = '%s/%s-%s.reAligned.msa' % (pileup, self.ko, contigID)
-            with open(newOutputFile, 'w') as newOut:
-                    #print original contig and full sequence
-                    newOut.write(">%s\n" % contigID)
-                    newOut.write(str(msa[contigID]) + "\n")
-                    #print the reads in order
-                    if contigID in poshash:
-                        for key, info in sorted(poshash[contigID].items()):
-                            newOut.write(">%s-%s\n%s\n" % (info[0][0], contigID, msa[info[0][0]]))
+        with StoreWriter('%s/%s.pileup' % (pileup, self.ko)) as f:
+            for contigID in self.contigList:
+                fullseq = str(self.contigList[contigID]['fullseq'])
+                #print original contig and full sequence
+                block = [">%s\n%s\n" % (contigID, fullseq)]
+                #print the reads in order
+                if contigID in poshash:
+                    for key, reads in sorted(poshash[contigID].items()):
+                        block.append(">%s\n%s\n" % (reads[0].header(), reads[0].padded(len(fullseq))))
+                f.write(contigID, "".join(block))
+                metrics.count("reads", len(block) - 1)
+
+    def __fixAlignment(self, aligned, contigID):
+        """
+        temp fix for parseFastQ
+        readStatus mapping only gives location for contig not read,
+        ie.
+           123456789
+         --ATCGGGCAT  <contig> mapping position 1-4 (3 nts)
+         CGATCG-----  <read>   maping  position 3-6 (3 nts)
+         123456
+        the pileups are realigned by self.realigner beforehand (see realign),
+        this stores the resulting MSA sequences of contigID from the aligned store
+        """
+        msaed = {}
+        for recordID, description, seq in aligned.records(contigID):
+            try:
+                readID = re.search(r"^(\S+)-\S+$", recordID).group(1)
+                msaed[readID] = seq
+            except AttributeError as err:
+                msaed[recordID] = seq
+        return msaed
 
     def __readStatus(self):
         """
         stores read alignment information for use later
         """
         filePath = "%s/out/newbler/%s/454ReadStatus.txt"%(self.rootPath, self.ko)
-        df = pd.read_csv(filePath, sep="\t")
-        df.columns=['Accno','ReadStatus','5Contig','5Position','5Strand','3Contig','3Position','3Strand']
-
         """
         Accno   Read Status     5' Contig       5' Position     5' Strand       3' Contig       3' Position     3' Strand
         simuREAD_62|taxID|191767|loc|7076959-7077060|outpu      Assembled       contig00200     258     -       contig00200     157     +
@@ -388,21 +444,4 @@ class Alignment:
         simuREAD_883|taxID|18|loc|841131-841232|output|s_1      Assembled       contig00107     211     +       contig00107     312     -
         simuREAD_2334|taxID|561|loc|4092117-4092218|output      Assembled       contig00767     304     +       contig00767     404     -
         """
-
-        def splitNstore(row):
-            readID = row['Accno'].split("|")[0]
-            isAss = row['ReadStatus'] == 'Assembled'
-            if isAss:
-                isSame = row['5Contig'] == row['3Contig']
-                isPos = row['5Strand'] == '+'
-                if isSame :
-                    self.readInfo[readID] = {
-                        'parent': row['5Contig'],
-                        'startPos':  int(row['5Position']) if isPos else int(row['3Position']),
-                        'endPos'      : int(row['3Position']) if isPos else int(row['5Position']),
-                        'direction':  'forward' if isPos else 'reverse'
-                    }
-
-        df.apply(splitNstore, axis=1)
-
-
+        self.readStatus = readReadStatus(filePath)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from .manifest import Manifest
+from .         import metrics
+from .newbler  import Newbler
+from .retry    import RetryPolicy
+from .pileup   import Alignment
+
+class Pipeline:
+    '''
+    Runs a KO through the gene centric stages in order,
+    skipping the stages whose inputs have not changed since they last completed (see Manifest).
+
+        1. assembly    : Newbler.geneCentricAssembly on out/newbler/<KO>/input/<KO>.{1,2}.fq
+        2. pileup      : Alignment.doPile without realignment
+        3. realignment : Alignment.realign
+        4. extraction  : Alignment.getReadsFromPileUP into out/preNewbler/<KO>/<KO>
+        5. roundtwo    : Newbler.mdrCentricAssembly on out/preNewbler/<KO>/<KO>
+
+    Rerunning a stage removes the manifests of every stage after it, whether or not they are run this time,
+    so they are rerun the next time they are asked for.
+
+    Example:
+        >>> Pipeline("/path/to/root", "K00927", cpu=4).run(['pileup', 'realignment', 'extraction'])
+    '''
+
+    STAGES = ['assembly', 'pileup', 'realignment', 'extraction', 'roundtwo']
+
+    def __init__(self, rootPath, ko, cpu=1, threads=1, budget=None, assm=None, force=False, aligner="banded", cache=None, retry=None, msaCache=None, recomputeMDR=False):
+        self.rootPath = rootPath
+        self.ko = ko
+        self.cpu = str(cpu)
+        self.threads = threads
+        self.budget = budget
+        self.assm = assm
+        self.force = force
+        self.aligner = aligner
+        self.cache = cache
+        self.msaCache = msaCache
+        self.recomputeMDR = recomputeMDR
+        self.retry = RetryPolicy() if retry is None else retry
+        self.timings = {}
+        self.manifest = Manifest(rootPath, ko)
+
+    def run(self, stages=None):
+        """
+        runs the given stages (default all), returns {stage: 'done' | 'skipped' | 'failed'}
+        the wall time of every stage run is kept in self.timings
+        """
+        stages = self.STAGES if stages is None else stages
+        status = {}
+        rerun = self.force
+        for stage in self.STAGES:
+            if stage not in stages:
+                continue
+            inputs = self.__inputs(stage)
+            if not rerun and self.manifest.isDone(stage, inputs):
+                print("%s: %s is up to date, skipping" % (self.ko, stage))
+                status[stage] = 'skipped'
+                continue
+            #everything downstream of a rerun stage is stale
+            rerun = True
+            for later in self.STAGES[self.STAGES.index(stage):]:
+                self.manifest.invalidate(later)
+            started = time.time()
+            with metrics.stage(stage, self.ko):
+                #the assembly stages return False when newbler gave up, see self.retry.failures
+                succeeded = getattr(self, "_Pipeline__%s" % stage)()
+            self.timings[stage] = time.time() - started
+            outputs = self.__outputs(stage)
+            if succeeded is not False and all(os.path.exists(path) for path in outputs):
+                self.manifest.record(stage, self.__inputs(stage), outputs)
+                status[stage] = 'done'
+            else:
+                print("%s: %s did not produce its outputs, stopping" % (self.ko, stage))
+                status[stage] = 'failed'
+                break
+        return status
+
+    def __newbler(self, root):
+        if self.assm is None:
+            return Newbler(root, self.ko, self.cpu, retry=self.retry, cache=self.cache)
+        return Newbler(root, self.ko, self.cpu, self.assm, retry=self.retry, cache=self.cache)
+
+    def __pileupStore(self):
+        return "%s/out/pileup/%s/%s.pileup" % (self.rootPath, self.ko, self.ko)
+
+    def __inputs(self, stage):
+        newbler = "%s/out/newbler/%s" % (self.rootPath, self.ko)
+        fastq = ["%s/input/%s.%s.fq" % (newbler, self.ko, i) for i in ("1", "2")]
+        mdr = ["%s/out/pAss03/%s.msa" % (self.rootPath, self.ko), "%s/out/pAss11/%s.fna" % (self.rootPath, self.ko)]
+        assembly = ["%s/454AllContigs.fna" % newbler, "%s/454PairStatus.txt" % newbler]
+        return {
+            'assembly'    : fastq,
+            'pileup'      : fastq + assembly + mdr,
+            'realignment' : [self.__pileupStore()],
+            'extraction'  : fastq + mdr + [self.__pileupStore()],
+            'roundtwo'    : ["%s/out/preNewbler/%s/%s" % (self.rootPath, self.ko, self.ko)]
+        }[stage]
+
+    def __outputs(self, stage):
+        newbler = "%s/out/newbler/%s" % (self.rootPath, self.ko)
+        return {
+            'assembly'    : ["%s/454AllContigs.fna" % newbler, "%s/454PairStatus.txt" % newbler],
+            'pileup'      : [self.__pileupStore()],
+            'realignment' : ["%s/out/pileup/%s/%s.reAligned.msa" % (self.rootPath, self.ko, self.ko)],
+            'extraction'  : ["%s/out/preNewbler/%s/%s" % (self.rootPath, self.ko, self.ko)],
+            'roundtwo'    : ["%s/out/preNewbler/%s/454AllContigs.fna" % (self.rootPath, self.ko)]
+        }[stage]
+
+    def __assembly(self):
+        return self.__newbler("%s/out/newbler" % self.rootPath).geneCentricAssembly(MDR=False)
+
+    def __pileup(self):
+        Alignment(self.rootPath, self.ko, self.threads, self.budget, cacheDir=self.msaCache, recomputeMDR=self.recomputeMDR).doPile(realign=False)
+
+    def __realignment(self):
+        Alignment(self.rootPath, self.ko, self.threads, self.budget, self.aligner, self.msaCache, self.recomputeMDR).realign()
+
+    def __extraction(self):
+        Alignment(self.rootPath, self.ko, cacheDir=self.msaCache, recomputeMDR=self.recomputeMDR).getReadsFromPileUP()
+
+    def __roundtwo(self):
+        return self.__newbler("%s/out/preNewbler" % self.rootPath).mdrCentricAssembly()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import multiprocessing
+import subprocess
+import threading
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .banded import BandedAligner
+from .store import IndexedStore, StoreWriter
+
+class Realigner:
+    '''
+    Realigns the per contig pileups of a KO concurrently.
+
+    aligner : 'banded' (default) realigns every read around its pileup offset in process with BandedAligner,
+              'muscle' runs a full MSA per pileup with the muscle binary.
+
+    threads : number of pileups this KO may realign at once
+    budget  : optional semaphore shared with the other KO workers,
+              eg. multiprocessing.BoundedSemaphore(totalCPU) handed to the pool initializer.
+              every alignment (muscle process or banded alignment) holds one slot while it runs,
+              so the cores used for realignment across all workers never exceed the budget.
+
+    Banded alignments are pure python, with threads > 1 they run in a pool of that many processes.
+    Pool workers (eg. those of tryPileup) are daemonic and cannot start one, they align in their own process.
+
+    The pileups are read from and the alignments written to IndexedStores, muscle gets
+    each pileup on stdin. Jobs are started largest pileup first so the long ones do not trail at the end,
+    pileups whose alignment is already in the output store (same input hash) are not realigned.
+    '''
+
+    def __init__(self, threads=1, budget=None, muscle="muscle", aligner="banded"):
+        if aligner not in ("banded", "muscle"):
+            raise ValueError("Unknown aligner: %s" % aligner)
+        self.threads = max(int(threads), 1)
+        self.budget  = budget
+        self.muscle  = muscle
+        self.aligner = aligner
+        self.banded  = BandedAligner()
+
+    def run(self, pileupPath, msaPath, keys=None):
+        """
+        realigns the pileups in the store at pileupPath (only keys if given) into a store at msaPath,
+        returns the list of keys which failed
+        """
+        pileups = IndexedStore(pileupPath)
+        previous = IndexedStore(msaPath, build=False)
+        keys = [key for key in (pileups.keys() if keys is None else keys) if key in pileups]
+        #the aligner is part of the hash, switching aligners realigns everything
+        digests = {key: hashlib.sha1((self.aligner + pileups.block(key)).encode()).hexdigest() for key in keys}
+        reused = [key for key in keys if previous.tag(key) == digests[key]]
+        jobs = sorted((key for key in keys if previous.tag(key) != digests[key]), key=pileups.length, reverse=True)
+        print("Realigning %s of %s pileups with %s (%s threads)" % (len(jobs), len(keys), self.aligner, self.threads))
+        lock = threading.Lock()
+        with StoreWriter(msaPath) as writer:
+            for key in reused:
+                writer.write(key, previous.block(key), digests[key])
+            previous.close()
+
+            processes = None
+            if self.aligner == "banded" and self.threads > 1 and len(jobs) > 1 and not multiprocessing.current_process().daemon:
+                processes = ProcessPoolExecutor(max_workers=self.threads)
+
+            def realign(key):
+                if self.aligner == "banded":
+                    aligned = self.__banded(pileups.block(key), processes)
+                else:
+                    aligned = self.__muscle(key, pileups.block(key))
+                if aligned is not None:
+                    with lock:
+                        writer.write(key, aligned, digests[key])
+                return aligned is not None
+
+            #without a process pool banded alignments hold the GIL, more threads would not make them faster
+            workers = 1 if self.aligner == "banded" and processes is None else self.threads
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    failed = [key for key, ok in zip(jobs, executor.map(realign, jobs)) if not ok]
+            finally:
+                if processes is not None:
+                    processes.shutdown()
+        pileups.close()
+        return failed
+
+    def __banded(self, pileup, processes):
+        if self.budget is not None:
+            self.budget.acquire()
+        try:
+            if processes is None:
+                return self.banded.align(pileup)
+            return processes.submit(self.banded.align, pileup).result()
+        finally:
+            if self.budget is not None:
+                self.budget.release()
+
+    def __muscle(self, key, pileup):
+        if self.budget is not None:
+            self.budget.acquire()
+        try:
+            result = subprocess.run([self.muscle], input=pileup.encode(), check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except (subprocess.CalledProcessError, OSError) as err:
+            print("Error running muscle on %s:\n" % key, getattr(err, 'stderr', err))
+            return None
+        finally:
+            if self.budget is not None:
+                self.budget.release()
+        return result.stdout.decode()
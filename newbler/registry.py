@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+class ReadRegistry:
+    '''
+    Per read information for a KO kept in parallel typed arrays instead of a dict per read.
+
+    Read IDs (the numeric part before the first | of the fastQ header) are interned as a sorted int64 array,
+    a read's row is found by binary search. Columns are numpy arrays of the same length, eg.
+
+        taxa      int32   taxon ID from the fastQ header
+        readnum   uint32  counter used when numbering extracted reads
+        parent    int32   code of the contig in self.contigs
+        readone   int32   left read position
+        readtwo   int32   right read position
+        strand    int8    1 forward, -1 reverse
+
+    which comes to 29 bytes a read with all columns filled.
+    When a read ID appears more than once the last occurrence is kept, like storing them one by one in a dict.
+    '''
+
+    def __init__(self, readIDs, **columns):
+        readIDs = np.asarray(readIDs, dtype=np.int64)
+        #unique over the reversed IDs so the last occurrence wins
+        unique, first = np.unique(readIDs[::-1], return_index=True)
+        keep = len(readIDs) - 1 - first
+        self.ids = unique
+        self.columns = {name: np.asarray(values)[keep] for name, values in columns.items()}
+        self.contigs = []
+
+    @classmethod
+    def fromPlacement(cls, placement):
+        """
+        registry of a read placement table (see status.readPairStatus)
+        """
+        codes, contigs = placement['parent'].factorize()
+        registry = cls(placement.index.values.astype(np.int64),
+                       parent  = codes.astype(np.int32),
+                       readone = placement['readone'].values.astype(np.int32),
+                       readtwo = placement['readtwo'].values.astype(np.int32),
+                       strand  = np.where(placement['direction'].values == 'forward', 1, -1).astype(np.int8))
+        registry.contigs = list(contigs)
+        return registry
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def row(self, readID):
+        """
+        row of readID, -1 if it is not registered
+        """
+        readID = int(readID)
+        i = int(np.searchsorted(self.ids, readID))
+        if i < len(self.ids) and self.ids[i] == readID:
+            return i
+        return -1
+
+    def rows(self, readIDs):
+        """
+        rows of many read IDs at once, -1 for those not registered
+        """
+        readIDs = np.asarray(readIDs, dtype=np.int64)
+        rows = np.searchsorted(self.ids, readIDs)
+        rows[rows >= len(self.ids)] = 0
+        found = len(self.ids) > 0 and self.ids[rows] == readIDs
+        return np.where(found, rows, -1)
+
+    def parent(self, row):
+        return self.contigs[self.columns['parent'][row]]
+
+    def nbytes(self):
+        return self.ids.nbytes + sum(values.nbytes for values in self.columns.values())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+
+class RetryPolicy:
+    '''
+    Decides what to do after a failed assembly, shared by the Newbler assembly entry points.
+
+    Failures are classified as:
+        timeout      : runAssembly ran past the time limit
+        stalled      : runAssembly showed no sign of progress and the supervisor killed the run
+        crash        : runAssembly exited with a non zero exit code (eg. killed for using too much memory)
+        incomplete   : exited cleanly but 454NewblerProgress.txt never reports success
+        empty-output : succeeded but 454AllContigs.fna is missing or empty, retrying will not help
+        no-input     : neither fastQ has reads, nothing to run
+
+    timeout, stalled and crash are retried with reduced settings: first -cpu is halved down to minCPU,
+    then -m (keep reads in memory) is dropped. incomplete is retried as is.
+    Retries wait baseDelay * 2^(attempt - 1) seconds, capped at maxDelay,
+    and the KO is skipped after maxAttempts.
+
+    Every failure is kept in self.failures and, if reportFile is given, appended to it as a JSON line.
+    One policy is meant to be shared by all the assemblies of a run (see Scheduler and Pipeline), it is thread safe.
+    '''
+
+    def __init__(self, maxAttempts=4, baseDelay=30, maxDelay=600, minCPU=1, reportFile=None):
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.minCPU = minCPU
+        self.reportFile = reportFile
+        self.failures = []
+        self.__lock = threading.Lock()
+
+    def classify(self, returncode, timedOut, progressDone, outputEmpty, stalled=False):
+        """
+        failure class of an attempt, None if it succeeded
+        """
+        if timedOut:
+            return 'timeout'
+        if stalled:
+            return 'stalled'
+        if returncode != 0:
+            return 'crash'
+        if not progressDone:
+            return 'incomplete'
+        if outputEmpty:
+            return 'empty-output'
+        return None
+
+    def delay(self, attempt):
+        return min(self.maxDelay, self.baseDelay * 2 ** (attempt - 1))
+
+    def decide(self, attempt, failure):
+        """
+        one of retry, escalate or skip
+        """
+        if failure in ('empty-output', 'no-input') or attempt >= self.maxAttempts:
+            return 'skip'
+        if failure in ('timeout', 'stalled', 'crash'):
+            return 'escalate'
+        return 'retry'
+
+    def escalate(self, settings):
+        """
+        reduced copy of settings {'cpu': int, 'inMemory': bool}
+        """
+        settings = dict(settings)
+        if settings['cpu'] > self.minCPU:
+            settings['cpu'] = max(self.minCPU, settings['cpu'] // 2)
+        elif settings['inMemory']:
+            settings['inMemory'] = False
+        return settings
+
+    def record(self, ko, attempt, failure, settings, action, returncode=None):
+        entry = {
+            'ko'         : ko,
+            'attempt'    : attempt,
+            'failure'    : failure,
+            'returncode' : returncode,
+            'cpu'        : settings['cpu'],
+            'inMemory'   : settings['inMemory'],
+            'action'     : action,
+            'time'       : time.time()
+        }
+        with self.__lock:
+            self.failures.append(entry)
+            if self.reportFile is not None:
+                with open(self.reportFile, "a") as report:
+                    report.write(json.dumps(entry) + "\n")
+        return entry
+
+    def failuresOf(self, ko):
+        with self.__lock:
+            return [entry for entry in self.failures if entry['ko'] == ko]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import os
+import threading
+import time
+
+from .             import metrics
+from .cache        import AssemblyCache
+from .fastq        import preflight
+from .newbler      import Newbler
+from .retry        import RetryPolicy
+from .supervisor   import Supervisor
+
+class Scheduler:
+    '''
+    Runs Newbler.geneCentricAssembly for many KOs at once, packing their -cpu over a fixed number of cores.
+
+    The cost of a KO is estimated from the bases in its .1.fq/.2.fq files (see fastq.preflight),
+    KOs are started largest first and given threads in proportion to their cost
+    (between minThreads and maxThreads) so the small KOs fill in the cores left over by the large ones.
+    All assemblies share one RetryPolicy, failed attempts are written to its reportFile and listed per KO in the report,
+    together with whether the KO was assembled in the end.
+
+    Example:
+        >>> scheduler = Scheduler("out/newbler", os.listdir("out/newbler"), cores=24)
+        >>> report = scheduler.run()
+        >>> report['makespan']
+    '''
+
+    def __init__(self, root, kos, cores, maxThreads=None, minThreads=1, assm=None, MDR=False, sampleBytes=1 << 20, cache=None, supervisor=None, retry=None):
+        self.root = root
+        self.kos = kos
+        self.cores = int(cores)
+        self.maxThreads = min(int(maxThreads or cores), self.cores)
+        self.minThreads = max(min(int(minThreads), self.maxThreads), 1)
+        self.assm = assm
+        self.MDR = MDR
+        self.sampleBytes = sampleBytes
+        self.cache = cache
+        self.supervisor = supervisor
+        self.retry = RetryPolicy() if retry is None else retry
+
+    def fastqs(self, ko):
+        if self.MDR:
+            inputFile = "%s/%s/%s" % (self.root, ko, ko)
+        else:
+            inputFile = "%s/%s/input/%s" % (self.root, ko, ko)
+        return ["%s.%s.fq" % (inputFile, i) for i in ("1", "2")]
+
+    def cost(self, ko):
+        """
+        estimated cost of assembling a KO, bases of input fastQ estimated from the first sampleBytes of each file
+        (bytes of input fastQ when sampleBytes is 0)
+        """
+        infos = [preflight(fq, self.sampleBytes) for fq in self.fastqs(ko)]
+        if self.sampleBytes > 0:
+            return sum(info['bases'] or 0 for info in infos)
+        return sum(info['size'] for info in infos)
+
+    def plan(self):
+        """
+        list of (ko, cost, threads), largest first
+        """
+        costs = sorted(((ko, self.cost(ko)) for ko in self.kos), key=lambda job: job[1], reverse=True)
+        largest = max([cost for ko, cost in costs] + [1])
+        return [(ko, cost, max(self.minThreads, min(self.maxThreads, int(math.ceil(self.maxThreads * cost / largest)))))
+                for ko, cost in costs]
+
+    def run(self, debug=False):
+        """
+        assembles all KOs, a KO is started as soon as enough cores are free for it,
+        trying the largest pending KO first. Returns a report of per KO timings and outcome, the KOs which
+        were not assembled (failed) and the makespan
+        """
+        pending = self.plan()
+        free = [self.cores]
+        cond = threading.Condition()
+        report = {'cores': self.cores, 'kos': {}}
+        workers = []
+
+        def assemble(ko, cost, threads):
+            start = time.time()
+            assembled = False
+            try:
+                if self.assm is None:
+                    newbler = Newbler(self.root, ko, str(threads), retry=self.retry, cache=self.cache, supervisor=self.supervisor)
+                else:
+                    newbler = Newbler(self.root, ko, str(threads), self.assm, retry=self.retry, cache=self.cache, supervisor=self.supervisor)
+                assembled = newbler.geneCentricAssembly(debug=debug, MDR=self.MDR) is True
+            finally:
+                with cond:
+                    report['kos'][ko] = {'cost': cost, 'threads': threads, 'start': start - began, 'end': time.time() - began,
+                                         'assembled': assembled, 'failures': self.retry.failuresOf(ko)}
+                    free[0] += threads
+                    cond.notify()
+
+        began = time.time()
+        with cond:
+            while pending:
+                fits = [job for job in pending if job[2] <= free[0]]
+                if not fits:
+                    cond.wait()
+                    continue
+                job = fits[0]
+                pending.remove(job)
+                free[0] -= job[2]
+                print("Starting %s with %s threads (%s cores free)" % (job[0], job[2], free[0]))
+                worker = threading.Thread(target=assemble, args=job)
+                worker.start()
+                workers.append(worker)
+        for worker in workers:
+            worker.join()
+        report['makespan'] = time.time() - began
+        report['failed'] = sorted(ko for ko, info in report['kos'].items() if not info['assembled'])
+        busy = sum(info['threads'] * (info['end'] - info['start']) for info in report['kos'].values())
+        report['utilization'] = busy / (self.cores * report['makespan']) if report['makespan'] > 0 else 0
+        print("Assembled %s KOs on %s cores, makespan: %.1fs utilization: %.1f%%" % (len(report['kos']) - len(report['failed']), self.cores, report['makespan'], 100 * report['utilization']))
+        if report['failed']:
+            print("Not assembled: %s" % ", ".join(report['failed']))
+        return report
+
+def assembleAll(newbler, kos, cpu, maxThreads=None, assm=None, MDR=False, cache=None, cacheGB=100, stallTimeout=1800,
+                failures=None, metricsPath=None):
+    """
+    assembles kos (KO directories under newbler) with one Scheduler, as `python -m newbler assemble`
+    and script/scg2.0101.firstRoundAssembly2.py do:
+    an AssemblyCache in the directory cache (None for none) of cacheGB, a Supervisor killing runs stalled for stallTimeout seconds,
+    one RetryPolicy writing failed attempts to failures (default: assembly.failures.jsonl next to newbler)
+    and the metrics of every assembly in metricsPath with a Prometheus textfile next to it. Returns the Scheduler's report
+    """
+    failures = failures or os.path.join(os.path.dirname(os.path.abspath(newbler)), "assembly.failures.jsonl")
+    scheduler = Scheduler(newbler, kos, cpu, maxThreads=maxThreads, assm=assm, MDR=MDR,
+                          cache=None if cache is None else AssemblyCache(cache, maxBytes=int(cacheGB * 2**30)),
+                          supervisor=Supervisor(stallTimeout=stallTimeout), retry=RetryPolicy(reportFile=failures))
+    metrics.configure(metricsPath)
+    report = scheduler.run()
+    if scheduler.retry.failures:
+        print("%s failed attempts, see %s" % (len(scheduler.retry.failures), failures))
+    if metricsPath is not None and os.path.isfile(metricsPath):
+        metrics.writePrometheus(metricsPath, os.path.splitext(metricsPath)[0] + ".prom")
+    return report
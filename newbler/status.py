@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+def readPairStatus(filePath, acceptedStatus=('SameContig', 'FalsePair')):
+    '''
+    Loads 454PairStatus.txt into a read placement table indexed by read ID,
+    the filtering, template ID splitting and strand logic are done on whole columns.
+
+    Columns:
+        parent    : contig the left read was assembled into
+        readone   : left read position
+        readtwo   : right read position
+        direction : forward if the left read is on the + strand, else reverse
+
+    newbler seems to be miss labelling the status of alright assemblies as FalsePair,
+    which is why FalsePair is accepted together with SameContig
+    '''
+    import pandas as pd
+    df = pd.read_csv(filePath, sep="\t",
+                     usecols=['Template', 'Status', 'Left Contig', 'Left Pos', 'Left Dir', 'Right Pos'],
+                     dtype={'Template': str, 'Status': str, 'Left Contig': str, 'Left Dir': str})
+    df = df[df['Status'].isin(acceptedStatus)]
+    placement = pd.DataFrame({
+        'parent'    : df['Left Contig'].values,
+        'readone'   : df['Left Pos'].values.astype(np.int64),
+        'readtwo'   : df['Right Pos'].values.astype(np.int64),
+        'direction' : pd.Categorical(np.where(df['Left Dir'].values == '+', 'forward', 'reverse'),
+                                     categories=['forward', 'reverse'])
+    }, index=pd.Index(df['Template'].str.split("|", n=1).str[0].values, name='readID'))
+    #later rows win, same as storing them one at a time into a dict
+    return placement[~placement.index.duplicated(keep='last')]
+
+def readReadStatus(filePath):
+    '''
+    Loads 454ReadStatus.txt into a read placement table indexed by read ID,
+    keeping only reads assembled with both ends on the same contig.
+
+    Columns:
+        parent    : contig the read was assembled into
+        startPos  : 5' position for + strand reads, 3' position otherwise
+        endPos    : 3' position for + strand reads, 5' position otherwise
+        direction : forward or reverse
+    '''
+    import pandas as pd
+    df = pd.read_csv(filePath, sep="\t")
+    df.columns = ['Accno', 'ReadStatus', '5Contig', '5Position', '5Strand', '3Contig', '3Position', '3Strand']
+    df = df[(df['ReadStatus'] == 'Assembled') & (df['5Contig'] == df['3Contig'])]
+    isPos = df['5Strand'].values == '+'
+    fivePrime = df['5Position'].values.astype(np.int64)
+    threePrime = df['3Position'].values.astype(np.int64)
+    placement = pd.DataFrame({
+        'parent'    : df['5Contig'].values,
+        'startPos'  : np.where(isPos, fivePrime, threePrime),
+        'endPos'    : np.where(isPos, threePrime, fivePrime),
+        'direction' : pd.Categorical(np.where(isPos, 'forward', 'reverse'), categories=['forward', 'reverse'])
+    }, index=pd.Index(df['Accno'].str.split("|", n=1).str[0].values, name='readID'))
+    return placement[~placement.index.duplicated(keep='last')]
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+
+def parseFasta(text):
+    '''
+    yields (id, description, seq) for each record of a FASTA formatted string,
+    description is the whole header line without the >
+    '''
+    header, seq = None, []
+    for line in text.split("\n"):
+        if line.startswith(">"):
+            if header is not None:
+                yield header.split(None, 1)[0], header, "".join(seq)
+            header, seq = line[1:].rstrip(), []
+        elif header is not None:
+            seq.append(line.strip())
+    if header is not None:
+        yield header.split(None, 1)[0], header, "".join(seq)
+
+class IndexedStore:
+    '''
+    Random access by ID into a single FASTA formatted file through a byte offset index and mmap.
+
+    Each key points to a block of the file, either one record (eg. 454AllContigs.fna, keyed on the record ID)
+    or several records written together by StoreWriter (eg. a contig's pileup, keyed on the contig ID).
+
+    The index sits next to the file as <path>.idx:
+        #source <size>  <mtime_ns> of the data file
+        key     offset  length  tag
+    tag is free text, Realigner uses it for a hash of the input the block was computed from.
+    If the index is missing or the file has changed since (size or mtime, as in msa.MSAMatrix) it is rebuilt
+    by one scan of the file (build=True), one block per record.
+    '''
+
+    def __init__(self, path, build=True):
+        self.path = path
+        self.index = {}
+        self.__data = None
+        self.__file = None
+        if not os.path.isfile(path):
+            if build:
+                raise IOError("No such file: %s" % path)
+            return
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.source = source(stat)
+        if not self.__loadIndex() and build:
+            self.__buildIndex()
+        if self.size > 0:
+            self.__file = open(path, 'rb')
+            self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __loadIndex(self):
+        try:
+            with open(self.path + ".idx") as idx:
+                header = idx.readline().rstrip("\n").split("\t", 1)
+                if header[0] != "#source" or header[1] != self.source:
+                    return False
+                for line in idx:
+                    key, offset, length, tag = line.rstrip("\n").split("\t")
+                    self.index[key] = (int(offset), int(length), tag)
+        except (IOError, ValueError, IndexError):
+            self.index = {}
+            return False
+        return True
+
+    def __buildIndex(self):
+        offset, key, start = 0, None, 0
+        with open(self.path, 'rb') as fh:
+            for line in fh:
+                if line.startswith(b">"):
+                    if key is not None:
+                        self.index[key] = (start, offset - start, "")
+                    key, start = line[1:].split(None, 1)[0].decode(), offset
+                offset += len(line)
+        if key is not None:
+            self.index[key] = (start, offset - start, "")
+        try:
+            writeIndex(self.path, self.source, self.index)
+        except IOError:
+            pass #read only location, the index is just not kept
+
+    def keys(self):
+        return self.index.keys()
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def length(self, key):
+        return self.index[key][1]
+
+    def tag(self, key):
+        return self.index[key][2] if key in self.index else None
+
+    def raw(self, key):
+        offset, length, tag = self.index[key]
+        return self.__data[offset:offset + length]
+
+    def block(self, key):
+        return self.raw(key).decode()
+
+    def records(self, key):
+        return parseFasta(self.block(key))
+
+    def sequence(self, key):
+        return next(self.records(key))[2]
+
+    def close(self):
+        if self.__data is not None:
+            self.__data.close()
+            self.__file.close()
+            self.__data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def source(stat):
+    return "%s\t%s" % (stat.st_size, stat.st_mtime_ns)
+
+def writeIndex(path, source, index):
+    with open(path + ".idx.tmp", "w") as idx:
+        idx.write("#source\t%s\n" % source)
+        for key, (offset, length, tag) in index.items():
+            idx.write("%s\t%s\t%s\t%s\n" % (key, offset, length, tag))
+    os.replace(path + ".idx.tmp", path + ".idx")
+
+class StoreWriter:
+    '''
+    Writes keyed blocks of FASTA text into one file plus its index, see IndexedStore.
+    Blocks go to <path>.tmp and only replace path when closed, so readers never see a half written store.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        self.offset = 0
+        self.__out = open(path + ".tmp", 'wb')
+
+    def write(self, key, text, tag=""):
+        data = text if isinstance(text, bytes) else text.encode()
+        self.__out.write(data)
+        self.index[key] = (self.offset, len(data), tag)
+        self.offset += len(data)
+
+    def close(self):
+        self.__out.close()
+        os.replace(self.path + ".tmp", self.path)
+        #after the replace, the index records the mtime of the file readers will see
+        writeIndex(self.path, source(os.stat(self.path)), self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, traceback):
+        if exc is None:
+            self.close()
+        else:
+            self.__out.close()
+            os.remove(self.path + ".tmp")
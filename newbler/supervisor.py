@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import shlex
+import signal
+import subprocess
+import time
+
+class Supervisor:
+    '''
+    Runs a runAssembly command with subprocess.Popen and polls it every pollInterval seconds,
+    tailing the KO's 454NewblerProgress.txt while it runs.
+    Newbler runs every assembly attempt through one (see Newbler.__assemble), so retries, escalation
+    and the assembly cache apply to supervised runs the same way. run() blocks its caller,
+    the Scheduler calls it from one thread per running KO.
+
+    Any sign of life counts as progress: a new line, the progress file changing size or mtime,
+    or the processes runAssembly started using CPU time (read from /proc, where there is one).
+    The run is killed (together with those processes) when none of these has changed for stallTimeout seconds,
+    or once it has run for timeout seconds, instead of holding its cores until the time limit.
+    Newbler's RetryPolicy decides what happens next.
+
+    Every line in the progress file is taken as the start of a phase,
+    the result has the time spent in each phase.
+
+    Example:
+        >>> result = Supervisor(stallTimeout=1200).run(cmd, "out/newbler/K00927", timeout=7200)
+        >>> result['status'], result['phases']
+    '''
+
+    def __init__(self, stallTimeout=1800, pollInterval=10):
+        self.stallTimeout = stallTimeout
+        self.pollInterval = pollInterval
+
+    def run(self, cmd, outputDir, timeout=None):
+        """
+        runs cmd to the end, returns {status, returncode, elapsed, phases}, status is one of
+        done (454NewblerProgress.txt reports success), failed (exited without completing),
+        stalled or timeout (killed)
+        """
+        progressFile = "%s/454NewblerProgress.txt" % outputDir
+        began = time.time()
+        #own session so the whole process group can be killed, runAssembly starts its own children
+        process = subprocess.Popen(shlex.split(cmd), start_new_session=True)
+        phases = []
+        offset = 0
+        partial = ""
+        lastChange = time.time()
+        signs = None
+        killed = None
+        while True:
+            try:
+                process.wait(timeout=self.pollInterval)
+            except subprocess.TimeoutExpired:
+                pass
+            offset, partial, lines = self.__tail(progressFile, offset, partial)
+            now = time.time()
+            if process.returncode is not None and partial.strip():
+                #the last line may not end with a newline
+                lines.append(partial.strip())
+                partial = ""
+            for line in lines:
+                phases.append({'phase': line, 'start': now - began})
+            if process.returncode is not None:
+                break
+            latest = (self.__stat(progressFile), self.cpuTime(process.pid))
+            if lines or latest != signs:
+                lastChange = now
+            signs = latest
+            if now - lastChange > self.stallTimeout:
+                killed = 'stalled'
+            elif timeout is not None and now - began > timeout:
+                killed = 'timeout'
+            if killed is not None:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                process.wait()
+                break
+        elapsed = time.time() - began
+        for i, phase in enumerate(phases):
+            phase['seconds'] = (phases[i + 1]['start'] if i + 1 < len(phases) else elapsed) - phase['start']
+        done = any(re.search("Assembly computation succeeded", phase['phase']) for phase in phases)
+        return {
+            'status'     : killed if killed is not None else ('done' if done else 'failed'),
+            'returncode' : process.returncode,
+            'elapsed'    : elapsed,
+            'phases'     : phases
+        }
+
+    @staticmethod
+    def cpuTime(pgid):
+        """
+        clock ticks of CPU used by the processes of group pgid (and the children they have reaped), None without /proc
+        """
+        if not os.path.isdir("/proc"):
+            return None
+        ticks = 0
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open("/proc/%s/stat" % pid) as stat:
+                    #the command name may hold spaces, the fields start after its closing bracket
+                    fields = stat.read().rsplit(")", 1)[1].split()
+            except (IOError, IndexError):
+                continue
+            if int(fields[2]) == pgid:
+                ticks += sum(int(field) for field in fields[11:15])
+        return ticks
+
+    def __stat(self, progressFile):
+        try:
+            stat = os.stat(progressFile)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def __tail(self, progressFile, offset, partial):
+        """
+        reads what was appended to the progress file since offset, returns the new offset, any unfinished line and the new lines
+        """
+        try:
+            with open(progressFile) as progress:
+                progress.seek(0, os.SEEK_END)
+                if progress.tell() < offset:
+                    #runAssembly -force started the file afresh
+                    offset, partial = 0, ""
+                progress.seek(offset)
+                content = partial + progress.read()
+                offset = progress.tell()
+        except IOError:
+            return offset, partial, []
+        lines = content.split("\n")
+        return offset, lines[-1], [line.strip() for line in lines[:-1] if line.strip()]
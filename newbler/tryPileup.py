@@ -2,11 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import json
 import os
 import pprint
+import time
 import multiprocessing as mp
 
-from .pileup import Alignment
+from .batch import STAGES, initWorker, planBatches, runBatch, summarize, warm
+from .      import metrics
 #from newbler.newbler import Newbler
 pp = pprint.PrettyPrinter(indent = 4)
 
@@ -22,9 +25,9 @@ help="""Path to root directory, Directory structure such the following:
     │           └── K0000X.2.fq (binned reads from Diamond+blast2lca)
     ├── pileup
     │   └── K0000X
-    │       └── input
-    │           └── K0000X-contig00001
-    │           └── K0000X-contig00002
+    │       └── K0000X.pileup (pileups of every contig, indexed by K0000X.pileup.idx)
+    │       └── K0000X.msa
+    │       └── K0000X.reAligned.msa
     ├── preNewbler
     │   └── K0000X
     │       └── K0000X (fastQ file)
@@ -34,41 +37,76 @@ help="""Path to root directory, Directory structure such the following:
     ├── pAss10
     └── pAss11
 """)
-parser.add_argument('--pool', metavar='pool', dest="pool",type=int, default = 1, help="The number individual newbler sessions")
-parser.add_argument('--cpu', metavar='CPU', dest="cpu",type=int, default = 1, help="total number of threads")
+parser.add_argument('--pool', metavar='pool', dest="pool",type=int, default = 1, help="The number of KOs processed at once")
+parser.add_argument('--cpu', metavar='CPU', dest="cpu",type=int, default = 1, help="total number of cores, each of the --pool KOs running at once realigns with CPU/pool of them")
+parser.add_argument('--aligner', dest='aligner', choices=['banded', 'muscle'], default='banded', help="Realign pileups in process (banded) or with the muscle binary")
 parser.add_argument('--subset', metavar='N', dest='subset', type=int, nargs=2, help="Run the script for a subset of KOs")
+parser.add_argument('--force', dest='force', action='store_true', help="Rerun stages even if out/manifest says they are up to date")
+parser.add_argument('--batchBytes', metavar='BYTES', dest='batchBytes', type=int, default=20 * 1024 * 1024, help="KOs with less fastQ than this are grouped into one task of about this size, 0 for one KO per task")
+parser.add_argument('--metrics', metavar='PATH', dest='metrics', type=str, default=None, help="Per stage metrics as JSON lines (default out/metrics/pileup.jsonl), a Prometheus textfile goes next to it as .prom")
+parser.add_argument('--msaCache', metavar='DIR', dest='msaCache', type=str, default=None, help="Where to keep the matrices of the pAss03 alignments (default next to them, in memory if pAss03 is read only)")
+parser.add_argument('--recomputeMDR', dest='recomputeMDR', action='store_true', help="Find the MDR of KOs without a pAss11 file in their pAss03 alignment (newbler.mdr) instead of failing them")
+parser.add_argument('--summary', metavar='PATH', dest='summary', type=str, default=None, help="Where to write the run summary (default out/pileup/summary.json)")
 
-args = parser.parse_args()
-pp.pprint(args)
+parser.add_argument('--stages', metavar='STAGE', dest='stages', nargs='+', choices=list(STAGES), default=list(STAGES), help="Pipeline stages to run for every KO")
 
-kos = os.listdir("%s/out/newbler" % args.root)
-if args.subset is not None:
-    kos = kos[args.subset[0]:args.subset[1]]
-#KOS = ['K00927']
-print(kos)
-def preAssembly(root, koid):
+def main(argv=None):
     """
-    calls object to generate output
+    runs the pileup stages over the KOs in ROOT/out/newbler, pool workers are forked from this process
+    once the libraries the stages load lazily are imported (see batch.warm)
     """
-    alignment = Alignment(root, koid)
-    alignment.doPile()
-    alignment.getReadsFromPileUP() #needs out/preNewbler
+    args = parser.parse_args(argv)
+    pp.pprint(args)
 
-##################################################
-def callback(response):
-    print("Done - Error:", response)
+    kos = os.listdir("%s/out/newbler" % args.root)
+    if args.subset is not None:
+        kos = kos[args.subset[0]:args.subset[1]]
+    print(kos)
+    ##################################################
+    results = []
+
+    def callback(response):
+        for result in response:
+            print("Done: %s %s" % (result['ko'], result['status']))
+        results.extend(response)
+
+    def err_call(response):
+        print("Done - error:", response)
+
+    batches = planBatches(args.root, kos, args.batchBytes)
+    print("%s KOs in %s tasks" % (len(kos), len(batches)))
+    started = time.time()
+    metricsFile = args.metrics or "%s/out/metrics/pileup.jsonl" % args.root
+    metrics.configure(metricsFile)
+    warm()
+    context = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else mp.get_context()
+    pool = context.Pool(processes=args.pool, initializer=initWorker, initargs=(context.BoundedSemaphore(args.cpu), metricsFile))
+    #--pool KOs run at once, each gets its share of the cores, the budget still caps the realignments across workers
+    threads = max(1, args.cpu // args.pool)
+    for batch in batches:
+        pool.apply_async(runBatch, args=(args.root, batch, threads, args.force, args.aligner, tuple(args.stages), args.msaCache, args.recomputeMDR), callback=callback, error_callback=err_call)
+    pool.close()
+    pool.join()
+    summary = summarize(results, time.time() - started)
+    summaryFile = args.summary or "%s/out/pileup/summary.json" % args.root
+    if not os.path.isdir(os.path.dirname(summaryFile)):
+        os.makedirs(os.path.dirname(summaryFile))
+    with open(summaryFile, "w") as out:
+        json.dump({'summary': summary, 'kos': sorted(results, key=lambda r: r['ko'])}, out, indent=2)
+    pp.pprint(summary)
+    promFile = os.path.splitext(metricsFile)[0] + ".prom"
+    if os.path.isfile(metricsFile):
+        metrics.writePrometheus(metricsFile, promFile)
+    print("Outputs:")
+    print("\tPileup: %s/out/pileup/" % args.root)
+    print("\tExtracted reads: %s/out/preNewbler" % args.root)
+    print("\tSummary: %s" % summaryFile)
+    print("\tMetrics: %s %s" % (metricsFile, promFile))
+    return summary
 
-def err_call(response):
-    print("Done - error:", response)
+if __name__ == '__main__':
+    main()
 
-POOL = mp.Pool(processes=args.cpu)
-for ko in kos:
-    POOL.apply_async(preAssembly, args=(args.root, ko), callback=callback, error_callback=err_call)
-POOL.close()
-POOL.join()
-print("Outputs:")
-print("\tPileup: %s/out/pileup/" % args.root)
-print("\tExtracted reads: %s/out/preNewbler" % args.root)
 ##################################################
 
 #def runAssembly(root, koid):
@@ -1,7 +1,8 @@
 #!/usr/bin/python
 
 import argparse
-from newbler.newbler import Newbler
+import os
+from newbler.scheduler import assembleAll
 
 parser = argparse.ArgumentParser(description='Gene Centric Assembly',
     formatter_class=argparse.RawTextHelpFormatter)
@@ -9,21 +10,33 @@ parser.add_argument('start', metavar='k', type=int, nargs='?',
                     help='the starting nth KO')
 parser.add_argument('end', metavar='p', type=int, nargs='?',
                     help='the ending nth KO')
-parser.add_argument('cpu', metavar='t', type=str, nargs='?',
-                    help='the number of cpu cores to use')
+parser.add_argument('cpu', metavar='t', type=int, nargs='?', default=1,
+                    help='the total number of cpu cores, shared by the concurrent assemblies')
+parser.add_argument('--maxThreads', type=int, default=None,
+                    help='the most cores given to a single assembly, default: all of them')
+parser.add_argument('--metrics', default=None,
+                    help='per assembly metrics as JSON lines, a Prometheus textfile goes next to it as .prom')
+parser.add_argument('--cache', default=None,
+                    help='directory of the assembly cache, reads and flags assembled before are restored instead of rerun')
+parser.add_argument('--cacheGB', type=float, default=100,
+                    help='size of the assembly cache, least recently used assemblies are evicted beyond it (default: 100)')
+parser.add_argument('--stallTimeout', type=int, default=1800,
+                    help='kill and retry with fewer cores an assembly with no change to 454NewblerProgress.txt and no CPU used for this many seconds')
+parser.add_argument('--failures', default=None,
+                    help='JSON lines report of failed attempts, default: assembly.failures.jsonl next to --newbler')
 parser.add_argument('--newbler', default="out/newbler",help='''
 binned KO reads default: ./out/newbler
 EXAMPLE:
     out/newbler
     ├── K00001
-    │   └── input
-    │       ├── K00001.1.fq
-    │       ├── K00001.2.fq
+    │   └── input
+    │       ├── K00001.1.fq
+    │       ├── K00001.2.fq
 '''
 )
 args = parser.parse_args()
 
-kos = os.listdir("%s" % args.newbler)
-for ko in kos[args.start:args.end]:
-    newbler = Newbler(args.newbler, ko, args.cpu)
-    newbler.geneCentricAssembly()
+#same as python -m newbler assemble
+kos = sorted(os.listdir("%s" % args.newbler))
+assembleAll(args.newbler, kos[args.start:args.end], args.cpu, maxThreads=args.maxThreads, cache=args.cache, cacheGB=args.cacheGB,
+            stallTimeout=args.stallTimeout, failures=args.failures, metricsPath=args.metrics)
@@ -4,7 +4,7 @@ import  os
 import  errno
 import  multiprocessing as mp
 
-from newbler.pileup import Alignment
+from newbler.pipeline import Pipeline
 
 ROOT      = "./"
 DIRECTORY = "./out/newbler"
@@ -16,7 +16,6 @@ def extract_MDR_Reads(root, koid):
     """
     calls object to generate output
     """
-    alignment = Alignment(root, koid)
     try:
         os.mkdir("out/pileup")
         print("dir out/pileup already exists")
@@ -35,29 +34,14 @@ def extract_MDR_Reads(root, koid):
     except OSError as e:
         if e.errno != errno.EEXIST:
             raise  # raises the error again
-    alignment.doPile()
-    alignment.getReadsFromPileUP()
-    #alignment.roundTwoAssembly()
+    #stages completed earlier with unchanged inputs are skipped, see out/manifest
+    return Pipeline(root, koid).run(['pileup', 'realignment', 'extraction'])
 
 def runAssembly(root, koid):
     """
-    runsAssembly
+    runsAssembly on the extracted MDR reads
     """
-    alignment = Alignment(root, koid)
-    try:
-        os.mkdir("out/assemble/%s"%koid)
-        print("dir out/assemble already exists")
-    except OSError as e:
-        if e.errno != errno.EEXIST:
-            raise  # raises the error again
-    alignment.roundTwoAssembly()
-
-
-def runAssembly(root, koid):
-    """
-    calls object to generate output
-    """
-    alignment = Alignment(root, koid)
+    return Pipeline(root, koid).run(['roundtwo'])
 
 def err_call(response, ko):
     """
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import os
+
+import pytest
+
+from newbler import annotation
+from newbler.annotation import Annotation, readHits, renameContigs
+
+@pytest.fixture
+def root(tmp_path):
+    contigs = {
+        "K00001": ">contig00001 length=8\nACGTACGT\n>contig00002 length=4\nGGCC\n",
+        "K00002": ">contig00001 length=12\nACGTAC\nGTACGT",
+        "K00003": None
+    }
+    for ko, text in contigs.items():
+        (tmp_path / ko).mkdir()
+        if text is not None:
+            (tmp_path / ko / "454AllContigs.fna").write_text(text)
+    return str(tmp_path)
+
+EXPECTED = {
+    "K00001": b">K00001:contig00001 length=8\nACGTACGT\n>K00001:contig00002 length=4\nGGCC\n",
+    "K00002": b">K00002:contig00001 length=12\nACGTAC\nGTACGT\n",
+    "K00003": b""
+}
+
+def test_renameContigs(root):
+    for ko, expected in EXPECTED.items():
+        out = io.BytesIO()
+        assert renameContigs(root, ko, out) == len(expected)
+        assert out.getvalue() == expected
+
+@pytest.mark.parametrize("processes", [1, 2])
+@pytest.mark.parametrize("compress", [False, True])
+def test_prediamond(root, tmp_path, processes, compress):
+    output = str(tmp_path / "contigs.fna")
+    names = Annotation().prediamond(root, output, processes=processes, shards=2, compress=compress)
+    assert names == ["%s.%s%s" % (output, i, ".gz" if compress else "") for i in (1, 2)]
+    opener = gzip.open if compress else open
+    shards = []
+    for name in names:
+        with opener(name, "rb") as fh:
+            shards.append(fh.read())
+    #largest KO alone on the first shard
+    assert shards == [EXPECTED["K00001"], EXPECTED["K00002"]]
+    assert not [name for name in os.listdir(str(tmp_path)) if name.startswith(".prediamond")]
+
+def test_prediamond_worker_error(root, tmp_path, monkeypatch):
+    def renameContigs(root, ko, out):
+        raise IOError("cannot read %s" % ko)
+    monkeypatch.setattr(annotation, "renameContigs", renameContigs)
+    with pytest.raises(IOError):
+        Annotation().prediamond(root, str(tmp_path / "contigs.fna"), processes=2, shards=2)
+
+def test_readHits(tmp_path):
+    m8 = tmp_path / "hits.m8"
+    m8.write_text("K00001:contig00001\tWP_1.1\t98.0\nbroken\n")
+    assert list(readHits(str(m8))) == [("K00001", "contig00001", ["WP_1.1", "98.0"])]
+
+#stand-in aligner: one hit per query record, shards whose query holds K00002 fail
+ALIGNER = """#!/bin/sh
+query=$1 out=$2
+if grep -q K00002 "$query"; then echo "no database" >&2; exit 3; fi
+grep '^>' "$query" | cut -c2- | cut -d' ' -f1 | while read id; do printf '%s\\tWP_0.1\\t99.0\\n' "$id"; done > "$out"
+"""
+
+@pytest.fixture
+def aligner(tmp_path):
+    path = tmp_path / "aligner.sh"
+    path.write_text(ALIGNER)
+    path.chmod(0o755)
+    return "%s {query} {out} {db} {threads} {tmp}" % path
+
+def test_diamond_merges_the_shards(root, tmp_path, aligner):
+    os.remove(os.path.join(root, "K00002", "454AllContigs.fna"))
+    output = str(tmp_path / "hits.m8")
+    result = Annotation().diamond(root, output, "nr.dmnd", aligner=aligner, shards=2, jobs=2)
+    assert result['failed'] == [] and result['hits'] == 2
+    assert sorted((ko, contig) for ko, contig, fields in readHits(output)) == [("K00001", "contig00001"), ("K00001", "contig00002")]
+
+def test_diamond_reports_failed_shards(root, tmp_path, aligner):
+    output = str(tmp_path / "hits.m8")
+    result = Annotation().diamond(root, output, "nr.dmnd", aligner=aligner, shards=2, jobs=2)
+    assert result['failed'] == ["%s.shards/query.fna.2" % output]
+    assert result['hits'] == 2
+    assert [ko for ko, contig, fields in readHits(output)] == ["K00001", "K00001"]
+
+def test_diamond_does_not_merge_stale_output(root, tmp_path, aligner):
+    output = str(tmp_path / "hits.m8")
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    (workdir / "query.fna.2.m8").write_text("K00002:contig00001\tWP_9.9\t10.0\n")
+    result = Annotation().diamond(root, output, "nr.dmnd", aligner=aligner, shards=2, workdir=str(workdir))
+    assert result['failed'] == [str(workdir / "query.fna.2")]
+    assert "K00002" not in [ko for ko, contig, fields in readHits(output)]
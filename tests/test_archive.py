@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+
+import pytest
+
+from newbler         import archive
+from newbler.archive import AlignmentArchive, pack, parseName
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "out")
+
+@pytest.fixture
+def alignments(tmp_path):
+    source = "%s/pAss01/K00927" % FIXTURES
+    directory = tmp_path / "K00927"
+    directory.mkdir()
+    for name in sorted(os.listdir(source))[:20]:
+        shutil.copyfile(os.path.join(source, name), str(directory / name))
+    return str(directory)
+
+def test_parseName():
+    name = "alignment-Acetobacteraceae-ref_YP_001234352.1__phosphoglycerate_kinase__Acidiphilium_cryptum_JF_5-01767.fasta"
+    assert parseName(name) == ("Acetobacteraceae", "YP_001234352.1")
+    assert parseName("K00927.fasta") == (None, None)
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_pack_keeps_the_directory_by_default(alignments, compress):
+    path = alignments + ".pack"
+    assert pack(alignments, path, compress=compress) == 20
+    assert os.path.isdir(alignments)
+    with AlignmentArchive(path) as packed, AlignmentArchive(alignments) as plain:
+        assert packed.isPacked() and not plain.isPacked()
+        assert packed.names() == plain.names()
+        assert packed.taxa() == plain.taxa()
+        for name in plain:
+            assert packed.read(name) == plain.read(name)
+            assert list(packed.records(name)) == list(plain.records(name))
+
+def test_pack_remove(alignments):
+    names = sorted(os.listdir(alignments))
+    pack(alignments, alignments + ".pack", remove=True)
+    assert not os.path.exists(alignments)
+    with AlignmentArchive(alignments + ".pack") as packed:
+        assert packed.names() == names
+
+def test_pack_keeps_the_directory_when_the_archive_does_not_check_out(alignments, monkeypatch):
+    original = AlignmentArchive.data
+    monkeypatch.setattr(AlignmentArchive, "data", lambda self, name: original(self, name)[:-1])
+    with pytest.raises(IOError):
+        pack(alignments, alignments + ".pack", remove=True)
+    assert len(os.listdir(alignments)) == 20
+
+def test_verify_missing_file(alignments):
+    pack(alignments, alignments + ".pack")
+    with open(os.path.join(alignments, "extra.fasta"), "w") as fh:
+        fh.write(">extra\nACGT\n")
+    with pytest.raises(IOError):
+        archive.verify(alignments, alignments + ".pack")
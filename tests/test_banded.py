@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from newbler.banded  import BandedAligner
+from newbler.realign import Realigner
+from newbler.store   import StoreWriter, IndexedStore, parseFasta
+
+CONTIG = "ATGGCGTACCTGAAACGTTAGCCGATTACGGCATTGCAAGT"
+
+def pileup(contigID, reads):
+    out = [">%s\n%s\n" % (contigID, CONTIG)]
+    for i, (offset, read) in enumerate(reads):
+        out.append(">%s-%s offset:%s length:%s\n%s\n" % (i, contigID, offset, len(read), "-" * offset + read))
+    return "".join(out)
+
+@pytest.fixture
+def aligner():
+    return BandedAligner(band=5)
+
+def test_exact_read(aligner):
+    assert aligner.pairwise(CONTIG, CONTIG[10:25], 10) == (10, CONTIG[10:25], {})
+
+def test_shifted_offset(aligner):
+    start, columns, inserted = aligner.pairwise(CONTIG, CONTIG[10:25], 13)
+    assert (start, columns, inserted) == (10, CONTIG[10:25], {})
+
+def test_deletion(aligner):
+    read = CONTIG[5:15] + CONTIG[17:30]
+    start, columns, inserted = aligner.pairwise(CONTIG, read, 5)
+    assert start == 5 and inserted == {}
+    assert columns == CONTIG[5:15] + "--" + CONTIG[17:30]
+
+def test_insertion(aligner):
+    read = CONTIG[5:15] + "TTT" + CONTIG[15:30]
+    start, columns, inserted = aligner.pairwise(CONTIG, read, 5)
+    assert start == 5 and columns == CONTIG[5:30]
+    assert "".join(inserted.values()) == "TTT"
+
+def test_empty_read(aligner):
+    assert aligner.pairwise(CONTIG, "", 12) == (12, "", {})
+    assert aligner.pairwise(CONTIG, "", 100) == (len(CONTIG), "", {})
+
+def test_align_layout(aligner):
+    reads = [(0, CONTIG[:20]), (5, CONTIG[5:15] + "TTT" + CONTIG[15:30]), (12, ""), (20, CONTIG[20:])]
+    records = list(parseFasta(aligner.align(pileup("contig00001", reads))))
+    assert [seqID for seqID, description, seq in records] == ["contig00001", "0-contig00001", "1-contig00001", "2-contig00001", "3-contig00001"]
+    assert len(set(len(seq) for seqID, description, seq in records)) == 1
+    assert records[0][2].replace("-", "") == CONTIG
+    assert records[2][2].replace("-", "") == reads[1][1]
+    assert set(records[3][2]) == {"-"}
+
+class CountingBudget:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.held = 0
+        self.taken = 0
+
+    def acquire(self):
+        with self.lock:
+            self.held += 1
+            self.taken += 1
+
+    def release(self):
+        with self.lock:
+            self.held -= 1
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_realigner_banded_uses_threads_and_budget(tmp_path, threads):
+    path = str(tmp_path / "K00001.pileup")
+    with StoreWriter(path) as writer:
+        for i in range(4):
+            writer.write("contig%05d" % i, pileup("contig%05d" % i, [(i, CONTIG[i:i + 20]), (i + 3, CONTIG[i + 3:i + 30])]))
+    budget = CountingBudget()
+    failed = Realigner(threads=threads, budget=budget).run(path, str(tmp_path / "K00001.msa"))
+    assert failed == [] and budget.taken == 4 and budget.held == 0
+    with IndexedStore(path) as pileups, IndexedStore(str(tmp_path / "K00001.msa")) as aligned:
+        assert sorted(aligned.keys()) == sorted(pileups.keys())
+        for key in pileups.keys():
+            assert aligned.block(key) == BandedAligner().align(pileups.block(key))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from newbler.batch import koSize, planBatches, summarize
+
+@pytest.fixture
+def root(tmp_path):
+    sizes = {"K00001": 50, "K00002": 30, "K00003": 8, "K00004": 6, "K00005": 4, "K00006": 0}
+    for ko, size in sizes.items():
+        inputDir = tmp_path / "out" / "newbler" / ko / "input"
+        inputDir.mkdir(parents=True)
+        if size:
+            (inputDir / ("%s.1.fq" % ko)).write_text("A" * (size // 2))
+            (inputDir / ("%s.2.fq" % ko)).write_text("A" * (size - size // 2))
+    return str(tmp_path)
+
+def test_koSize(root):
+    assert koSize(root, "K00001") == 50
+    assert koSize(root, "K00006") == 0
+    assert koSize(root, "K99999") == 0
+
+def test_large_KOs_alone_small_ones_packed(root):
+    kos = ["K00001", "K00002", "K00003", "K00004", "K00005", "K00006"]
+    assert planBatches(root, kos, 10) == [["K00001"], ["K00002"], ["K00003", "K00004"], ["K00005", "K00006"]]
+    assert planBatches(root, kos, 30) == [["K00001"], ["K00002"], ["K00003", "K00004", "K00005", "K00006"]]
+
+def test_one_KO_per_batch(root):
+    kos = ["K00005", "K00001", "K00003"]
+    assert planBatches(root, kos, 0) == [["K00001"], ["K00003"], ["K00005"]]
+    assert sorted(ko for batch in planBatches(root, kos, 1000) for ko in batch) == sorted(kos)
+
+def result(ko, status, seconds, timings, contigs=0, reads=0, error=None):
+    return {'ko': ko, 'status': status, 'contigsInMDR': contigs, 'readsExtracted': reads,
+            'timings': timings, 'seconds': seconds, 'error': error}
+
+def test_summarize():
+    results = [
+        result("K00001", {'pileup': 'done', 'extraction': 'done'}, 10.0, {'pileup': 6.0, 'extraction': 3.0}, 4, 100),
+        result("K00002", {'pileup': 'skipped', 'extraction': 'skipped'}, 0.5, {}, 2, 40),
+        result("K00003", {'pileup': 'done', 'extraction': 'failed'}, 3.0, {'pileup': 1.0, 'extraction': 2.0}),
+        result("K00004", {}, 1.0, {}, error="Traceback ...")
+    ]
+    summary = summarize(results, wall=12.0)
+    assert (summary['kos'], summary['done'], summary['skipped']) == (4, 1, 1)
+    assert summary['failed'] == ["K00003", "K00004"]
+    assert (summary['contigsInMDR'], summary['readsExtracted']) == (6, 140)
+    assert summary['stageSeconds'] == {'pileup': 7.0, 'extraction': 5.0}
+    assert (summary['koSeconds'], summary['wallSeconds']) == (14.5, 12.0)
+    assert summary['slowest'][0] == ("K00001", 10.0)
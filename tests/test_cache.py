@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+
+import pytest
+
+from newbler.cache   import AssemblyCache
+from newbler.newbler import Newbler
+
+#stand-in runAssembly: truncates its outputs in place, like newbler does, with the first read as the contig
+ASSEMBLER = """#!/bin/sh
+OUT=""; FILES=""
+while [ $# -gt 0 ]; do case "$1" in -o) OUT=$2; shift;; -cpu) shift;; -*) ;; *) FILES="$FILES $1";; esac; shift; done
+mkdir -p $OUT
+echo ">contig00001" > $OUT/454AllContigs.fna; cat $FILES | sed -n 2p >> $OUT/454AllContigs.fna
+printf 'Template\\tStatus\\n' > $OUT/454PairStatus.txt
+printf 'Accno\\n' > $OUT/454ReadStatus.txt
+echo "Assembly computation succeeded" > $OUT/454NewblerProgress.txt
+echo run >> $OUT/../runs
+"""
+
+@pytest.fixture
+def project(tmp_path):
+    assm = tmp_path / "runAssembly"
+    assm.write_text(ASSEMBLER)
+    assm.chmod(assm.stat().st_mode | stat.S_IEXEC)
+    inputDir = tmp_path / "newbler" / "K00001" / "input"
+    inputDir.mkdir(parents=True)
+    for i in ("1", "2"):
+        (inputDir / ("K00001.%s.fq" % i)).write_text("@101|5|x\nACGT\n+\nIIII\n")
+    return tmp_path, str(assm)
+
+def runs(root):
+    return (root / "newbler" / "runs").read_text().count("run")
+
+def contigs(root):
+    return (root / "newbler" / "K00001" / "454AllContigs.fna").read_text()
+
+def assemble(root, assm, cache=None):
+    return Newbler(str(root / "newbler"), "K00001", "1", assm, cache=cache).geneCentricAssembly(MDR=False)
+
+@pytest.mark.parametrize("link", [False, True])
+def test_restore_then_uncached_rerun(project, link):
+    root, assm = project
+    cache = AssemblyCache(str(root / "cache"), link=link)
+    assert assemble(root, assm, cache)
+    assert assemble(root, assm, cache)
+    assert runs(root) == 1
+    entry = cache.path(cache.key(Newbler(str(root / "newbler"), "K00001", "1", assm).geneCentricCommand(MDR=False)))
+    cached = open("%s/454AllContigs.fna" % entry).read()
+    #new reads, assembled without the cache, must not write through to the cached results
+    (root / "newbler" / "K00001" / "input" / "K00001.1.fq").write_text("@101|5|x\nTTTTTTTT\n+\nIIIIIIII\n")
+    assert assemble(root, assm)
+    assert runs(root) == 2
+    assert "TTTTTTTT" in contigs(root)
+    assert open("%s/454AllContigs.fna" % entry).read() == cached == ">contig00001\nACGT\n"
+
+def test_restored_results_are_writable_copies(project):
+    root, assm = project
+    cache = AssemblyCache(str(root / "cache"))
+    assemble(root, assm, cache)
+    assemble(root, assm, cache)
+    restored = root / "newbler" / "K00001" / "454AllContigs.fna"
+    assert os.stat(str(restored)).st_nlink == 1
+    assert os.access(str(restored), os.W_OK) or os.getuid() == 0
+
+def test_key_ignores_cpu_and_output(project):
+    root, assm = project
+    cache = AssemblyCache(str(root / "cache"))
+    fq = root / "newbler" / "K00001" / "input" / "K00001.1.fq"
+    one = cache.key("%s -cpu 1 -force -m -urt -o /a %s" % (assm, fq))
+    two = cache.key("%s -cpu 8 -force -urt -o /b %s" % (assm, fq))
+    assert one == two
+    assert one != cache.key("%s -cpu 1 -force -urt -rip -o /a %s" % (assm, fq))
+
+def test_evict_least_recently_used(project):
+    root, assm = project
+    cache = AssemblyCache(str(root / "cache"))
+    assemble(root, assm, cache)
+    assert len(cache.entries()) == 1
+    cache.maxBytes = 0
+    assert cache.evict() > 0
+    assert cache.entries() == []
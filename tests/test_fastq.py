@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+from newbler.fastq import FastqCache, FastqMate, preflight, readFastq
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_preflight_fastq(tmp_path):
+    fq = write(tmp_path, "K00001.1.fq", "@101|5|x\nACGTACGT\n+\nIIIIIIII\n@102|5|x\nACGT\n+\nIIII\n")
+    info = preflight(fq, sampleBytes=1 << 20)
+    assert info['exists'] and info['nonEmpty']
+    assert (info['reads'], info['bases']) == (2, 12)
+
+def test_preflight_fasta(tmp_path):
+    #round two reads, preNewbler/<KO>/<KO>, are written as FASTA
+    fa = write(tmp_path, "K00001", ">101|5|x\nACGTACGT\n>102|5|x\nACGT\nAC\n")
+    info = preflight(fa, sampleBytes=1 << 20)
+    assert info['exists'] and info['nonEmpty']
+    assert (info['reads'], info['bases']) == (2, 14)
+    assert preflight(fa)['nonEmpty']
+
+def test_preflight_empty_and_missing(tmp_path):
+    assert not preflight(write(tmp_path, "empty.fq", ""))['nonEmpty']
+    assert not preflight(write(tmp_path, "blank.fq", "\n\n"))['nonEmpty']
+    missing = preflight(str(tmp_path / "missing.fq"))
+    assert not missing['exists'] and not missing['nonEmpty']
+
+def test_readFastq(tmp_path):
+    fq = write(tmp_path, "K00001.1.fq", "@101|5|x\nACGT\n+\nIIII\n\n@102|7|y\nGG\n+\n#!\n")
+    assert list(readFastq(fq)) == [("101|5|x", "ACGT"), ("102|7|y", "GG")]
+    assert list(readFastq(fq, quality=True))[1] == ("102|7|y", "GG", "#!")
+
+def test_FastqMate(tmp_path):
+    fq = write(tmp_path, "K00001.1.fq", "@101|5|x\nACGT\n+\nIIII\n@abc\nGG\n+\nII\n@103|x\nTTTAA\n+\nIIIII\n")
+    mate = FastqMate(fq)
+    assert len(mate) == 3
+    assert mate.ids.tolist() == [101, -1, 103]
+    assert mate.taxa.tolist() == [5, -1, -1]
+    assert [mate.seq(i) for i in range(3)] == ["ACGT", "GG", "TTTAA"]
+
+def project(tmp_path, ko, reads):
+    inputDir = tmp_path / "out" / "newbler" / ko / "input"
+    inputDir.mkdir(parents=True, exist_ok=True)
+    for i in ("1", "2"):
+        (inputDir / ("%s.%s.fq" % (ko, i))).write_text(reads)
+    return str(inputDir / ("%s.1.fq" % ko))
+
+def test_FastqCache_load(tmp_path):
+    FastqCache.clear()
+    root = str(tmp_path)
+    project(tmp_path, "K00001", "@101|5|x\nACGT\n+\nIIII\n")
+    project(tmp_path, "K00002", "@201|6|x\nGGGG\n+\nIIII\n")
+    first = FastqCache.load(root, "K00001")
+    assert FastqCache.load(root, "K00001") is first
+    assert first.mates[1].seq(0) == "ACGT"
+    #only the most recently loaded KO is kept
+    FastqCache.load(root, "K00002")
+    assert FastqCache.load(root, "K00001") is not first
+    FastqCache.clear()
+
+def test_FastqCache_invalidated_by_size_and_mtime(tmp_path):
+    FastqCache.clear()
+    root = str(tmp_path)
+    fq = project(tmp_path, "K00001", "@101|5|x\nACGT\n+\nIIII\n")
+    first = FastqCache.load(root, "K00001")
+    #same size, new content and mtime
+    with open(fq, "w") as fh:
+        fh.write("@102|5|x\nTTTT\n+\nIIII\n")
+    stat = os.stat(fq)
+    os.utime(fq, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = FastqCache.load(root, "K00001")
+    assert second is not first and second.mates[0].ids.tolist() == [102]
+    with open(fq, "a") as fh:
+        fh.write("@103|5|x\nAA\n+\nII\n")
+    assert len(FastqCache.load(root, "K00001").mates[0]) == 2
+    FastqCache.clear()
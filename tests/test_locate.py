@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from newbler.locate import KmerIndex, reverseComplement
+
+random.seed(7)
+CONTIG = "".join(random.choice("ACGT") for i in range(600))
+MDR = CONTIG[200:400]
+
+def mutate(seq, positions):
+    seq = list(seq)
+    for p in positions:
+        seq[p] = {"A": "C", "C": "G", "G": "T", "T": "A"}[seq[p]]
+    return "".join(seq)
+
+@pytest.fixture
+def index():
+    return KmerIndex({'contig00001': CONTIG.lower(), 'contig00002': CONTIG[::-1]})
+
+def check(placement, strand, mismatches):
+    assert (placement.contig, placement.start, placement.end) == ('contig00001', 200, 400)
+    assert (placement.strand, placement.mismatches) == (strand, mismatches)
+
+def test_exact_match_does_not_build_kmers(index):
+    check(index.locate('contig00001', MDR), '+', 0)
+    check(index.locate('contig00001', reverseComplement(MDR)), '-', 0)
+    assert index.kmers == {}
+
+def test_mismatches(index):
+    placement = index.locate('contig00001', mutate(MDR, [15, 90, 170]))
+    check(placement, '+', 3)
+    assert placement.score == pytest.approx(1 - 3 / 200)
+    assert list(index.kmers) == ['contig00001']
+
+def test_reverse_strand_with_mismatches(index):
+    check(index.locate('contig00001', reverseComplement(mutate(MDR, [40, 120]))), '-', 2)
+
+def test_N_matches_anything(index):
+    query = MDR[:50] + "N" + MDR[51:150] + mutate(MDR[150:], [10])
+    check(index.locate('contig00001', query), '+', 1)
+
+def test_too_many_mismatches(index):
+    query = mutate(MDR, range(0, 200, 15))
+    assert index.locate('contig00001', query) is None
+    assert index.locate('contig00001', query, maxMismatches=20).mismatches == 14
+
+def test_fromFasta_reads_contigs_when_needed(tmp_path):
+    path = tmp_path / "454AllContigs.fna"
+    path.write_text(">contig00001 length=600\n%s\n%s\n>contig00002\n%s\n" % (CONTIG[:300], CONTIG[300:], CONTIG[::-1]))
+    index = KmerIndex.fromFasta(str(path))
+    try:
+        assert 'contig00002' in index and 'contig00003' not in index
+        assert index.seqs == {}
+        check(index.locate('contig00001', mutate(MDR, [5])), '+', 1)
+        assert list(index.seqs) == ['contig00001']
+    finally:
+        index.close()
+
+def test_one_base_deletion(index):
+    query = MDR[:100] + MDR[101:]
+    placement = index.locate('contig00001', query)
+    check(placement, '+', 1)
+
+def test_homopolymer_insertion_and_mismatch(index):
+    query = MDR[:120] + MDR[119] + MDR[120:]
+    query = mutate(query, [30])
+    check(index.locate('contig00001', query), '+', 2)
+
+def test_reverse_strand_indel(index):
+    query = reverseComplement(MDR[:60] + MDR[62:])
+    check(index.locate('contig00001', query), '-', 2)
+
+def test_indels_beyond_the_limit(index):
+    query = "".join(MDR[i:i + 15] for i in range(0, 200, 16))
+    assert index.locate('contig00001', query) is None
+    assert index.locate('contig00001', query, maxMismatches=15).mismatches == 12
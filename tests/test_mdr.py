@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from newbler.mdr    import MDR
+from newbler.pileup import Alignment
+from newbler.store  import parseFasta
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "out")
+
+@pytest.fixture(scope="module")
+def k00927(tmp_path_factory):
+    return MDR.fromFile("%s/pAss03/K00927.msa" % FIXTURES, "K00927", cacheDir=str(tmp_path_factory.mktemp("msa")))
+
+def pAss11():
+    with open("%s/pAss11/K00927.fna" % FIXTURES) as fna:
+        records = list(parseFasta(fna.read()))
+    header = re.search(r"spanning:(\d+) msaStart:(\d+) msaEND:(\d+)", records[0][1])
+    return records, [int(value) for value in header.groups()]
+
+def test_best_matches_pAss11(k00927):
+    records, (spanning, start, end) = pAss11()
+    best = k00927.best()
+    assert (best['msaStart'], best['msaEND'], best['spanning']) == (start, end, spanning) == (1680, 1967, 321)
+
+def test_members_match_pAss11(k00927):
+    records, (spanning, start, end) = pAss11()
+    assert k00927.members(start, end) == [seqID for seqID, description, seq in records]
+
+def test_windows_against_pAss10(k00927):
+    fixture = pd.read_csv("%s/pAss10/K00927/K00927" % FIXTURES, sep="\t")
+    windows = k00927.windows()
+    assert list(windows['start']) == list(fixture['start'])
+    assert set(windows['msaTotSeq']) == set(fixture['msaTotSeq']) == {717}
+    best = fixture.iloc[int(np.argmax(fixture['seqInSameWindow'].values))]
+    assert (best['start'], best['end'], best['seqInSameWindow']) == (1680, 1967, 321)
+    #known difference: a few window ends are one column off
+    assert (windows['end'].values == fixture['end'].values).mean() > 0.95
+
+def test_windows_and_coverage_on_a_small_alignment():
+    rows = ["AAAAAAAAAA", "--CCCCCCCC", "--TTTTTTTT", "GGGGGGGG--", "----------"]
+    matrix = np.array([np.frombuffer(row.encode(), dtype=np.uint8) for row in rows])
+    mdr = MDR(["a", "b", "c", "d", "e"], matrix, minLength=6)
+    assert mdr.totalSequences() == 4
+    best = mdr.best()
+    assert (best['msaStart'], best['msaEND'], best['spanning']) == (2, 8, 3)
+    assert mdr.members(2, 8) == ["a", "b", "c", "d"]
+    coverage = mdr.coverage(window=4, step=2)
+    assert list(coverage['position']) == [0, 2, 4, 6]
+    assert list(coverage['nseq']) == [2, 4, 4, 3]
+    assert list(coverage['ngroup']) == [2, 4, 4, 3]
+
+def test_no_window():
+    matrix = np.frombuffer(b"AC--", dtype=np.uint8).reshape(1, 4)
+    assert MDR(["a"], matrix, minLength=200).best() is None
+
+def test_alignment_recomputes_the_MDR_only_when_asked(tmp_path):
+    (tmp_path / "out" / "pAss03").mkdir(parents=True)
+    shutil.copy("%s/pAss03/K00927.msa" % FIXTURES, str(tmp_path / "out" / "pAss03"))
+    with pytest.raises(ValueError):
+        Alignment(str(tmp_path), "K00927")._Alignment__getMSALOC()
+    alignment = Alignment(str(tmp_path), "K00927", cacheDir=str(tmp_path / "msa"), recomputeMDR=True)
+    alignment._Alignment__getMSALOC()
+    assert (alignment.start, alignment.end) == (1680, 1967)
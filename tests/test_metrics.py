@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from newbler import metrics
+
+@pytest.fixture
+def sink(tmp_path):
+    path = str(tmp_path / "metrics" / "run.jsonl")
+    metrics.configure(path)
+    yield path
+    metrics.configure(None)
+
+class Stage:
+    ko = "K00001"
+
+    @metrics.timed("outer")
+    def outer(self):
+        metrics.count("reads", 3)
+        self.inner()
+        metrics.count("reads")
+
+    @metrics.timed("inner")
+    def inner(self):
+        metrics.count("contigs", 2)
+        return sum(range(10000))
+
+def test_nothing_recorded_unless_configured(tmp_path):
+    metrics.configure(None)
+    with metrics.stage("quiet", "K00001") as record:
+        metrics.count("reads")
+    assert record is None
+
+def test_timed_nesting_and_counts(sink):
+    Stage().outer()
+    inner, outer = metrics.load(sink)
+    assert (inner['stage'], inner['parent'], inner['depth']) == ("inner", "outer", 1)
+    assert (outer['stage'], outer['parent'], outer['depth']) == ("outer", None, 0)
+    assert inner['counts'] == {'contigs': 2} and outer['counts'] == {'reads': 4}
+    assert inner['ko'] == outer['ko'] == "K00001"
+    assert outer['wall'] >= inner['wall'] >= 0
+    for field in ('cpu', 'processChildCPU', 'processPeakRSS', 'processReadBytes', 'processWriteBytes'):
+        assert field in outer
+    assert outer['processPeakRSS'] > 0
+
+def test_emit_and_unreadable_lines(sink):
+    metrics.emit({'stage': "a", 'ko': None})
+    with open(sink, "a") as fh:
+        fh.write("{broken\n\n")
+    metrics.emit({'stage': "b", 'ko': "K00002"})
+    assert [record['stage'] for record in metrics.load(sink)] == ["a", "b"]
+
+def test_writePrometheus(sink, tmp_path):
+    for wall in (1.5, 2.5):
+        metrics.emit({'ko': "K00001", 'stage': "realignment", 'parent': None, 'wall': wall, 'cpu': 1.0, 'processPeakRSS': 100 * wall,
+                      'processReadBytes': None, 'counts': {'pileups': 2}})
+    metrics.emit({'ko': "K00001", 'stage': "banded", 'parent': "realignment", 'wall': 1.0, 'counts': {}})
+    prom = str(tmp_path / "run.prom")
+    metrics.writePrometheus(sink, prom)
+    lines = open(prom).read().splitlines()
+    assert 'newbler_stage_runs_total{ko="K00001",stage="realignment",parent=""} 2.0' in lines
+    assert 'newbler_stage_wall_seconds_total{ko="K00001",stage="realignment",parent=""} 4.0' in lines
+    assert 'newbler_stage_wall_seconds_total{ko="K00001",stage="banded",parent="realignment"} 1.0' in lines
+    assert 'newbler_stage_process_peak_rss_bytes{ko="K00001",stage="realignment",parent=""} 250.0' in lines
+    assert 'newbler_stage_process_read_bytes_total{ko="K00001",stage="realignment",parent=""} 0.0' in lines
+    assert 'newbler_stage_records_total{ko="K00001",stage="realignment",parent="",kind="pileups"} 4.0' in lines
+    assert "# TYPE newbler_stage_process_peak_rss_bytes gauge" in lines
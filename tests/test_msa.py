@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+
+import pytest
+
+from newbler.msa import MSAMatrix
+
+ALIGNMENT = ">contig00001 length=8\nAC-GT\nAC\n>contig00002\n--GGT\n>contig00003\n"
+
+@pytest.fixture
+def alignment(tmp_path):
+    directory = tmp_path / "pAss03"
+    directory.mkdir()
+    path = directory / "K00001.msa"
+    path.write_text(ALIGNMENT)
+    return str(path)
+
+def check(msa):
+    assert msa.ids == ["contig00001", "contig00002", "contig00003"]
+    assert msa.descriptions[0] == "contig00001 length=8"
+    assert msa.matrix.shape == (3, 7)
+    assert msa.sequence("contig00001") == "AC-GTAC"
+    assert msa.sequence("contig00002") == "--GGT--"
+    assert msa.sequence("contig00003") == "-------"
+    assert msa.covered(0, 2) == ["contig00001"]
+
+def test_next_to_the_alignment(alignment):
+    check(MSAMatrix(alignment))
+    assert os.path.isfile(alignment + ".npy") and os.path.isfile(alignment + ".rows")
+    check(MSAMatrix(alignment))
+
+def test_cacheDir(alignment, tmp_path):
+    cacheDir = str(tmp_path / "cache")
+    check(MSAMatrix(alignment, cacheDir))
+    assert os.path.isfile(os.path.join(cacheDir, "K00001.msa.npy"))
+    assert not os.path.exists(alignment + ".npy")
+
+@pytest.mark.skipif(hasattr(os, "geteuid") and os.geteuid() == 0, reason="root writes into read only directories")
+def test_read_only_directory_falls_back_to_memory(alignment):
+    directory = os.path.dirname(alignment)
+    os.chmod(directory, stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        check(MSAMatrix(alignment))
+        assert sorted(os.listdir(directory)) == ["K00001.msa"]
+    finally:
+        os.chmod(directory, stat.S_IRWXU)
+
+def test_unwritable_cacheDir_falls_back_to_memory(alignment, tmp_path):
+    blocker = tmp_path / "cache"
+    blocker.write_text("not a directory")
+    check(MSAMatrix(alignment, str(blocker / "msa")))
+
+def test_failed_write_leaves_nothing_behind(alignment, monkeypatch):
+    import numpy as np
+    def readOnly(*args, **kwargs):
+        raise PermissionError("read only file system")
+    monkeypatch.setattr(np.lib.format, "open_memmap", readOnly)
+    check(MSAMatrix(alignment))
+    assert sorted(os.listdir(os.path.dirname(alignment))) == ["K00001.msa"]
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+
+from newbler.pileup import Alignment
+
+def test_read_numbers_do_not_wrap(tmp_path):
+    inputDir = tmp_path / "out" / "newbler" / "K00001" / "input"
+    inputDir.mkdir(parents=True)
+    for i in ("1", "2"):
+        (inputDir / ("K00001.%s.fq" % i)).write_text("@101|5|x\nACGT\n+\nIIII\n")
+    alignment = Alignment(str(tmp_path), "K00001")
+    alignment._Alignment__storeTAXAinfo()
+    alignment.readInfo['readnum'][alignment.readInfo.row(101)] = 65535
+    output = io.StringIO()
+    pileup = [("101-contig00001", "offset:0 length:4", "ACGT")] * 2
+    assert alignment._Alignment__extractReads(0, 4, iter(pileup), output) == 0
+    headers = [line.split("\t")[0] for line in output.getvalue().splitlines() if line.startswith(">")]
+    assert headers == [">101-contig00001-5/65535", ">101-contig00001-5/65536"]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from newbler.manifest import Manifest
+from newbler.pipeline import Pipeline
+
+KO = "K00001"
+
+@pytest.fixture
+def root(tmp_path):
+    inputs = ["out/newbler/%s/input/%s.1.fq" % (KO, KO), "out/newbler/%s/input/%s.2.fq" % (KO, KO),
+              "out/pAss03/%s.msa" % KO, "out/pAss11/%s.fna" % KO]
+    for path in inputs:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("%s\n" % path)
+    return str(tmp_path)
+
+@pytest.fixture
+def calls(monkeypatch):
+    '''
+    replaces every stage with one that writes its outputs and notes it ran
+    '''
+    ran = []
+    def fake(stage):
+        def run(self):
+            ran.append(stage)
+            for path in self._Pipeline__outputs(stage):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "a") as fh:
+                    fh.write("%s %s\n" % (stage, len(ran)))
+        return run
+    for stage in Pipeline.STAGES:
+        monkeypatch.setattr(Pipeline, "_Pipeline__%s" % stage, fake(stage))
+    return ran
+
+def touch(root, path):
+    with open(os.path.join(root, path), "a") as fh:
+        fh.write("changed\n")
+
+def test_second_run_skips_everything(root, calls):
+    assert set(Pipeline(root, KO).run().values()) == {'done'}
+    assert calls == Pipeline.STAGES
+    del calls[:]
+    assert set(Pipeline(root, KO).run().values()) == {'skipped'}
+    assert calls == []
+
+def test_changed_input_reruns_that_stage_and_the_ones_after(root, calls):
+    Pipeline(root, KO).run()
+    del calls[:]
+    touch(root, "out/pAss03/%s.msa" % KO)
+    status = Pipeline(root, KO).run()
+    assert status['assembly'] == 'skipped'
+    assert calls == ['pileup', 'realignment', 'extraction', 'roundtwo']
+
+def test_rerun_invalidates_later_stages_not_run(root, calls):
+    Pipeline(root, KO).run()
+    del calls[:]
+    touch(root, "out/pAss11/%s.fna" % KO)
+    assert Pipeline(root, KO).run(['pileup']) == {'pileup': 'done'}
+    manifest = Manifest(root, KO)
+    assert manifest.load('realignment') is None and manifest.load('roundtwo') is None
+    assert manifest.load('assembly') is not None
+    del calls[:]
+    Pipeline(root, KO).run(['pileup', 'realignment'])
+    assert calls == ['realignment']
+
+def test_force_and_missing_outputs(root, calls):
+    Pipeline(root, KO).run()
+    del calls[:]
+    os.remove(os.path.join(root, "out/preNewbler/%s/%s" % (KO, KO)))
+    Pipeline(root, KO).run()
+    assert calls == ['extraction', 'roundtwo']
+    del calls[:]
+    Pipeline(root, KO, force=True).run(['realignment'])
+    assert calls == ['realignment']
+
+def test_failed_stage_stops_the_run(root, calls, monkeypatch):
+    monkeypatch.setattr(Pipeline, "_Pipeline__realignment", lambda self: calls.append('realignment'))
+    status = Pipeline(root, KO).run()
+    assert status == {'assembly': 'done', 'pileup': 'done', 'realignment': 'failed'}
+    assert Manifest(root, KO).load('realignment') is None
+
+def test_manifest_fingerprints(tmp_path):
+    path = tmp_path / "input"
+    path.write_text("ACGT")
+    manifest = Manifest(str(tmp_path), KO)
+    assert manifest.fingerprint(str(tmp_path / "missing")) is None
+    manifest.record('pileup', [str(path)], [str(path)])
+    assert manifest.isDone('pileup', [str(path)])
+    assert not manifest.isDone('pileup', [str(path), str(tmp_path / "missing")])
+    path.write_text("ACGTT")
+    assert not manifest.isDone('pileup', [str(path)])
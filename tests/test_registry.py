@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from newbler.registry import ReadRegistry
+
+def test_row_and_rows():
+    registry = ReadRegistry([30, 10, 20], taxa=np.array([3, 1, 2], dtype=np.int32))
+    assert len(registry) == 3
+    assert registry['taxa'][registry.row(10)] == 1
+    assert registry['taxa'][registry.row(30)] == 3
+    assert list(registry.rows([20, 30, 10])) == [1, 2, 0]
+
+def test_unknown_ids():
+    registry = ReadRegistry([30, 10, 20], taxa=np.array([3, 1, 2], dtype=np.int32))
+    #below, between and above the registered IDs
+    for readID in (5, 15, 99):
+        assert registry.row(readID) == -1
+    assert list(registry.rows([5, 20, 99])) == [-1, 1, -1]
+
+def test_empty_registry():
+    registry = ReadRegistry([], taxa=np.array([], dtype=np.int32))
+    assert registry.row(1) == -1
+    assert list(registry.rows([1, 2])) == [-1, -1]
+
+def test_last_occurrence_wins():
+    registry = ReadRegistry([7, 7], taxa=np.array([1, 2], dtype=np.int32))
+    assert len(registry) == 1
+    assert registry['taxa'][registry.row(7)] == 2
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import stat
+
+from newbler.retry      import RetryPolicy
+from newbler.scheduler  import Scheduler
+from newbler.supervisor import Supervisor
+
+def test_classify():
+    retry = RetryPolicy()
+    assert retry.classify(0, False, True, False) is None
+    assert retry.classify(-9, True, False, True) == 'timeout'
+    assert retry.classify(-9, False, False, True, stalled=True) == 'stalled'
+    assert retry.classify(137, False, False, True) == 'crash'
+    assert retry.classify(0, False, False, False) == 'incomplete'
+    assert retry.classify(0, False, True, True) == 'empty-output'
+
+def test_decide():
+    retry = RetryPolicy(maxAttempts=3)
+    assert retry.decide(1, 'timeout') == 'escalate'
+    assert retry.decide(1, 'crash') == 'escalate'
+    assert retry.decide(1, 'incomplete') == 'retry'
+    assert retry.decide(1, 'stalled') == 'escalate'
+    assert retry.decide(1, 'empty-output') == 'skip'
+    assert retry.decide(1, 'no-input') == 'skip'
+    assert retry.decide(3, 'crash') == 'skip'
+
+def test_delay_and_escalate():
+    retry = RetryPolicy(baseDelay=30, maxDelay=100, minCPU=2)
+    assert [retry.delay(attempt) for attempt in (1, 2, 3, 4)] == [30, 60, 100, 100]
+    assert retry.escalate({'cpu': 8, 'inMemory': True}) == {'cpu': 4, 'inMemory': True}
+    assert retry.escalate({'cpu': 3, 'inMemory': True}) == {'cpu': 2, 'inMemory': True}
+    assert retry.escalate({'cpu': 2, 'inMemory': True}) == {'cpu': 2, 'inMemory': False}
+
+def test_report_file(tmp_path):
+    report = tmp_path / "failures.jsonl"
+    retry = RetryPolicy(reportFile=str(report))
+    retry.record("K00001", 1, 'crash', {'cpu': 4, 'inMemory': True}, 'escalate', 137)
+    retry.record("K00002", 0, 'no-input', {'cpu': 4, 'inMemory': True}, 'skip')
+    entries = [json.loads(line) for line in report.read_text().splitlines()]
+    assert [(e['ko'], e['failure'], e['action']) for e in entries] == [("K00001", 'crash', 'escalate'), ("K00002", 'no-input', 'skip')]
+    assert [e['attempt'] for e in retry.failuresOf("K00001")] == [1]
+
+def test_scheduler_shares_one_policy(tmp_path):
+    assm = tmp_path / "assm"
+    assm.write_text("#!/bin/sh\nexit 1\n")
+    assm.chmod(assm.stat().st_mode | stat.S_IEXEC)
+    for ko in ("K00001", "K00002"):
+        inputDir = tmp_path / "newbler" / ko / "input"
+        inputDir.mkdir(parents=True)
+        (inputDir / ("%s.1.fq" % ko)).write_text("@101|5|x\nACGT\n+\nIIII\n")
+    retry = RetryPolicy(maxAttempts=2, baseDelay=0, reportFile=str(tmp_path / "failures.jsonl"))
+    scheduler = Scheduler(str(tmp_path / "newbler"), ["K00001", "K00002"], 2, maxThreads=1, assm=str(assm),
+                          supervisor=Supervisor(pollInterval=0.1), retry=retry)
+    report = scheduler.run()
+    assert len(retry.failures) == 4
+    assert len((tmp_path / "failures.jsonl").read_text().splitlines()) == 4
+    assert [f['action'] for f in report['kos']["K00001"]['failures']] == ['escalate', 'skip']
+    assert report['failed'] == ["K00001", "K00002"]
+    assert not report['kos']["K00001"]['assembled']
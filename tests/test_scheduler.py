@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import functools
+import json
+import os
+import sys
+
+import pytest
+
+from newbler import metrics, scheduler
+from newbler.__main__ import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def newbler(tmp_path):
+    for ko in ("K00001", "K00002", "K00003"):
+        inputDir = tmp_path / "out" / "newbler" / ko / "input"
+        inputDir.mkdir(parents=True)
+        (inputDir / ("%s.1.fq" % ko)).write_text("@101|5|x\nACGT\n+\nIIII\n" * (int(ko[-1])))
+    return str(tmp_path / "out" / "newbler")
+
+@pytest.fixture
+def calls(monkeypatch):
+    seen = []
+    def assembleAll(newbler, kos, cpu, **kwargs):
+        seen.append((newbler, kos, cpu, kwargs))
+        return {}
+    monkeypatch.setattr(scheduler, "assembleAll", assembleAll)
+    return seen
+
+def test_cli_and_script_share_assembleAll(newbler, calls, monkeypatch):
+    main(['assemble', '--newbler', newbler, '--cpu', '4', '--subset', '1', '3', '--cacheGB', '2', '--stallTimeout', '60'])
+    monkeypatch.setattr(sys, "argv", ["scg2.0101.firstRoundAssembly2.py", "1", "3", "4", "--newbler", newbler, "--cacheGB", "2", "--stallTimeout", "60"])
+    with open(os.path.join(ROOT, "script", "scg2.0101.firstRoundAssembly2.py")) as fh:
+        exec(compile(fh.read(), "scg2.0101.firstRoundAssembly2.py", "exec"), {'__name__': '__main__'})
+    cli, script = calls
+    assert cli[:3] == script[:3] == (newbler, ["K00002", "K00003"], 4)
+    assert {k: cli[3][k] for k in script[3]} == script[3]
+
+def test_assembleAll_writes_the_failure_report(newbler, tmp_path, monkeypatch):
+    assm = tmp_path / "assm"
+    assm.write_text("#!/bin/sh\nexit 1\n")
+    assm.chmod(0o755)
+    monkeypatch.setattr(scheduler, "RetryPolicy", functools.partial(scheduler.RetryPolicy, baseDelay=0))
+    monkeypatch.setattr(scheduler, "Supervisor", functools.partial(scheduler.Supervisor, pollInterval=0.1))
+    try:
+        report = scheduler.assembleAll(newbler, ["K00001"], 1, assm=str(assm), stallTimeout=60, metricsPath=str(tmp_path / "metrics.jsonl"))
+    finally:
+        metrics.configure(None)
+    assert report['failed'] == ["K00001"]
+    failures = [json.loads(line) for line in (tmp_path / "out" / "assembly.failures.jsonl").read_text().splitlines()]
+    assert [failure['action'] for failure in failures] == ['escalate', 'escalate', 'escalate', 'skip']
+    assert (tmp_path / "metrics.prom").is_file()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from newbler.status import readPairStatus, readReadStatus
+
+PAIRS = """Template\tStatus\tDistance\tLeft Contig\tLeft Pos\tLeft Dir\tRight Contig\tRight Pos\tRight Dir\tLeft Distance\tRight Distance
+101|5|x\tSameContig\t300\tcontig00001\t10\t+\tcontig00001\t310\t-\t10\t310
+102|5|x\tFalsePair\t900\tcontig00002\t500\t-\tcontig00002\t20\t+\t500\t20
+103|7|x\tLink\t0\tcontig00001\t5\t+\tcontig00003\t40\t-\t5\t40
+101|5|y\tSameContig\t200\tcontig00003\t70\t-\tcontig00003\t270\t+\t70\t270
+"""
+
+READS = """Accno\tRead Status\t5' Contig\t5' Position\t5' Strand\t3' Contig\t3' Position\t3' Strand
+201|5|x\tAssembled\tcontig00001\t15\t+\tcontig00001\t115\t+
+202|5|x\tAssembled\tcontig00002\t300\t-\tcontig00002\t200\t-
+203|6|x\tAssembled\tcontig00001\t15\t+\tcontig00004\t115\t+
+204|6|x\tSingleton\t\t\t\t\t\t
+202|5|y\tAssembled\tcontig00003\t90\t+\tcontig00003\t190\t+
+"""
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_readPairStatus(tmp_path):
+    placement = readPairStatus(write(tmp_path, "454PairStatus.txt", PAIRS))
+    assert list(placement.index) == ["102", "101"]
+    assert placement.index.name == 'readID'
+    assert placement.loc["102"].tolist() == ["contig00002", 500, 20, "reverse"]
+    #the last row of a duplicated read ID wins
+    assert placement.loc["101"].tolist() == ["contig00003", 70, 270, "reverse"]
+
+def test_readPairStatus_acceptedStatus(tmp_path):
+    placement = readPairStatus(write(tmp_path, "454PairStatus.txt", PAIRS), acceptedStatus=('Link',))
+    assert placement.loc["103"].tolist() == ["contig00001", 5, 40, "forward"]
+    assert len(placement) == 1
+
+def test_readReadStatus(tmp_path):
+    placement = readReadStatus(write(tmp_path, "454ReadStatus.txt", READS))
+    assert list(placement.index) == ["201", "202"]
+    assert placement.loc["201"].tolist() == ["contig00001", 15, 115, "forward"]
+    #reverse strand reads swap their ends, the last duplicate wins
+    assert placement.loc["202"].tolist() == ["contig00003", 90, 190, "forward"]
+    reverse = readReadStatus(write(tmp_path, "reverse.txt", READS.rsplit("202|5|y", 1)[0]))
+    assert reverse.loc["202"].tolist() == ["contig00002", 200, 300, "reverse"]
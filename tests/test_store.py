@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+from newbler.store import IndexedStore, StoreWriter
+
+def test_writer_round_trip(tmp_path):
+    path = str(tmp_path / "K00001.pileup")
+    with StoreWriter(path) as writer:
+        writer.write("contig00001", ">read1\nACGT\n>read2\nACGA\n", "tag1")
+        writer.write("contig00002", b">read3\nTTTT\n")
+    with IndexedStore(path, build=False) as store:
+        assert sorted(store.keys()) == ["contig00001", "contig00002"]
+        assert store.tag("contig00001") == "tag1"
+        assert [seqID for seqID, description, seq in store.records("contig00001")] == ["read1", "read2"]
+        assert store.sequence("contig00002") == "TTTT"
+
+def test_same_size_rewrite_rebuilds_the_index(tmp_path):
+    path = str(tmp_path / "contigs.fna")
+    with open(path, "w") as fh:
+        fh.write(">contig00001\nACGT\n>contig00002\nGGGG\n")
+    with IndexedStore(path) as store:
+        assert store.sequence("contig00002") == "GGGG"
+    #same number of bytes, different records
+    with open(path, "w") as fh:
+        fh.write(">contig00003\nACGT\n>contig00004\nCCCC\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with IndexedStore(path) as store:
+        assert sorted(store.keys()) == ["contig00003", "contig00004"]
+        assert store.sequence("contig00004") == "CCCC"
+    with IndexedStore(path, build=False) as store:
+        assert len(store) == 2
+
+def test_stale_index_is_not_used_without_build(tmp_path):
+    path = str(tmp_path / "K00001.msa")
+    with StoreWriter(path) as writer:
+        writer.write("contig00001", ">read1\nAC-T\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with IndexedStore(path, build=False) as store:
+        assert len(store) == 0
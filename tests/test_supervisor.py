@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+
+from newbler.newbler    import Newbler
+from newbler.retry      import RetryPolicy
+from newbler.scheduler  import Scheduler
+from newbler.supervisor import Supervisor
+
+def script(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+def test_last_line_without_newline(tmp_path):
+    cmd = script(tmp_path, "assm", 'printf "Start\\nAssembly computation succeeded" > %s/454NewblerProgress.txt\n' % tmp_path)
+    result = Supervisor(pollInterval=0.1).run(cmd, str(tmp_path))
+    assert result['status'] == 'done'
+    assert [phase['phase'] for phase in result['phases']] == ["Start", "Assembly computation succeeded"]
+
+def test_exit_without_success_is_failed(tmp_path):
+    cmd = script(tmp_path, "assm", 'echo "Start" > %s/454NewblerProgress.txt\nexit 3\n' % tmp_path)
+    result = Supervisor(pollInterval=0.1).run(cmd, str(tmp_path))
+    assert (result['status'], result['returncode']) == ('failed', 3)
+
+def test_stalled_and_timeout_runs_are_killed(tmp_path):
+    cmd = script(tmp_path, "assm", 'echo "Start" > %s/454NewblerProgress.txt\nsleep 30\n' % tmp_path)
+    assert Supervisor(stallTimeout=0.3, pollInterval=0.1).run(cmd, str(tmp_path))['status'] == 'stalled'
+    result = Supervisor(stallTimeout=60, pollInterval=0.1).run(cmd, str(tmp_path), timeout=0.3)
+    assert result['status'] == 'timeout' and result['elapsed'] < 10
+
+def test_quiet_runs_with_other_signs_of_life_are_not_stalled(tmp_path):
+    #busy for a while without writing a line
+    busy = script(tmp_path, "busy", 'end=$(($(date +%%s) + 2)); while [ $(date +%%s) -lt $end ]; do :; done\necho "Assembly computation succeeded" > %s/454NewblerProgress.txt\n' % tmp_path)
+    assert Supervisor(stallTimeout=0.5, pollInterval=0.1).run(busy, str(tmp_path))['status'] == 'done'
+    #idle but the progress file keeps growing without a newline
+    quiet = tmp_path / "quiet"
+    quiet.mkdir()
+    growing = script(tmp_path, "growing", 'for i in 1 2 3 4 5 6 7 8; do printf "." >> %s/454NewblerProgress.txt; sleep 0.25; done\n' % quiet)
+    result = Supervisor(stallTimeout=0.5, pollInterval=0.1).run(growing, str(quiet))
+    assert result['status'] == 'failed' and result['returncode'] == 0
+
+def test_cpuTime_of_own_group():
+    ticks = Supervisor.cpuTime(os.getpgid(0))
+    assert ticks is None or ticks >= 0
+
+#hangs on the first run, assembles on the next
+FLAKY = """OUT=""
+while [ $# -gt 0 ]; do case "$1" in -o) OUT=$2; shift;; -cpu) shift;; esac; shift; done
+mkdir -p $OUT
+echo "Start" > $OUT/454NewblerProgress.txt
+if [ ! -f $OUT/../tried ]; then touch $OUT/../tried; sleep 30; fi
+echo ">contig00001" > $OUT/454AllContigs.fna; echo ACGT >> $OUT/454AllContigs.fna
+echo "Assembly computation succeeded" >> $OUT/454NewblerProgress.txt
+"""
+
+def project(tmp_path, kos):
+    for ko in kos:
+        inputDir = tmp_path / "newbler" / ko / "input"
+        inputDir.mkdir(parents=True)
+        (inputDir / ("%s.1.fq" % ko)).write_text("@101|5|x\nACGT\n+\nIIII\n")
+    return str(tmp_path / "newbler")
+
+def test_stalled_attempt_goes_through_retry_policy(tmp_path):
+    root = project(tmp_path, ["K00001"])
+    retry = RetryPolicy(baseDelay=0)
+    newbler = Newbler(root, "K00001", "2", script(tmp_path, "assm", FLAKY), retry=retry,
+                      supervisor=Supervisor(stallTimeout=0.3, pollInterval=0.1))
+    assert newbler.geneCentricAssembly(MDR=False)
+    assert [(f['failure'], f['action']) for f in retry.failures] == [('stalled', 'escalate')]
+    assert newbler.phases[-1]['phase'] == "Assembly computation succeeded"
+
+def test_scheduler_runs_supervised_assemblies_in_threads(tmp_path):
+    root = project(tmp_path, ["K00001", "K00002"])
+    assm = script(tmp_path, "assm", FLAKY.replace("sleep 30", "sleep 0"))
+    scheduler = Scheduler(root, ["K00001", "K00002"], 2, maxThreads=1, assm=assm, supervisor=Supervisor(pollInterval=0.1))
+    report = scheduler.run()
+    assert sorted(report['kos']) == ["K00001", "K00002"]
+    assert report['failed'] == [] and all(info['assembled'] for info in report['kos'].values())